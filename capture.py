@@ -0,0 +1,319 @@
+# capture.py
+import os
+import threading
+import time
+import logging
+import numpy as np
+from procfs import ProcFile
+from inventory import HardwareInventory, SysfsValue
+from scheduler import Schedule
+
+logging.basicConfig(filename='capture.log', level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+
+METRICS = ("usage", "freq", "temp")
+
+
+class RingBuffer:
+    """Кольцевой буфер строк фиксированной ширины без выделения памяти на запись.
+
+    Каждая строка пишется дважды (в позиции i и i + capacity), поэтому последние
+    n строк всегда лежат подряд и отдаются как view без копирования. Запись —
+    advance() (индекс строки), заполнение data[индекс] и commit(): строка
+    становится видна в latest() только после commit().
+    """
+
+    def __init__(self, capacity, width, dtype=np.float32):
+        self.capacity = capacity
+        self.data = np.full((2 * capacity, width), np.nan, dtype=dtype)
+        self.position = -1
+        self.count = 0
+
+    def advance(self):
+        """Индекс следующей строки для записи; позиция буфера до commit() не меняется."""
+        return (self.position + 1) % self.capacity
+
+    def commit(self):
+        index = (self.position + 1) % self.capacity
+        # Зеркалируем записанную строку во вторую половину и только потом публикуем её:
+        # сначала позицию, затем число строк, чтобы читатель не взял незаписанную строку
+        self.data[index + self.capacity] = self.data[index]
+        self.position = index
+        self.count = min(self.count + 1, self.capacity)
+
+    def latest(self, n=None, position=None, count=None):
+        """Последние n строк (от старых к новым) — view на внутренний массив.
+
+        position и count задают конец и заполненность явно (общие для нескольких буферов).
+        """
+        if position is None:
+            count = self.count
+            position = self.position
+        n = count if n is None else min(n, count)
+        end = position + self.capacity + 1
+        return self.data[end - n:end]
+
+
+class HighFrequencyCapture:
+    """Захват загрузки, частоты и температуры каждого ядра с частотой 20–100 Гц.
+
+    Данные пишутся в заранее выделенные кольцевые буферы NumPy (столбец на ядро)
+    в отдельном потоке. Стоимость захвата измеряется по CPU-времени потока.
+    Загрузка считается по /proc/stat, у которого разрешение 1/USER_HZ (обычно
+    10 мс), поэтому на 100 Гц отдельные отсчёты загрузки квантованы. Если счётчики
+    ядра между двумя отсчётами не изменились, его загрузка не определена: в строку
+    попадает предыдущее значение ядра (NaN, пока счётчики ни разу не сдвинулись),
+    чтобы графики не получали ложных 0% или 100%.
+
+    Строки cpu из /proc/stat разбираются одним вызовом NumPy, поэтому число
+    выделений памяти на отсчёт постоянно и не зависит от числа ядер. Столбец
+    буфера соответствует номеру CPU; если CPU отключён (hotplug), его строки
+    cpuN в /proc/stat нет, и загрузка ядра — NaN. CPU с номером больше, чем
+    при запуске захвата, не учитываются.
+    """
+
+    def __init__(self, rate=50, seconds=60, proc_root="/proc", sys_root="/sys", inventory=None):
+        self.rate = rate
+        self.proc_root = proc_root
+        self.sys_root = sys_root
+        self.stat = ProcFile(os.path.join(proc_root, "stat"))
+        lines = [line for line in self.stat.read().split(b"\n")[1:] if line.startswith(b"cpu")]
+        # Столбец на каждый номер CPU до наибольшего: у отключённых при запуске — NaN
+        self.cores = max(int(line.split()[0][3:]) for line in lines) + 1 if lines else 0
+        # Счётчиков в строке cpu: 10 с guest_nice, на старых ядрах меньше (но не меньше 8)
+        self.width = len(lines[0].split()) - 1 if lines else 8
+        capacity = int(rate * seconds)
+        self.timestamps = RingBuffer(capacity, 1, dtype=np.float64)
+        self.buffers = {metric: RingBuffer(capacity, self.cores) for metric in METRICS}
+        self.total = np.zeros(self.cores, dtype=np.float64)
+        self.idle = np.zeros(self.cores, dtype=np.float64)
+        self.prev_total = np.zeros(self.cores, dtype=np.float64)
+        self.prev_idle = np.zeros(self.cores, dtype=np.float64)
+        self.scratch = np.zeros(self.cores, dtype=np.float64)
+        self.idle_delta = np.zeros(self.cores, dtype=np.float64)
+        self.ticked = np.zeros(self.cores, dtype=bool)
+        # Соответствие строк cpuN столбцам; пересчитывается, когда меняется число строк
+        self.offline = np.zeros(self.cores, dtype=bool)
+        self.layout_lines = None
+        self.line_rows = None
+        self.line_columns = None
+        self.identity = False
+        # Отсчёт собирается целиком здесь и попадает в буферы, только если прочитаны все метрики
+        self.rows = {metric: np.full(self.cores, np.nan, dtype=np.float32) for metric in METRICS}
+        self.freq_files = self.open_freq_files()
+        # Из инвентаря (общего хаба или временного без dmidecode) берутся только пути датчиков:
+        # его файлы закрываются при повторном обнаружении, поэтому захват открывает свои
+        self.temp_files = self.open_temp_files(inventory)
+        self.running = False
+        self.thread = None
+        self.samples = 0
+        self.cpu_time = 0.0
+        self.wall_time = 0.0
+        self.max_sample_time = 0.0
+        self.missed = 0
+
+    def cpu_dir(self, core):
+        return os.path.join(self.sys_root, "devices", "system", "cpu", f"cpu{core}")
+
+    def open_freq_files(self):
+        files = []
+        for core in range(self.cores):
+            try:
+                files.append(SysfsValue(os.path.join(self.cpu_dir(core), "cpufreq", "scaling_cur_freq")))
+            except OSError:
+                files.append(None)
+        return files
+
+    def temp_sensor_paths(self, inventory):
+        """Для каждого ядра — путь датчика coretemp "Core N" по core_id, иначе общего датчика CPU."""
+        with inventory.lock:
+            sensors = dict(inventory.temp_sensors)
+            cpu_sensor = inventory.cpu_temp_sensor
+        paths = []
+        for core in range(self.cores):
+            sensor = None
+            try:
+                with open(os.path.join(self.cpu_dir(core), "topology", "core_id")) as f:
+                    sensor = sensors.get(("coretemp", f"Core {f.read().strip()}"))
+            except OSError:
+                pass
+            sensor = sensor or cpu_sensor
+            paths.append(sensor.path if sensor is not None else None)
+        return paths
+
+    def open_temp_files(self, inventory):
+        if inventory is None:
+            inventory = HardwareInventory(self.sys_root, dmidecode=())
+            try:
+                paths = self.temp_sensor_paths(inventory)
+            finally:
+                inventory.close()
+        else:
+            paths = self.temp_sensor_paths(inventory)
+        # Общий датчик CPU у нескольких ядер открывается один раз
+        opened = {}
+        files = []
+        for path in paths:
+            if path is not None and path not in opened:
+                try:
+                    opened[path] = SysfsValue(path)
+                except OSError:
+                    opened[path] = None
+            files.append(opened.get(path))
+        return files
+
+    def set_layout(self, ids):
+        """Столбцы для строк cpuN текущего /proc/stat (ids — номера CPU по строкам)."""
+        ids = ids.astype(np.intp)
+        self.line_rows = np.flatnonzero(ids < self.cores)
+        self.line_columns = ids[self.line_rows]
+        self.identity = len(ids) == self.cores and bool((ids == np.arange(self.cores)).all())
+        self.offline.fill(True)
+        self.offline[self.line_columns] = False
+        # Счётчики отключённых CPU не определены
+        self.total.fill(np.nan)
+        self.idle.fill(np.nan)
+        if self.layout_lines is not None:
+            logging.info(f"CPU set changed: {len(ids)} cpu line(s) in /proc/stat, "
+                         f"{int(self.offline.sum())} of {self.cores} captured CPU(s) offline")
+        self.layout_lines = len(ids)
+
+    def read_counters(self):
+        n = self.stat.readinto()
+        buffer = self.stat.buffer
+        # Строки cpu идут в начале файла: конец блока — конец последней из них, что бы ни шло дальше
+        last = buffer.rfind(b"\ncpu", 0, n)
+        end = buffer.find(b"\n", max(last, 0) + 1, n)
+        # Из строк cpu удаляются буквы "cpu": остаются числа, номер ядра — отдельным столбцом
+        text = bytes(memoryview(buffer)[:n if end < 0 else end]).translate(None, b"cpu")
+        values = np.fromstring(text, dtype=np.float64, sep=" ")
+        lines, extra = divmod(values.size - self.width, self.width + 1)
+        if lines < 0 or extra:
+            raise ValueError(f"unexpected /proc/stat layout: {values.size} values, {self.width} counters per line")
+        per_core = values[self.width:].reshape(lines, self.width + 1)
+        if lines != self.layout_lines:
+            self.set_layout(per_core[:, 0])
+        # номер user nice system idle iowait irq softirq steal; guest уже учтён в user
+        if self.identity:
+            np.sum(per_core[:, 1:9], axis=1, out=self.total)
+            np.add(per_core[:, 4], per_core[:, 5], out=self.idle)
+        else:
+            per_core = per_core[self.line_rows]
+            self.total[self.line_columns] = per_core[:, 1:9].sum(axis=1)
+            self.idle[self.line_columns] = per_core[:, 4] + per_core[:, 5]
+
+    def prime(self):
+        """Запоминает счётчики /proc/stat без записи отсчёта: загрузка с момента загрузки системы не нужна."""
+        self.read_counters()
+        self.prev_total[:] = self.total
+        self.prev_idle[:] = self.idle
+
+    def sample(self):
+        now = time.monotonic()
+        self.read_counters()
+        total, idle = self.total, self.idle
+        rows = self.rows
+        # usage = 100 * (1 - d_idle / d_total), всё на месте в заранее выделенных массивах.
+        # У ядер без новых тиков (d_total = 0) в строке остаётся предыдущее значение
+        scratch, ticked = self.scratch, self.ticked
+        np.subtract(total, self.prev_total, out=scratch)
+        np.greater(scratch, 0, out=ticked)
+        np.subtract(idle, self.prev_idle, out=self.idle_delta)
+        np.divide(self.idle_delta, scratch, out=scratch, where=ticked)
+        np.subtract(1, scratch, out=scratch, where=ticked)
+        np.multiply(scratch, 100, out=rows["usage"], where=ticked)
+        np.copyto(rows["usage"], np.nan, where=self.offline)
+
+        freq_row = rows["freq"]
+        for core, f in enumerate(self.freq_files):
+            freq_row[core] = f.read_int() / 1000 if f is not None else np.nan
+
+        temp_row = rows["temp"]
+        for core, sensor in enumerate(self.temp_files):
+            temp_row[core] = sensor.read_int() / 1000 if sensor is not None else np.nan
+
+        # Все метрики прочитаны: все буферы продвигаются вместе, иначе строки разных буферов разойдутся.
+        # Метка времени публикуется последней: latest() берёт конец по ней, и строки метрик к этому моменту готовы
+        self.prev_total[:] = total
+        self.prev_idle[:] = idle
+        for metric, buffer in self.buffers.items():
+            buffer.data[buffer.advance()] = rows[metric]
+            buffer.commit()
+        self.timestamps.data[self.timestamps.advance(), 0] = now
+        self.timestamps.commit()
+
+    def run(self):
+        period = 1.0 / self.rate
+        schedule = Schedule(period, time.monotonic())
+        started_cpu = time.thread_time()
+        started_wall = time.monotonic()
+        self.prime()
+        while self.running:
+            delay = schedule.deadline - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            started = time.monotonic()
+            sample_cpu = time.thread_time()
+            try:
+                self.sample()
+            except (OSError, ValueError) as e:
+                logging.error(f"Capture sample error: {str(e)}")
+            now_cpu = time.thread_time()
+            self.max_sample_time = max(self.max_sample_time, now_cpu - sample_cpu)
+            self.samples += 1
+            self.missed += schedule.advance(started)
+            self.cpu_time = now_cpu - started_cpu
+            self.wall_time = time.monotonic() - started_wall
+        logging.info(f"Capture stopped: {self.overhead()}")
+
+    def start(self):
+        if self.thread is not None:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        logging.info(f"Capture started at {self.rate} Hz for {self.cores} cores")
+
+    def stop(self):
+        """Останавливает поток захвата и закрывает файлы; собранные отсчёты остаются доступны."""
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        self.close()
+
+    def close(self):
+        if self.running or self.thread is not None:
+            self.stop()
+            return
+        if self.stat is not None:
+            self.stat.close()
+            self.stat = None
+        # Файл общего датчика CPU повторяется у нескольких ядер, повторный close() ничего не делает
+        for f in self.freq_files + self.temp_files:
+            if f is not None:
+                f.close()
+        self.freq_files = []
+        self.temp_files = []
+
+    def latest(self, n=None):
+        """Последние n отсчётов: {"time": (n,), "usage"/"freq"/"temp": (n, ядра)} — view без копирования."""
+        # Сначала число строк, потом позиция — в порядке, обратном commit()
+        count = self.timestamps.count
+        position = self.timestamps.position
+        views = {metric: buffer.latest(n, position, count) for metric, buffer in self.buffers.items()}
+        views["time"] = self.timestamps.latest(n, position, count)[:, 0]
+        return views
+
+    def overhead(self):
+        """Стоимость захвата: CPU-время потока на отсчёт и доля от одного ядра."""
+        return {
+            "samples": self.samples,
+            "missed": self.missed,
+            "mean_sample_ms": self.cpu_time / self.samples * 1000 if self.samples else 0.0,
+            "max_sample_ms": self.max_sample_time * 1000,
+            "cpu_percent": self.cpu_time / self.wall_time * 100 if self.wall_time else 0.0
+        }
+
+    def export(self, path, n=None):
+        """Сохраняет последние n отсчётов в .npz."""
+        np.savez(path, **self.latest(n))
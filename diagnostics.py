@@ -1,50 +1,111 @@
 # diagnostics.py
-import psutil
+import threading
 import logging
-import platform
-import subprocess
+from hub import get_hub
+from rules import RULES_FILE, DEFAULT_RULES, RuleEngine, load_rules, parse_rules
 
 logging.basicConfig(filename='diagnostics.log', level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Значение старше стольких секунд не оценивается: сборщик завис или отключён
+MAX_AGE = 30
+
+
 class Diagnostics:
-    def check_hardware(self):
-        errors = []
-        try:
-            # CPU
-            cpu_usage = psutil.cpu_percent()
-            if cpu_usage > 95:
-                errors.append("High CPU usage detected")
-
-            # RAM
-            mem = psutil.virtual_memory()
-            if mem.percent > 90:
-                errors.append("High RAM usage detected")
-
-            # Disk
-            disk = psutil.disk_usage("/")
-            if disk.percent > 90:
-                errors.append("Low disk space")
-
-            # Temperature (Linux only)
-            if platform.system() == "Linux":
-                temps = psutil.sensors_temperatures()
-                for name, entries in temps.items():
-                    for entry in entries:
-                        if entry.current > 85:
-                            errors.append(f"High temperature on {name}: {entry.current}°C")
-
-            # GPU (Linux with nvidia-smi)
-            if platform.system() == "Linux":
+    """Предупреждения о состоянии оборудования по снимкам общего опроса.
+
+    Сам ничего не собирает: подписывается на группы хаба, нужные правилам
+    (rules.py, файл alerts.rules), и проверяет их по уже собранным значениям
+    в потоке хаба. Слушатели вызываются только при изменении набора
+    предупреждений и получают его целиком (кортеж строк).
+    """
+
+    def __init__(self, hub=None, rules=None, max_age=MAX_AGE):
+        self.hub = hub
+        self.max_age = max_age
+        if rules is None:
+            try:
+                rules = load_rules(RULES_FILE)
+            except (OSError, ValueError) as e:
+                logging.error(f"Cannot load alert rules, using defaults: {str(e)}")
+                rules = parse_rules(DEFAULT_RULES, "<default>")
+        self.engine = RuleEngine(rules)
+        self.alerts = ()
+        self.listeners = {}
+        self.next_token = 0
+        self.subscription = None
+        self.evaluations = 0
+        self.changes = 0
+        self.lock = threading.Lock()
+        # Проверка идёт в потоке хаба вне self.lock; reset() при отписке не должен пересечься с ней
+        self.engine_lock = threading.Lock()
+
+    def check(self, snapshot):
+        """Активные предупреждения после учёта снимка; устаревшие и ещё не собранные группы пропускаются."""
+        return self.engine.evaluate(snapshot, max_age=self.max_age)
+
+    def on_snapshot(self, snapshot):
+        with self.engine_lock:
+            try:
+                alerts = tuple(self.check(snapshot))
+            except Exception as e:
+                alerts = (f"Diagnostics error: {str(e)}",)
+                logging.error(f"Diagnostics error: {str(e)}")
+        with self.lock:
+            self.evaluations += 1
+            if alerts == self.alerts:
+                return
+            self.alerts = alerts
+            self.changes += 1
+            logging.info(f"Alerts changed: {', '.join(alerts) if alerts else 'None'}")
+            # Под блокировкой, чтобы новый слушатель не получил набор старше уже отправленного
+            for listener in self.listeners.values():
                 try:
-                    result = subprocess.run(["nvidia-smi", "--query-gpu=temperature.gpu", "--format=csv"],
-                                           capture_output=True, text=True)
-                    temp = int(result.stdout.splitlines()[1])
-                    if temp > 85:
-                        errors.append(f"High GPU temperature: {temp}°C")
-                except Exception:
-                    pass
-
-        except Exception as e:
-            errors.append(f"Diagnostics error: {str(e)}")
-            logging.error(f"Diagnostics error: {str(e)}")
-        return errors
\ No newline at end of file
+                    listener(alerts)
+                except Exception as e:
+                    logging.error(f"Diagnostics listener error: {str(e)}")
+
+    def add_listener(self, listener):
+        """Подписывает listener(alerts) на изменения; текущий набор передаётся сразу. Возвращает токен.
+
+        listener вызывается из потока хаба и должен быть коротким, например Mailbox.put.
+        """
+        with self.lock:
+            token = self.next_token
+            self.next_token += 1
+            self.listeners[token] = listener
+            if self.subscription is None:
+                # Хаб вызывает on_snapshot без своей блокировки, поэтому подписка под нашей безопасна
+                self.subscription = (self.hub or get_hub()).subscribe(self.engine.groups(), self.on_snapshot)
+                logging.info("Diagnostics started")
+            listener(self.alerts)
+        return token
+
+    def remove_listener(self, token):
+        """Отписывает слушателя; без слушателей отписывается от хаба и сбрасывает состояние правил."""
+        with self.lock:
+            if self.listeners.pop(token, None) is None or self.listeners or self.subscription is None:
+                return
+            (self.hub or get_hub()).unsubscribe(self.subscription)
+            self.subscription = None
+            # Иначе после новой подписки окна и выдержки "for" охватят перерыв без данных
+            with self.engine_lock:
+                self.engine.reset()
+            self.alerts = ()
+            logging.info(f"Diagnostics stopped after {self.evaluations} evaluation(s), {self.changes} change(s)")
+
+    def stats(self):
+        with self.lock:
+            return {"evaluations": self.evaluations, "changes": self.changes, "listeners": len(self.listeners)}
+
+
+_diagnostics = None
+_diagnostics_lock = threading.Lock()
+
+
+def get_diagnostics():
+    """Возвращает общий для процесса Diagnostics."""
+    global _diagnostics
+    with _diagnostics_lock:
+        if _diagnostics is None:
+            _diagnostics = Diagnostics()
+        return _diagnostics
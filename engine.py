@@ -0,0 +1,231 @@
+# engine.py
+import asyncio
+import queue
+import threading
+import time
+import logging
+from concurrent.futures import Executor, Future
+from scheduler import Schedule
+
+logging.basicConfig(filename='engine.log', level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class Snapshot(dict):
+    """Значения метрик, их возраст в секундах (ages) на момент сборки снимка и время сбора (collected, time.monotonic)."""
+
+    def __init__(self, values, ages, collected=None):
+        super().__init__(values)
+        self.ages = ages
+        self.collected = collected or {}
+
+    def is_stale(self, name, max_age):
+        return name not in self.ages or self.ages[name] > max_age
+
+
+async def run_subprocess(args, timeout):
+    """Запускает команду и возвращает её stdout; по таймауту процесс убивается и бросается TimeoutError."""
+    process = await asyncio.create_subprocess_exec(*args, stdout=asyncio.subprocess.PIPE,
+                                                   stderr=asyncio.subprocess.DEVNULL)
+    try:
+        stdout, _ = await asyncio.wait_for(process.communicate(), timeout)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        raise TimeoutError(f"{args[0]} did not finish in {timeout}s")
+    return stdout.decode(errors="replace")
+
+
+class DaemonThreadPool(Executor):
+    """Пул потоков-демонов для блокирующих сборщиков.
+
+    В отличие от ThreadPoolExecutor, чьи потоки интерпретатор дожидается при
+    выходе, поток, зависший в блокирующем вызове (nvidia-smi, чтение с
+    зависшего NFS), не мешает процессу завершиться после shutdown().
+    """
+
+    def __init__(self, max_workers, thread_name_prefix="worker"):
+        self.max_workers = max_workers
+        self.thread_name_prefix = thread_name_prefix
+        self.queue = queue.SimpleQueue()
+        self.idle = threading.Semaphore(0)
+        self.threads = []
+        self.closed = False
+        self.lock = threading.Lock()
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        with self.lock:
+            if self.closed:
+                raise RuntimeError("cannot submit after shutdown")
+            self.queue.put((future, fn, args, kwargs))
+            # Новый поток нужен, только если все существующие заняты
+            if not self.idle.acquire(blocking=False) and len(self.threads) < self.max_workers:
+                thread = threading.Thread(target=self.work, name=f"{self.thread_name_prefix}_{len(self.threads)}",
+                                          daemon=True)
+                thread.start()
+                self.threads.append(thread)
+        return future
+
+    def work(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            future, fn, args, kwargs = item
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn(*args, **kwargs))
+                except BaseException as e:
+                    future.set_exception(e)
+            self.idle.release()
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        with self.lock:
+            self.closed = True
+            if cancel_futures:
+                while True:
+                    try:
+                        item = self.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is not None:
+                        item[0].cancel()
+            for _ in self.threads:
+                self.queue.put(None)
+        if wait:
+            for thread in self.threads:
+                thread.join()
+
+
+class CollectionEngine:
+    """Цикл asyncio в отдельном потоке: каждый сборщик — своя задача со своим периодом.
+
+    Блокирующие сборщики выполняются в небольшом пуле потоков-демонов,
+    асинхронные (подпроцессы) — прямо в цикле. Каждый запуск ограничен
+    таймаутом, поэтому зависший сборщик только устаревает сам и не задерживает
+    остальные. stop() не ждёт зависшие вызовы: их потоки — демоны и не
+    удерживают процесс при выходе.
+    """
+
+    def __init__(self, max_workers=4):
+        self.executor = DaemonThreadPool(max_workers, thread_name_prefix="collector")
+        self.loop = asyncio.new_event_loop()
+        self.tasks = {}
+        self.schedules = {}
+        self.timeouts = {}
+        self.values = {}
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+        self.loop.close()
+
+    def stop(self):
+        def shutdown():
+            for task in self.tasks.values():
+                task.cancel()
+            self.loop.stop()
+        self.loop.call_soon_threadsafe(shutdown)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def __contains__(self, name):
+        with self.lock:
+            return name in self.schedules
+
+    def add_collector(self, name, period, job, timeout):
+        """job — корутина-функция без аргументов, её результат сохраняется как значение метрики."""
+        self.add(name, period, job, timeout, store=True)
+
+    def add_blocking_collector(self, name, period, fn, timeout):
+        """fn — обычная функция, выполняется в пуле потоков."""
+        busy = []
+
+        async def job():
+            # Предыдущий вызов ещё висит в потоке: не запускаем второй поверх него
+            if busy and not busy[0].done():
+                raise TimeoutError("previous call still running")
+            busy[:] = [self.loop.run_in_executor(self.executor, fn)]
+            return await asyncio.shield(busy[0])
+        self.add(name, period, job, timeout, store=True)
+
+    def add_task(self, name, period, fn):
+        """Периодический вызов fn() в потоке цикла (например, доставка снимков подписчикам)."""
+        async def job():
+            fn()
+        self.add(name, period, job, None, store=False)
+
+    def add(self, name, period, job, timeout, store):
+        with self.lock:
+            self.schedules[name] = Schedule(period, time.monotonic())
+            self.timeouts[name] = 0
+
+        def start():
+            self.tasks[name] = self.loop.create_task(self.run_job(name, job, timeout, store))
+        self.loop.call_soon_threadsafe(start)
+
+    def remove(self, name):
+        with self.lock:
+            self.schedules.pop(name, None)
+            self.timeouts.pop(name, None)
+            self.values.pop(name, None)
+
+        def cancel():
+            task = self.tasks.pop(name, None)
+            if task is not None:
+                task.cancel()
+        self.loop.call_soon_threadsafe(cancel)
+
+    async def run_job(self, name, job, timeout, store):
+        with self.lock:
+            schedule = self.schedules.get(name)
+        while schedule is not None:
+            delay = schedule.deadline - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            started = time.monotonic()
+            try:
+                value = await asyncio.wait_for(job(), timeout)
+                if store:
+                    with self.lock:
+                        if name in self.schedules:
+                            self.values[name] = (value, time.monotonic())
+            except asyncio.CancelledError:
+                raise
+            except (asyncio.TimeoutError, TimeoutError) as e:
+                with self.lock:
+                    if name in self.timeouts:
+                        self.timeouts[name] += 1
+                logging.warning(f"Collector {name} timed out: {str(e) or timeout}")
+            except Exception as e:
+                logging.error(f"Collector {name} error: {str(e)}")
+            with self.lock:
+                skipped = schedule.advance(started)
+                schedule = self.schedules.get(name)
+            if skipped:
+                logging.debug(f"Task {name} missed {skipped} tick(s)")
+
+    def snapshot(self, names):
+        """Снимок из последних готовых значений; ещё не собранные метрики в него не входят."""
+        now = time.monotonic()
+        values, ages, times = {}, {}, {}
+        with self.lock:
+            for name in names:
+                if name in self.values:
+                    values[name], times[name] = self.values[name]
+                    ages[name] = now - times[name]
+        return Snapshot(values, ages, times)
+
+    def stats(self):
+        """Для каждой задачи: опоздания и пропуски тиков, таймауты и возраст значения."""
+        now = time.monotonic()
+        with self.lock:
+            stats = {}
+            for name, schedule in self.schedules.items():
+                stats[name] = schedule.stats()
+                stats[name]["timeouts"] = self.timeouts[name]
+                if name in self.values:
+                    stats[name]["age"] = now - self.values[name][1]
+            return stats
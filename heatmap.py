@@ -0,0 +1,193 @@
+# heatmap.py
+"""Тепловая карта загрузки ядер (ядра × время) для машин с сотнями ядер.
+
+Загрузка всех ядер за последние seconds отсчётов лежит в кольцевом буфере
+NumPy (capture.RingBuffer), строки которого уже переставлены в порядке
+топологии: узел NUMA, сокет, ядро, потоки одного ядра рядом. Вся карта —
+один AxesImage: новый отсчёт пишется в буфер, изображение получает view на
+последние строки (set_data) и перерисовывается через blitting. Стоимость
+кадра определяется размером осей в пикселях, а не числом ядер.
+"""
+import os
+import time
+import logging
+import numpy as np
+from capture import RingBuffer
+
+logging.basicConfig(filename='heatmap.log', level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+
+CPU_DIR = os.path.join("devices", "system", "cpu")
+
+
+def parse_cpu_list(text):
+    """Список CPU из формата sysfs "0-3,8,10-11"."""
+    cpus = []
+    for part in text.strip().split(","):
+        if not part:
+            continue
+        first, _, last = part.partition("-")
+        cpus.extend(range(int(first), int(last or first) + 1))
+    return cpus
+
+
+class CoreTopology:
+    """Размещение логических CPU по узлам NUMA и сокетам из /sys/devices/system/cpu.
+
+    Строки загрузки, которые отдаёт SystemMonitor.get_cpu_usage, идут по
+    возрастанию номеров включённых CPU (как в /proc/stat); order — перестановка
+    этих строк в порядок (узел, сокет, core_id, cpu), groups — (подпись,
+    первая строка, следующая за последней) для каждой пары узел/сокет.
+    """
+
+    def __init__(self, sys_root="/sys", cores=None):
+        self.sys_root = sys_root
+        cpus = self.online_cpus()
+        if cores is not None and len(cpus) != cores:
+            # Топология не совпала с числом строк загрузки (горячее подключение) — без группировки
+            logging.warning(f"Topology lists {len(cpus)} CPU(s), usage has {cores}; grouping disabled")
+            cpus = list(range(cores))
+        self.cpus = cpus
+        self.placement = [self.place(cpu) for cpu in cpus]
+        keys = [(node, socket, core, cpu) for cpu, (node, socket, core) in zip(cpus, self.placement)]
+        self.order = np.array(sorted(range(len(cpus)), key=keys.__getitem__), dtype=np.intp)
+        self.groups = []
+        for row, index in enumerate(self.order):
+            node, socket, _ = self.placement[index]
+            label = f"node {node} / socket {socket}" if node >= 0 else f"socket {socket}"
+            if self.groups and self.groups[-1][0] == label:
+                self.groups[-1][2] = row + 1
+            else:
+                self.groups.append([label, row, row + 1])
+        self.groups = [tuple(group) for group in self.groups]
+
+    def cpu_dir(self, cpu=None):
+        path = os.path.join(self.sys_root, CPU_DIR)
+        return path if cpu is None else os.path.join(path, f"cpu{cpu}")
+
+    def read_int(self, path, default=-1):
+        try:
+            with open(path) as f:
+                return int(f.read().strip())
+        except (OSError, ValueError):
+            return default
+
+    def online_cpus(self):
+        try:
+            with open(os.path.join(self.cpu_dir(), "online")) as f:
+                return parse_cpu_list(f.read())
+        except (OSError, ValueError):
+            return list(range(os.cpu_count() or 1))
+
+    def place(self, cpu):
+        """(узел NUMA или -1, сокет, core_id) логического CPU."""
+        node = -1
+        try:
+            for name in os.listdir(self.cpu_dir(cpu)):
+                if name.startswith("node") and name[4:].isdigit():
+                    node = int(name[4:])
+                    break
+        except OSError:
+            pass
+        topology = os.path.join(self.cpu_dir(cpu), "topology")
+        socket = max(0, self.read_int(os.path.join(topology, "physical_package_id")))
+        return node, socket, self.read_int(os.path.join(topology, "core_id"), cpu)
+
+
+def setup_heatmap(fig, ax, data, topology, cmap="inferno"):
+    """Рисует пустую карту на осях ax: (изображение, разделители групп), оба animated.
+
+    Общая разметка для CoreHeatmap и отрисовки вне потока Tk (offthread.py).
+    """
+    seconds, cores = data.shape
+    # Строки — ядра в порядке топологии, столбцы — секунды назад; NaN (ещё нет данных) не закрашивается
+    image = ax.imshow(data.T, aspect="auto", interpolation="nearest", cmap=cmap, vmin=0, vmax=100,
+                      extent=(-seconds, 0, cores, 0), animated=True)
+    ax.set_xlabel("Time (s)")
+    ax.set_yticks([(start + end) / 2 for _, start, end in topology.groups])
+    ax.set_yticklabels([label for label, _, _ in topology.groups], fontsize=8)
+    # Границы групп рисуются поверх карты на каждом кадре
+    separators = [ax.axhline(start, color="white", linewidth=0.8, animated=True) for _, start, _ in topology.groups[1:]]
+    fig.colorbar(image, ax=ax, label="Usage (%)")
+    fig.tight_layout()
+    return image, separators
+
+
+class HeatmapData:
+    """Загрузка ядер за последние seconds отсчётов в кольцевом буфере, строки в порядке топологии."""
+
+    def __init__(self, cores, seconds=120, topology=None):
+        self.cores = cores
+        self.seconds = seconds
+        self.topology = topology or CoreTopology(cores=cores)
+        self.order = self.topology.order
+        self.buffer = RingBuffer(seconds, cores)
+        self.scratch = np.empty(cores, dtype=np.float32)
+
+    def append(self, usage):
+        """Добавляет загрузку ядер в порядке get_cpu_usage."""
+        count = min(len(usage), self.cores)
+        # Ядер может стать меньше (отключение на лету): их строки остаются пустыми
+        self.scratch[:] = np.nan
+        self.scratch[:count] = usage[:count]
+        np.take(self.scratch, self.order, out=self.buffer.data[self.buffer.advance()])
+        self.buffer.commit()
+
+    def view(self):
+        """Последние seconds строк — непрерывный view кольцевого буфера, копии нет."""
+        return self.buffer.data[self.buffer.position + 1:self.buffer.position + 1 + self.seconds]
+
+
+class CoreHeatmap:
+    """Карта загрузки ядер на своих осях matplotlib, обновляемая на месте."""
+
+    def __init__(self, master, cores, seconds=120, topology=None, figsize=(6, 3), cmap="inferno"):
+        import matplotlib.pyplot as plt
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+        self.master = master
+        self.cores = cores
+        self.data = HeatmapData(cores, seconds, topology)
+        self.topology = self.data.topology
+        self.fig, self.ax = plt.subplots(figsize=figsize)
+        self.canvas = FigureCanvasTkAgg(self.fig, master=master)
+        self.image, self.separators = setup_heatmap(self.fig, self.ax, self.data.buffer.data[:seconds], self.topology, cmap)
+        self.background = None
+        self.frames = 0
+        self.frame_time = 0.0
+        self.canvas.mpl_connect("draw_event", self.on_draw)
+
+    def get_tk_widget(self):
+        return self.canvas.get_tk_widget()
+
+    def on_draw(self, event):
+        self.background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self.draw_artists()
+
+    def draw_artists(self):
+        self.ax.draw_artist(self.image)
+        for separator in self.separators:
+            self.ax.draw_artist(separator)
+
+    def append(self, usage):
+        """Добавляет загрузку ядер (в порядке get_cpu_usage) и перерисовывает карту."""
+        self.data.append(usage)
+        self.frame()
+
+    def frame(self):
+        started = time.perf_counter()
+        self.image.set_data(self.data.view().T)
+        if self.background is None:
+            self.canvas.draw()
+        else:
+            self.canvas.restore_region(self.background)
+            self.draw_artists()
+            self.canvas.blit(self.ax.bbox)
+        self.frames += 1
+        self.frame_time += time.perf_counter() - started
+
+    def cancel(self):
+        """Отложенных кадров нет: append() рисует сразу. Метод есть для единого закрытия с OffThreadHeatmap."""
+
+    def stats(self):
+        return {"mode": "tk", "frames": self.frames, "cores": self.cores,
+                "mean_frame_ms": self.frame_time / self.frames * 1000 if self.frames else 0.0}
@@ -0,0 +1,179 @@
+# hub.py
+import threading
+import logging
+from monitor import SystemMonitor
+from smart import SMARTMonitor
+from engine import CollectionEngine
+
+logging.basicConfig(filename='hub.log', level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Порядок совпадает с аргументами callback в SystemMonitor.monitor_loop
+COLLECTORS = (
+    "cpu_usage", "cpu_freq", "cpu_temp", "fan_speeds",
+    "ram_info", "ram_freq", "disk_usage", "disk_io",
+    "gpu_info", "net_info", "power_info", "top_processes"
+)
+
+# Сборщики, которые запускают внешние программы асинхронно
+ASYNC_COLLECTORS = ("smart_data",)
+
+# Сборщики для отдельных окон и диагностики: в главное окно и monitor_loop не входят
+TABLE_COLLECTORS = ("process_table", "temperatures")
+
+GROUPS = COLLECTORS + ASYNC_COLLECTORS + TABLE_COLLECTORS
+
+# Значения, которые подставляются, пока сборщик ещё ничего не вернул
+DEFAULTS = {
+    "cpu_usage": [],
+    "cpu_freq": "N/A",
+    "cpu_temp": "N/A",
+    "fan_speeds": {},
+    "ram_info": {"percent": 0, "used": 0},
+    "ram_freq": "N/A",
+    "disk_usage": {"percent": 0},
+    "disk_io": {"read_bytes": 0, "write_bytes": 0, "read_iops": 0, "write_iops": 0},
+    "gpu_info": {"usage": "N/A", "memory": "N/A", "temp": "N/A"},
+    "net_info": {"bytes_sent": 0, "bytes_recv": 0},
+    "power_info": "N/A",
+    "top_processes": [],
+    "smart_data": {},
+    "process_table": None,
+    "temperatures": {}
+}
+
+# Период опроса каждого сборщика, секунды
+CADENCES = {
+    "cpu_usage": 0.25,
+    "cpu_freq": 1,
+    "cpu_temp": 1,
+    "fan_speeds": 5,
+    "ram_info": 1,
+    "ram_freq": 300,
+    "disk_usage": 5,
+    "disk_io": 1,
+    "gpu_info": 1,
+    "net_info": 1,
+    "power_info": 2,
+    "top_processes": 2,
+    "smart_data": 5,
+    "process_table": 2,
+    "temperatures": 5
+}
+
+# Сколько ждать один запуск сборщика, секунды; дольше — значение считается устаревшим
+TIMEOUTS = {
+    "ram_freq": 15,
+    "top_processes": 5,
+    "smart_data": 30,
+    "process_table": 5
+}
+DEFAULT_TIMEOUT = 2
+
+
+class SamplingHub:
+    """Общий для процесса опрос: каждый сборщик запускается один раз за свой период."""
+
+    def __init__(self, monitor=None, cadences=None, timeouts=None):
+        self.monitor = monitor or SystemMonitor()
+        self.smart = SMARTMonitor()
+        self.cadences = dict(CADENCES, **(cadences or {}))
+        self.timeouts = dict(TIMEOUTS, **(timeouts or {}))
+        self.collectors = {name: getattr(self.monitor, f"get_{name}") for name in COLLECTORS + TABLE_COLLECTORS}
+        self.subscribers = {}
+        self.next_token = 0
+        self.lock = threading.Lock()
+        self.engine = None
+
+    def subscribe(self, groups, callback, interval=1):
+        """Подписывает callback(snapshot) на группы метрик, возвращает токен подписки.
+
+        Снимок с последними значениями групп доставляется раз в interval секунд;
+        возраст каждого значения доступен в snapshot.ages.
+        """
+        unknown = set(groups) - set(GROUPS)
+        if unknown:
+            raise ValueError(f"Unknown metric groups: {', '.join(sorted(unknown))}")
+        with self.lock:
+            token = self.next_token
+            self.next_token += 1
+            self.subscribers[token] = (tuple(groups), callback)
+            if self.engine is None:
+                self.engine = CollectionEngine()
+                logging.info("Sampling hub started")
+            for name in groups:
+                if name not in self.engine:
+                    self.add_collector(name)
+            self.engine.add_task(f"subscriber:{token}", interval, lambda: self.deliver(token))
+        logging.info(f"Subscriber {token} added for {', '.join(groups)}")
+        return token
+
+    def add_collector(self, name):
+        timeout = self.timeouts.get(name, DEFAULT_TIMEOUT)
+        if name == "smart_data":
+            self.engine.add_collector(name, self.cadences[name], self.smart.get_smart_data_async, timeout)
+        else:
+            self.engine.add_blocking_collector(name, self.cadences[name], self.collectors[name], timeout)
+
+    def unsubscribe(self, token):
+        with self.lock:
+            if self.subscribers.pop(token, None) is None:
+                return
+            self.engine.remove(f"subscriber:{token}")
+            active = self.active_groups()
+            for name in GROUPS:
+                if name not in active:
+                    self.engine.remove(name)
+            if not self.subscribers:
+                self.log_stats()
+                self.engine.stop()
+                self.engine = None
+                logging.info("Sampling hub stopped")
+        logging.info(f"Subscriber {token} removed")
+
+    def active_groups(self):
+        active = set()
+        for groups, _ in self.subscribers.values():
+            active.update(groups)
+        return active
+
+    def active_collectors(self):
+        """Сборщики, на которые есть хотя бы одна подписка."""
+        with self.lock:
+            active = self.active_groups()
+        return [name for name in GROUPS if name in active]
+
+    def deliver(self, token):
+        with self.lock:
+            subscriber = self.subscribers.get(token)
+            engine = self.engine
+        if subscriber is None or engine is None:
+            return
+        groups, callback = subscriber
+        try:
+            callback(engine.snapshot(groups))
+        except Exception as e:
+            logging.error(f"Subscriber callback error: {str(e)}")
+
+    def stats(self):
+        """Опоздания, пропущенные тики, таймауты и возраст значений по каждому сборщику и подписчику."""
+        with self.lock:
+            return self.engine.stats() if self.engine is not None else {}
+
+    def log_stats(self):
+        for name, stats in self.engine.stats().items():
+            logging.info(f"{name}: runs={stats['runs']}, missed={stats['missed']}, timeouts={stats['timeouts']}, "
+                         f"mean lateness={stats['mean_lateness'] * 1000:.1f} ms, "
+                         f"max lateness={stats['max_lateness'] * 1000:.1f} ms")
+
+
+_hub = None
+_hub_lock = threading.Lock()
+
+
+def get_hub():
+    """Возвращает общий для процесса SamplingHub."""
+    global _hub
+    with _hub_lock:
+        if _hub is None:
+            _hub = SamplingHub()
+        return _hub
@@ -0,0 +1,294 @@
+# inventory.py
+import os
+import re
+import shutil
+import subprocess
+import time
+import threading
+import logging
+
+logging.basicConfig(filename='inventory.log', level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class SysfsValue:
+    """Открытый один раз файл sysfs; значение перечитывается через pread без open/close."""
+
+    def __init__(self, path):
+        self.path = path
+        self.fd = os.open(path, os.O_RDONLY)
+
+    def read_int(self):
+        return int(os.pread(self.fd, 32, 0))
+
+    def close(self):
+        # Повторное закрытие ничего не делает: номер fd мог уже достаться другому файлу
+        if self.fd is None:
+            return
+        try:
+            os.close(self.fd)
+        except OSError:
+            pass
+        self.fd = None
+
+
+class HardwareInventory:
+    """Статические сведения об оборудовании, собранные один раз, и дешёвое чтение сенсоров.
+
+    Сенсоры обнаруживаются заново только при изменении списка устройств
+    hwmon/power_supply: он сверяется раз в hotplug_interval и сразу после
+    ошибки чтения. Нечитаемый сенсор (EIO/ENODATA у некоторых чипов) просто
+    пропускается, остальные значения возвращаются; dmidecode запускается только из ram_freq() —
+    впервые при первом вызове и затем по истечении ttl, так что создание
+    инвентаря его не ждёт. Обнаружение идёт вне self.lock, под ней
+    результаты только подменяются, поэтому чтение сенсоров не ждёт обхода
+    sysfs и тем более dmidecode.
+    """
+
+    def __init__(self, sys_root="/sys", ttl=300, hotplug_interval=10, dmidecode=("dmidecode", "-t", "17")):
+        self.sys_root = sys_root
+        self.ttl = ttl
+        self.hotplug_interval = hotplug_interval
+        self.dmidecode = dmidecode
+        self.ram_speeds = []
+        self.cpu_temp_sensor = None
+        self.temp_sensors = {}
+        self.fan_sensors = {}
+        self.battery = None
+        self.power_supplies = []
+        self.gpu_present = False
+        self.signature = None
+        # None — частоты памяти ещё не запрашивались
+        self.ram_discovered_at = None
+        self.checked_at = 0
+        # Пути сенсоров, об ошибке чтения которых уже предупредили
+        self.unreadable = set()
+        self.read_failed = False
+        self.lock = threading.RLock()
+        # Одно обнаружение за раз; чтения в это время идут по старым сенсорам
+        self.discover_lock = threading.Lock()
+        self.discover()
+
+    def class_dir(self, name):
+        return os.path.join(self.sys_root, "class", name)
+
+    def read_text(self, path):
+        try:
+            with open(path, "r") as f:
+                return f.read().strip()
+        except OSError:
+            return None
+
+    def open_value(self, path):
+        try:
+            return SysfsValue(path)
+        except OSError:
+            return None
+
+    def device_signature(self):
+        signature = []
+        for name in ("hwmon", "power_supply"):
+            try:
+                signature.append(tuple(sorted(os.listdir(self.class_dir(name)))))
+            except OSError:
+                signature.append(())
+        return tuple(signature)
+
+    def close(self):
+        with self.lock:
+            sensors = self.sensors()
+            self.cpu_temp_sensor = None
+            self.temp_sensors = {}
+            self.fan_sensors = {}
+            self.battery = None
+        for sensor in sensors:
+            sensor.close()
+
+    def sensors(self):
+        sensors = list(self.temp_sensors.values()) + list(self.fan_sensors.values())
+        if self.battery:
+            sensors.extend(self.battery)
+        return sensors
+
+    def discover(self):
+        """Обнаруживает сенсоры, блоки питания и GPU вне блокировки и подменяет их под ней."""
+        with self.discover_lock:
+            signature = self.device_signature()
+            temp_sensors, cpu_temp_sensor, fan_sensors = self.discover_hwmon()
+            power_supplies, battery = self.discover_power_supplies()
+            gpu_present = shutil.which("nvidia-smi") is not None
+            with self.lock:
+                old = self.sensors()
+                self.temp_sensors, self.cpu_temp_sensor, self.fan_sensors = temp_sensors, cpu_temp_sensor, fan_sensors
+                self.power_supplies, self.battery = power_supplies, battery
+                self.gpu_present = gpu_present
+                self.signature = signature
+                self.checked_at = time.monotonic()
+            # Старые сенсоры читаются только под self.lock, после подмены они недоступны
+            for sensor in old:
+                sensor.close()
+        logging.info(f"Hardware inventory: {len(temp_sensors)} temperature sensor(s), "
+                     f"{len(fan_sensors)} fan(s), power supplies {power_supplies}, GPU present: {gpu_present}")
+
+    def discover_ram(self):
+        """Частоты модулей памяти из dmidecode (до 10 с), без блокировки чтения сенсоров."""
+        speeds = self.discover_ram_speeds()
+        with self.lock:
+            self.ram_speeds = speeds
+            self.ram_discovered_at = time.monotonic()
+        logging.info(f"RAM inventory: {len(speeds)} DIMM(s)")
+
+    def discover_ram_speeds(self):
+        if not self.dmidecode:
+            return []
+        try:
+            result = subprocess.run(list(self.dmidecode), capture_output=True, text=True, timeout=10)
+            speeds = []
+            for line in result.stdout.splitlines():
+                if "Speed" in line and ("MHz" in line or "MT/s" in line):
+                    value = line.split(":")[1].strip().split()[0]
+                    if value.isdigit():
+                        speeds.append(value)
+            return speeds
+        except Exception as e:
+            logging.error(f"RAM speed discovery error: {str(e)}")
+            return []
+
+    def discover_hwmon(self):
+        """(датчики температуры, датчик CPU, вентиляторы) из /sys/class/hwmon."""
+        temp_sensors, cpu_temp_sensor, fan_sensors = {}, None, {}
+        hwmon_dir = self.class_dir("hwmon")
+        try:
+            chips = sorted(os.listdir(hwmon_dir), key=lambda d: int(re.sub(r"\D", "", d) or 0))
+        except OSError:
+            return temp_sensors, cpu_temp_sensor, fan_sensors
+        for chip in chips:
+            chip_dir = os.path.join(hwmon_dir, chip)
+            name = self.read_text(os.path.join(chip_dir, "name")) or chip
+            try:
+                files = sorted(os.listdir(chip_dir))
+            except OSError:
+                continue
+            fans = [f for f in files if re.fullmatch(r"fan\d+_input", f)]
+            for filename in files:
+                match = re.fullmatch(r"temp(\d+)_input", filename)
+                if not match:
+                    continue
+                label = self.read_text(os.path.join(chip_dir, f"temp{match.group(1)}_label")) or ""
+                sensor = self.open_value(os.path.join(chip_dir, filename))
+                if sensor is None:
+                    continue
+                temp_sensors[(name, label or f"temp{match.group(1)}")] = sensor
+                if cpu_temp_sensor is None and ("coretemp" in name.lower() or "cpu" in label.lower()):
+                    cpu_temp_sensor = sensor
+            for filename in fans:
+                index = filename[3:].split("_")[0]
+                label = self.read_text(os.path.join(chip_dir, f"fan{index}_label"))
+                sensor = self.open_value(os.path.join(chip_dir, filename))
+                if sensor is None:
+                    continue
+                key = name if len(fans) == 1 else f"{name} {label or 'fan' + index}"
+                fan_sensors[key] = sensor
+        return temp_sensors, cpu_temp_sensor, fan_sensors
+
+    def discover_power_supplies(self):
+        """(имена блоков питания, датчики мощности батареи или None)."""
+        supply_dir = self.class_dir("power_supply")
+        try:
+            supplies = sorted(os.listdir(supply_dir))
+        except OSError:
+            supplies = []
+        for supply in supplies:
+            path = os.path.join(supply_dir, supply)
+            if self.read_text(os.path.join(path, "type")) != "Battery":
+                continue
+            power = self.open_value(os.path.join(path, "power_now"))
+            if power is not None:
+                return supplies, (power,)
+            current = self.open_value(os.path.join(path, "current_now"))
+            voltage = self.open_value(os.path.join(path, "voltage_now"))
+            if current is not None and voltage is not None:
+                return supplies, (current, voltage)
+            for sensor in (current, voltage):
+                if sensor is not None:
+                    sensor.close()
+        return supplies, None
+
+    def refresh(self, force=False):
+        """Повторное обнаружение сенсоров при подключении/отключении устройств; True, если оно было."""
+        now = time.monotonic()
+        if not force and now - self.checked_at < self.hotplug_interval:
+            return False
+        self.checked_at = now
+        if self.device_signature() == self.signature:
+            return False
+        logging.info("Hardware change detected, re-discovering inventory")
+        self.discover()
+        return True
+
+    def read(self, reader):
+        # Сенсоры читаются из нескольких потоков сборщиков; под блокировкой — только само чтение
+        self.refresh()
+        with self.lock:
+            self.read_failed = False
+            value = reader()
+            failed = self.read_failed
+        # Устройство могло пропасть между проверками: сверяем список сразу и при изменении читаем заново
+        if failed and self.refresh(force=True):
+            with self.lock:
+                value = reader()
+        return value
+
+    def read_value(self, sensor):
+        """sensor.read_int() или None, если файл не читается; вызывается из reader() под self.lock."""
+        try:
+            return sensor.read_int()
+        except (OSError, ValueError) as e:
+            self.read_failed = True
+            if sensor.path not in self.unreadable:
+                self.unreadable.add(sensor.path)
+                logging.warning(f"Cannot read sensor {sensor.path} ({str(e)}), skipping it")
+            return None
+
+    def read_values(self, sensors):
+        """{ключ: значение} читаемых сенсоров; нечитаемые пропускаются."""
+        values = {}
+        for key, sensor in sensors.items():
+            value = self.read_value(sensor)
+            if value is not None:
+                values[key] = value
+        return values
+
+    def read_cpu_temp(self):
+        """Температура CPU в °C или None."""
+        def reader():
+            value = self.read_value(self.cpu_temp_sensor) if self.cpu_temp_sensor else None
+            return value / 1000 if value is not None else None
+        return self.read(reader)
+
+    def read_temperatures(self):
+        """Читаемые температурные сенсоры: {(chip, label): °C}."""
+        return {key: value / 1000 for key, value in self.read(lambda: self.read_values(self.temp_sensors)).items()}
+
+    def read_fan_speeds(self):
+        """Обороты читаемых вентиляторов: {name: RPM}."""
+        return self.read(lambda: self.read_values(self.fan_sensors))
+
+    def read_power(self):
+        """Мощность батареи в ваттах или None."""
+        def reader():
+            if self.battery is None:
+                return None
+            values = [self.read_value(sensor) for sensor in self.battery]
+            if None in values:
+                return None
+            if len(values) == 1:
+                return values[0] / 1000000
+            return values[0] * values[1] / 1e12
+        return self.read(reader)
+
+    def ram_freq(self):
+        # dmidecode запускается только здесь, в потоке сборщика ram_freq
+        if self.ram_discovered_at is None or time.monotonic() - self.ram_discovered_at >= self.ttl:
+            self.discover_ram()
+        with self.lock:
+            return self.ram_speeds[0] if self.ram_speeds else None
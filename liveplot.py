@@ -0,0 +1,149 @@
+# liveplot.py
+import collections
+import time
+import logging
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+logging.basicConfig(filename='liveplot.log', level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class LivePlot:
+    """График последних maxlen значений, обновляемый через blitting.
+
+    Оси, подписи, легенда и линия создаются один раз. Новое значение меняет
+    только данные линии (set_data): из кэша восстанавливается фон осей и
+    перерисовывается одна линия (blit). Полная перерисовка нужна только при
+    выходе данных за текущие пределы по Y, изменении размера окна или
+    возврате из режима истории. Кадры чаще fps в секунду откладываются и
+    объединяются в один.
+    """
+
+    def __init__(self, master, label, ylabel, ylim=None, maxlen=30, fps=10, color="green", figsize=(6, 2)):
+        self.master = master
+        self.label = label
+        self.ylabel = ylabel
+        self.ylim = ylim
+        self.maxlen = maxlen
+        self.min_interval = 1.0 / fps
+        self.color = color
+        self.values = collections.deque(maxlen=maxlen)
+        # Ось X — секунды назад от последнего значения, поэтому её пределы не меняются
+        self.x = np.arange(-maxlen + 1, 1, dtype=np.float64)
+        self.fig, self.ax = plt.subplots(figsize=figsize)
+        self.canvas = FigureCanvasTkAgg(self.fig, master=master)
+        self.background = None
+        self.attached = True
+        self.pending = None
+        self.last_frame = 0.0
+        self.frames = 0
+        self.full_redraws = 0
+        self.coalesced = 0
+        self.frame_time = 0.0
+        self.max_frame_time = 0.0
+        self.setup_axes()
+        self.canvas.mpl_connect("draw_event", self.on_draw)
+
+    def setup_axes(self):
+        self.ax.clear()
+        (self.line,) = self.ax.plot([], [], label=self.label, color=self.color, animated=True)
+        self.ax.set_xlim(self.x[0], self.x[-1])
+        self.ax.set_ylim(*(self.ylim or (0, 1)))
+        self.ax.set_xlabel("Time (s)")
+        self.ax.set_ylabel(self.ylabel)
+        self.ax.legend(loc="upper left")
+        self.update_line()
+
+    def get_tk_widget(self):
+        return self.canvas.get_tk_widget()
+
+    def on_draw(self, event):
+        # Любая полная перерисовка (в том числе при изменении размера) обновляет кэш фона
+        if not self.attached:
+            return
+        self.background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self.ax.draw_artist(self.line)
+
+    def update_line(self):
+        values = np.fromiter(self.values, dtype=np.float64, count=len(self.values))
+        self.line.set_data(self.x[len(self.x) - len(values):], values)
+        return values
+
+    def append(self, value, draw=True):
+        """Добавляет значение; draw=False только копит данные (например, в режиме истории)."""
+        self.values.append(value)
+        if draw and self.attached:
+            self.request_frame()
+
+    def request_frame(self):
+        if self.pending is not None:
+            self.coalesced += 1
+            return
+        delay = self.last_frame + self.min_interval - time.monotonic()
+        if delay > 0:
+            self.coalesced += 1
+            self.pending = self.master.after(int(delay * 1000) + 1, self.frame)
+        else:
+            self.frame()
+
+    def frame(self):
+        self.pending = None
+        if not self.attached:
+            return
+        started = time.perf_counter()
+        values = self.update_line()
+        if self.needs_rescale(values) or self.background is None:
+            self.full_redraws += 1
+            self.canvas.draw()
+        else:
+            self.canvas.restore_region(self.background)
+            self.ax.draw_artist(self.line)
+            self.canvas.blit(self.ax.bbox)
+        elapsed = time.perf_counter() - started
+        self.last_frame = time.monotonic()
+        self.frames += 1
+        self.frame_time += elapsed
+        self.max_frame_time = max(self.max_frame_time, elapsed)
+
+    def needs_rescale(self, values):
+        """Расширяет пределы по Y, если данные вышли за них; возвращает True при изменении."""
+        if self.ylim is not None or not len(values):
+            return False
+        finite = values[np.isfinite(values)]
+        if not len(finite):
+            return False
+        bottom, top = self.ax.get_ylim()
+        low, high = min(0.0, finite.min()), finite.max()
+        if low >= bottom and high <= top:
+            return False
+        self.ax.set_ylim(low, high * 1.2 if high > 0 else 1)
+        return True
+
+    def detach(self):
+        """Освобождает оси для другого содержимого (график истории)."""
+        self.attached = False
+        self.cancel()
+
+    def attach(self):
+        """Возвращает живой график на оси после detach()."""
+        self.attached = True
+        self.background = None
+        self.setup_axes()
+        self.frame()
+
+    def cancel(self):
+        if self.pending is not None:
+            self.master.after_cancel(self.pending)
+            self.pending = None
+
+    def stats(self):
+        """Число кадров, полных перерисовок, объединённых запросов и время кадра в потоке Tk."""
+        return {
+            "mode": "tk",
+            "frames": self.frames,
+            "full_redraws": self.full_redraws,
+            "coalesced": self.coalesced,
+            "mean_frame_ms": self.frame_time / self.frames * 1000 if self.frames else 0.0,
+            "max_frame_ms": self.max_frame_time * 1000
+        }
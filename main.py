@@ -1,8 +1,7 @@
 # main.py
-import customtkinter as ctk
+from startup import mark, marked, report
 import signal
 import sys
-import tkinter as tk
 import logging
 
 logging.basicConfig(filename='app.log', level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -13,14 +12,25 @@ def signal_handler(sig, frame):
     sys.exit(0)
 
 if __name__ == "__main__":
+    # python main.py collect|stress ... — режим без интерфейса, Tk не загружается
+    if len(sys.argv) > 1 and sys.argv[1] in ("collect", "stress"):
+        from headless import main
+        sys.exit(main())
+
+    # python main.py --startup-report — печатает время этапов запуска после первого снимка метрик
+    startup_report = "--startup-report" in sys.argv
+    # python main.py --render=thread|process — живые графики рисуются вне потока Tk (offthread.py)
+    render_mode = next((arg.split("=", 1)[1] for arg in sys.argv if arg.startswith("--render=")), None)
+
+    import customtkinter as ctk
+    mark("customtkinter imported")
+
     logging.info("Starting application")
     try:
         signal.signal(signal.SIGINT, signal_handler)
-
-        logging.info("Testing tkinter")
-        root_test = tk.Tk()
-        root_test.destroy()
-        logging.info("tkinter test passed")
+        if render_mode is not None:
+            from offthread import set_mode
+            set_mode(render_mode)
 
         logging.info("Initializing CustomTkinter")
         ctk.set_appearance_mode("dark")
@@ -28,6 +38,7 @@ if __name__ == "__main__":
         root = ctk.CTk()
         root.title("System Stress Test")
         logging.info("CustomTkinter window created")
+        mark("window created")
 
         # Добавляем скроллбар
         canvas = ctk.CTkCanvas(root, bg="#2b2b2b")  # Задаем фон для отладки
@@ -56,7 +67,9 @@ if __name__ == "__main__":
 
         # Главное окно
         from ui import MainApp
+        mark("ui imported")
         app = MainApp(scrollable_frame)  # Передаем scrollable_frame
+        mark("metrics table built")
         logging.info("MainApp initialized")
 
         # Устанавливаем минимальный размер окна
@@ -69,6 +82,18 @@ if __name__ == "__main__":
         logging.info(f"CustomTkinter version: {ctk.__version__}")
         print(f"CustomTkinter version: {ctk.__version__}")
 
+        # Первая отрисовка — когда цикл Tk впервые свободен; отчёт — когда таблица заполнена
+        root.after_idle(lambda: mark("first paint"))
+
+        def log_startup():
+            if not marked("first metrics"):
+                root.after(100, log_startup)
+                return
+            logging.info(f"Startup timing:\n{report()}")
+            if startup_report:
+                print(report())
+        root.after(100, log_startup)
+
         root.mainloop()
         logging.info("Main loop exited")
     except Exception as e:
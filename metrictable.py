@@ -0,0 +1,107 @@
+# metrictable.py
+"""Таблица меток для окон метрик без лишней работы Tk на каждом тике.
+
+Виджеты строк создаются один раз и переиспользуются, пока набор строк
+(метрик, дисков) не меняется; для каждой ячейки хранится последний
+показанный текст, и configure вызывается только для изменившихся ячеек.
+Если набор строк изменился, новые строки создаются, исчезнувшие удаляются,
+а grid вызывается только для строк, сменивших позицию, — одним проходом,
+так что Tk пересчитывает геометрию один раз на следующем idle.
+"""
+import time
+import logging
+
+logging.basicConfig(filename='metrictable.log', level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+
+MIN_MAX_HEADERS = ("Metric", "Min", "Current", "Max")
+
+
+def min_max_rows(metrics):
+    """Строки таблицы Min/Current/Max из словаря метрик окна {имя: {"min", "current", "max"}}."""
+    return [(name, (name, f"{values['min']:.1f}", f"{values['current']:.1f}", f"{values['max']:.1f}"))
+            for name, values in metrics.items()]
+
+
+class TextLabel:
+    """Одиночная метка, которая перенастраивается только при изменении текста."""
+
+    def __init__(self, label):
+        self.label = label
+        self.text = label.cget("text")
+
+    def set(self, text):
+        if text != self.text:
+            self.text = text
+            self.label.configure(text=text)
+
+    def pack(self, **kwargs):
+        self.label.pack(**kwargs)
+
+
+class MetricTable:
+    """Сетка меток: заголовок и строки по ключу с кэшем текста ячеек."""
+
+    def __init__(self, master, headers, font=("Roboto", 12)):
+        import customtkinter as ctk
+
+        self.ctk = ctk
+        self.font = font
+        self.frame = ctk.CTkFrame(master)
+        self.columns = len(headers)
+        for column, header in enumerate(headers):
+            ctk.CTkLabel(self.frame, text=header, font=(font[0], font[1], "bold")).grid(row=0, column=column, padx=5, pady=2)
+        self.cells = {}
+        self.texts = {}
+        self.positions = {}
+        self.renders = 0
+        self.cell_updates = 0
+        self.relayouts = 0
+        self.render_time = 0.0
+        self.last_render = 0.0
+
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+
+    def update(self, rows):
+        """Показывает rows — список (ключ, тексты ячеек) в порядке строк."""
+        started = time.perf_counter()
+        keys = [key for key, _ in rows]
+        if keys != list(self.positions):
+            self.relayout(keys)
+        for key, texts in rows:
+            cached = self.texts[key]
+            cells = self.cells[key]
+            for column, text in enumerate(texts):
+                text = str(text)
+                if text != cached[column]:
+                    cached[column] = text
+                    cells[column].configure(text=text)
+                    self.cell_updates += 1
+        self.renders += 1
+        self.last_render = time.perf_counter() - started
+        self.render_time += self.last_render
+
+    def relayout(self, keys):
+        """Приводит набор строк к keys: создаёт новые, удаляет исчезнувшие, перемещает сдвинутые."""
+        for key in [key for key in self.positions if key not in keys]:
+            for cell in self.cells.pop(key):
+                cell.destroy()
+            del self.texts[key]
+            del self.positions[key]
+        positions = {}
+        for row, key in enumerate(keys, start=1):
+            if key not in self.cells:
+                self.cells[key] = [self.ctk.CTkLabel(self.frame, text="", font=self.font) for _ in range(self.columns)]
+                self.texts[key] = [""] * self.columns
+            if self.positions.get(key) != row:
+                for column, cell in enumerate(self.cells[key]):
+                    cell.grid(row=row, column=column, padx=5, pady=2)
+            positions[key] = row
+        self.positions = positions
+        self.relayouts += 1
+
+    def stats(self):
+        return {"renders": self.renders, "rows": len(self.positions), "relayouts": self.relayouts,
+                "cell_updates": self.cell_updates,
+                "mean_render_ms": self.render_time / self.renders * 1000 if self.renders else 0.0,
+                "last_render_ms": self.last_render * 1000}
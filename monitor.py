@@ -1,21 +1,59 @@
 # monitor.py
 import psutil
-import subprocess
 import time
 import logging
 import platform
 import os
+from array import array
+from inventory import HardwareInventory
+from proctable import ProcessTable
+from gpu import get_gpu_reader
+from rates import RateEngine
+from procfs import (ProcReader, online_cpu_count, FIELDS, MEM_USED, MEM_PERCENT, NET_BYTES_RECV, NET_BYTES_SENT,
+                    DISK_READS, DISK_READ_BYTES, DISK_WRITES, DISK_WRITE_BYTES, DISK_UNITS)
 
 logging.basicConfig(filename='monitor.log', level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 
 class SystemMonitor:
-    def __init__(self):
+    def __init__(self, backend="auto", proc_root="/proc", sys_root="/sys"):
         self.running = True
-        self.net_io = psutil.net_io_counters()
-        self.disk_io = psutil.disk_io_counters()
+        self.proc = None
+        if backend in ("auto", "procfs") and platform.system() == "Linux":
+            try:
+                self.proc = ProcReader(proc_root, sys_root)
+            except OSError as e:
+                logging.warning(f"procfs backend unavailable, falling back to psutil: {str(e)}")
+                if backend == "procfs":
+                    raise
+        self.inventory = HardwareInventory(sys_root) if platform.system() == "Linux" else None
+        self.process_table = ProcessTable()
+        # На Linux и procfs, и psutil считают байты дисков из секторов /proc/diskstats
+        self.disk_rates = RateEngine(FIELDS, units=DISK_UNITS if platform.system() == "Linux" else None)
+        self.net_rates = RateEngine(FIELDS)
+        self.get_disk_io()
+        self.get_net_info()
 
     def get_cpu_usage(self):
-        return psutil.cpu_percent(percpu=True)
+        if self.proc is not None:
+            try:
+                return self.proc.cpu_percent().tolist()
+            except (OSError, ValueError, IndexError) as e:
+                logging.error(f"get_cpu_usage error: {str(e)}")
+        try:
+            return psutil.cpu_percent(percpu=True)
+        except Exception as e:
+            logging.error(f"get_cpu_usage error: {str(e)}")
+            return []
+
+    def cpu_count(self):
+        """Число значений, которое возвращает get_cpu_usage (без чтения самих счётчиков)."""
+        if self.proc is not None:
+            try:
+                return online_cpu_count(self.proc.proc_root)
+            except OSError as e:
+                logging.error(f"cpu_count error: {str(e)}")
+        # cpu_times не трогает состояние psutil.cpu_percent, которым пользуется get_cpu_usage
+        return len(psutil.cpu_times(percpu=True))
 
     def get_cpu_freq(self):
         try:
@@ -27,12 +65,9 @@ class SystemMonitor:
 
     def get_cpu_temp(self):
         try:
-            if platform.system() == "Linux":
-                temps = psutil.sensors_temperatures()
-                for name, entries in temps.items():
-                    for entry in entries:
-                        if "coretemp" in name.lower() or "cpu" in entry.label.lower():
-                            return f"{entry.current:.1f}"
+            if self.inventory is not None:
+                temp = self.inventory.read_cpu_temp()
+                return f"{temp:.1f}" if temp is not None else "N/A"
             elif platform.system() == "Windows":
                 # Требуется дополнительная библиотека, например, wmi
                 return "N/A"
@@ -43,16 +78,31 @@ class SystemMonitor:
 
     def get_fan_speeds(self):
         try:
-            if platform.system() == "Linux":
-                fans = psutil.sensors_fans()
-                return {name: entry.current for name, entries in fans.items() for entry in entries}
+            if self.inventory is not None:
+                return self.inventory.read_fan_speeds()
             return {}
         except Exception as e:
             logging.error(f"get_fan_speeds error: {str(e)}")
             return {}
 
+    def get_temperatures(self):
+        """Все датчики температуры hwmon: {"chip label": °C}."""
+        try:
+            if self.inventory is not None:
+                return {f"{chip} {label}": temp for (chip, label), temp in self.inventory.read_temperatures().items()}
+            return {}
+        except Exception as e:
+            logging.error(f"get_temperatures error: {str(e)}")
+            return {}
+
     def get_ram_info(self):
         try:
+            if self.proc is not None:
+                mem = self.proc.memory()
+                return {
+                    "percent": mem[MEM_PERCENT],
+                    "used": mem[MEM_USED] / (1024 ** 3)
+                }
             mem = psutil.virtual_memory()
             return {
                 "percent": mem.percent,
@@ -64,11 +114,8 @@ class SystemMonitor:
 
     def get_ram_freq(self):
         try:
-            if platform.system() == "Linux":
-                result = subprocess.run(["dmidecode", "-t", "17"], capture_output=True, text=True)
-                for line in result.stdout.splitlines():
-                    if "Speed" in line and "MHz" in line:
-                        return line.split(":")[1].strip().split()[0]
+            if self.inventory is not None:
+                return self.inventory.ram_freq() or "N/A"
             return "N/A"
         except Exception as e:
             logging.error(f"get_ram_freq error: {str(e)}")
@@ -82,29 +129,66 @@ class SystemMonitor:
             logging.error(f"get_disk_usage error: {str(e)}")
             return {"percent": 0}
 
+    def read_disk_devices(self):
+        """(имена дисков, счётчики procfs.FIELDS на каждый диск)."""
+        if self.proc is not None:
+            names, counters, _ = self.proc.disk_io()
+            return names, counters
+        disks = psutil.disk_io_counters(perdisk=True) or {}
+        counters = array("d")
+        for io in disks.values():
+            counters.extend((io.read_count, io.read_bytes, io.write_count, io.write_bytes))
+        return tuple(disks), counters
+
+    def read_net_devices(self):
+        """(имена интерфейсов, счётчики procfs.FIELDS на каждый интерфейс)."""
+        if self.proc is not None:
+            names, counters, _ = self.proc.net_io()
+            return names, counters
+        nics = psutil.net_io_counters(pernic=True)
+        counters = array("d")
+        for io in nics.values():
+            counters.extend((io.bytes_recv, io.packets_recv, io.bytes_sent, io.packets_sent))
+        return tuple(nics), counters
+
+    def is_whole_disk(self, name):
+        # В сумму входят только целые диски, иначе разделы посчитаются дважды
+        if self.proc is not None:
+            return self.proc.is_storage_device(name)
+        if platform.system() == "Linux":
+            return os.path.exists(f"/sys/block/{name.replace('/', '!')}")
+        return True
+
     def get_disk_io(self):
+        """Скорости в МБ/с и IOPS: суммарно по дискам и по каждому устройству в "devices"/"rates"."""
         try:
-            new_io = psutil.disk_io_counters()
-            read_bytes = (new_io.read_bytes - self.disk_io.read_bytes) / (1024 ** 2)
-            write_bytes = (new_io.write_bytes - self.disk_io.write_bytes) / (1024 ** 2)
-            self.disk_io = new_io
-            return {"read_bytes": read_bytes, "write_bytes": write_bytes}
+            self.disk_rates.update(*self.read_disk_devices())
+            totals = self.disk_rates.totals(self.is_whole_disk)
+            devices, rates = self.disk_rates.snapshot()
+            return {
+                "read_bytes": totals[DISK_READ_BYTES] / (1024 ** 2),
+                "write_bytes": totals[DISK_WRITE_BYTES] / (1024 ** 2),
+                "read_iops": totals[DISK_READS],
+                "write_iops": totals[DISK_WRITES],
+                "devices": devices,
+                "rates": rates
+            }
         except Exception as e:
             logging.error(f"get_disk_io error: {str(e)}")
-            return {"read_bytes": 0, "write_bytes": 0}
+            return {"read_bytes": 0, "write_bytes": 0, "read_iops": 0, "write_iops": 0}
 
     def get_gpu_info(self):
         try:
-            if platform.system() == "Linux":
-                result = subprocess.run(["nvidia-smi", "--query-gpu=utilization.gpu,utilization.memory,temperature.gpu", "--format=csv"],
-                                       capture_output=True, text=True)
-                lines = result.stdout.splitlines()
-                if len(lines) > 1:
-                    data = lines[1].split(", ")
+            reader = get_gpu_reader() if self.inventory is not None and self.inventory.gpu_present else None
+            if reader is not None:
+                gpus = reader.gpus()
+                if gpus:
+                    first = gpus[min(gpus)]
                     return {
-                        "usage": data[0].replace(" %", ""),
-                        "memory": data[1].replace(" %", ""),
-                        "temp": data[2]
+                        "usage": first["usage"],
+                        "memory": first["memory"],
+                        "temp": first["temp"],
+                        "gpus": [dict(gpus[index], index=index) for index in sorted(gpus)]
                     }
             return {"usage": "N/A", "memory": "N/A", "temp": "N/A"}
         except Exception as e:
@@ -112,41 +196,51 @@ class SystemMonitor:
             return {"usage": "N/A", "memory": "N/A", "temp": "N/A"}
 
     def get_net_info(self):
+        """Скорости в МБ/с: суммарно по интерфейсам и по каждому интерфейсу в "nics"/"rates"."""
         try:
-            new_io = psutil.net_io_counters()
-            bytes_sent = (new_io.bytes_sent - self.net_io.bytes_sent) / (1024 ** 2)
-            bytes_recv = (new_io.bytes_recv - self.net_io.bytes_recv) / (1024 ** 2)
-            self.net_io = new_io
-            return {"bytes_sent": bytes_sent, "bytes_recv": bytes_recv}
+            self.net_rates.update(*self.read_net_devices())
+            totals = self.net_rates.totals()
+            nics, rates = self.net_rates.snapshot()
+            return {
+                "bytes_sent": totals[NET_BYTES_SENT] / (1024 ** 2),
+                "bytes_recv": totals[NET_BYTES_RECV] / (1024 ** 2),
+                "nics": nics,
+                "rates": rates
+            }
         except Exception as e:
             logging.error(f"get_net_info error: {str(e)}")
             return {"bytes_sent": 0, "bytes_recv": 0}
 
     def get_power_info(self):
         try:
-            if platform.system() == "Linux":
-                with open("/sys/class/power_supply/BAT0/power_now", "r") as f:
-                    return f"{int(f.read()) / 1000000:.1f}"
+            if self.inventory is not None:
+                power = self.inventory.read_power()
+                return f"{power:.1f}" if power is not None else "N/A"
             return "N/A"
         except Exception as e:
             logging.error(f"get_power_info error: {str(e)}")
             return "N/A"
 
-    def get_top_processes(self):
+    def get_top_processes(self, n=5, key="cpu"):
+        """n процессов с наибольшим key; n=None — все процессы со всеми столбцами."""
         try:
-            processes = []
-            for proc in psutil.process_iter(['name', 'cpu_percent', 'memory_percent']):
-                processes.append({
-                    "name": proc.info['name'],
-                    "cpu": proc.info['cpu_percent'],
-                    "memory": proc.info['memory_percent']
-                })
-            return sorted(processes, key=lambda x: x['cpu'], reverse=True)[:5]
+            self.process_table.update(key, full=n is None)
+            return self.process_table.top(n, key)
         except Exception as e:
             logging.error(f"get_top_processes error: {str(e)}")
             return []
 
+    def get_process_table(self):
+        """Полная таблица процессов (ProcessSnapshot) с изменениями относительно прошлого вызова."""
+        try:
+            self.process_table.update(full=True)
+            return self.process_table.snapshot()
+        except Exception as e:
+            logging.error(f"get_process_table error: {str(e)}")
+            return None
+
     def monitor_loop(self, callback, interval):
+        next_tick = time.monotonic()
         while self.running:
             try:
                 cpu_usage = self.get_cpu_usage()
@@ -165,7 +259,12 @@ class SystemMonitor:
                 callback(cpu_usage, cpu_freq, cpu_temp, fan_speeds, ram_info, ram_freq, disk_usage, disk_io, gpu_info, net_info, power_info, top_processes)
             except Exception as e:
                 logging.error(f"monitor_loop error: {str(e)}")
-            time.sleep(interval)
+            # Период отсчитывается от дедлайна, а не от конца сбора, чтобы цикл не дрейфовал
+            next_tick += interval
+            now = time.monotonic()
+            if next_tick < now:
+                next_tick += (now - next_tick) // interval * interval + interval
+            time.sleep(next_tick - now)
 
     def stop(self):
         self.running = False
\ No newline at end of file
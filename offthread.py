@@ -0,0 +1,561 @@
+# offthread.py
+"""Отрисовка живых графиков и карты загрузки ядер вне потока Tk.
+
+Режимы (python main.py --render=tk|thread|process):
+
+    tk       LivePlot: Agg рисует в потоке Tk через FigureCanvasTkAgg (по умолчанию)
+    thread   фигуры всех окон рисует один рабочий поток
+    process  фигуры всех окон рисует отдельный процесс, GIL потока Tk не занят
+
+Вне потока Tk у каждого графика своя фигура на FigureCanvasAgg (без pyplot)
+с тем же blitting, что у LivePlot и CoreHeatmap. Готовый кадр RGBA кладётся в почтовый
+ящик графика (refresh.Mailbox). У графика всегда не больше одного кадра в
+работе: пока он рисуется, новые запросы не ставятся в очередь, а объединяются
+в один следующий (coalesced в stats()). Поток Tk только отдаёт значения и вставляет
+готовый кадр в один PhotoImage (ImageTk.PhotoImage.paste).
+
+График истории (historyplot.HistoryPlot) интерактивен и рисуется по
+событиям мыши, поэтому на время просмотра истории OffThreadPlot показывает
+обычный FigureCanvasTkAgg вместо картинки.
+
+stats() всех видов в mean_frame_ms сообщает время кадра в потоке Tk, включая
+объединённые запросы и пустые опросы перед кадром; python offthread.py bench сравнивает его для режимов без окна.
+"""
+import argparse
+import collections
+import queue
+import sys
+import threading
+import time
+import logging
+from refresh import Mailbox
+
+logging.basicConfig(filename='offthread.log', level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+
+RENDER_MODES = ("tk", "thread", "process")
+# Как часто поток Tk проверяет, готов ли запрошенный кадр, мс
+POLL_MS = 10
+# Сколько поток Tk ждёт запрошенный кадр, прежде чем считать его потерянным, с
+FRAME_TIMEOUT = 5
+DPI = 100
+
+render_mode = "tk"
+
+
+def set_mode(mode):
+    """Выбирает режим отрисовки для графиков, создаваемых после вызова."""
+    global render_mode
+    if mode not in RENDER_MODES:
+        raise ValueError(f"Unknown render mode: {mode}")
+    render_mode = mode
+    logging.info(f"Plot render mode: {mode}")
+
+
+def live_plot(master, label, ylabel, ylim=None, **kwargs):
+    """Живой график окна в текущем режиме: LivePlot или OffThreadPlot."""
+    if render_mode == "tk":
+        from liveplot import LivePlot
+        return LivePlot(master, label, ylabel, ylim=ylim, **kwargs)
+    return OffThreadPlot(master, label, ylabel, get_renderer(), ylim=ylim, **kwargs)
+
+
+def core_heatmap(master, cores, topology=None, **kwargs):
+    """Карта загрузки ядер в текущем режиме: CoreHeatmap или OffThreadHeatmap."""
+    if render_mode == "tk":
+        from heatmap import CoreHeatmap
+        return CoreHeatmap(master, cores, topology=topology, **kwargs)
+    return OffThreadHeatmap(master, cores, get_renderer(), topology=topology, **kwargs)
+
+
+class AggRenderer:
+    """Фигура на FigureCanvasAgg без Tk с кэшем фона для blitting.
+
+    Подкласс создаёт оси и animated-артисты (self.artists) и определяет
+    update(payload): меняет данные артистов и возвращает True, если нужно
+    перерисовать фон (например, сменились пределы осей).
+    """
+
+    def __init__(self, spec):
+        import numpy as np
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+        self.np = np
+        self.figure = Figure(figsize=spec["figsize"], dpi=spec["dpi"])
+        self.canvas = FigureCanvasAgg(self.figure)
+        self.artists = []
+        self.background = None
+
+    def render(self, payload):
+        """Кадр (ширина, высота, байты RGBA) для новых данных."""
+        if self.update(payload) or self.background is None:
+            # animated-артисты в фон не попадают
+            self.canvas.draw()
+            self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+        else:
+            self.canvas.restore_region(self.background)
+        for artist in self.artists:
+            artist.axes.draw_artist(artist)
+        # Буфер холста переписывается следующим кадром, отдаём копию
+        buffer = self.np.asarray(self.canvas.buffer_rgba())
+        height, width = buffer.shape[:2]
+        return width, height, buffer.tobytes()
+
+
+class FigureRenderer(AggRenderer):
+    """Живой график: разметка как у LivePlot, данные — последние значения."""
+
+    def __init__(self, spec):
+        super().__init__(spec)
+        np = self.np
+        self.ylim = spec["ylim"]
+        self.x = np.arange(-spec["maxlen"] + 1, 1, dtype=np.float64)
+        self.ax = self.figure.add_subplot()
+        (self.line,) = self.ax.plot([], [], label=spec["label"], color=spec["color"], animated=True)
+        self.ax.set_xlim(self.x[0], self.x[-1])
+        self.ax.set_ylim(*(self.ylim or (0, 1)))
+        self.ax.set_xlabel("Time (s)")
+        self.ax.set_ylabel(spec["ylabel"])
+        self.ax.legend(loc="upper left")
+        self.artists = [self.line]
+
+    def update(self, values):
+        self.line.set_data(self.x[len(self.x) - len(values):], values)
+        return self.needs_rescale(values)
+
+    def needs_rescale(self, values):
+        """Как LivePlot.needs_rescale: расширяет пределы по Y, если данные вышли за них."""
+        np = self.np
+        if self.ylim is not None or not len(values):
+            return False
+        finite = values[np.isfinite(values)]
+        if not len(finite):
+            return False
+        bottom, top = self.ax.get_ylim()
+        low, high = min(0.0, finite.min()), finite.max()
+        if low >= bottom and high <= top:
+            return False
+        self.ax.set_ylim(low, high * 1.2 if high > 0 else 1)
+        return True
+
+
+class HeatmapRenderer(AggRenderer):
+    """Карта загрузки ядер: разметка как у heatmap.CoreHeatmap, данные — матрица секунды × ядра."""
+
+    def __init__(self, spec):
+        super().__init__(spec)
+        from heatmap import setup_heatmap
+
+        empty = self.np.full((spec["seconds"], spec["cores"]), self.np.nan, dtype=self.np.float32)
+        self.ax = self.figure.add_subplot()
+        self.image, separators = setup_heatmap(self.figure, self.ax, empty, spec["topology"], spec["cmap"])
+        self.artists = [self.image] + separators
+
+    def update(self, matrix):
+        self.image.set_data(matrix.T)
+        return False
+
+
+RENDERERS = {"line": FigureRenderer, "heatmap": HeatmapRenderer}
+
+
+def render_frame(renderers, plot_id, values):
+    """Кадр графика plot_id с временем отрисовки; при ошибке — кадр без данных, чтобы график не ждал вечно."""
+    started = time.perf_counter()
+    try:
+        width, height, rgba = renderers[plot_id].render(values)
+    except Exception as e:
+        logging.error(f"Render error for plot {plot_id}: {str(e)}")
+        width, height, rgba = 0, 0, None
+    return width, height, rgba, time.perf_counter() - started
+
+
+class ThreadRenderer:
+    """Один рабочий поток, который рисует фигуры всех графиков."""
+
+    def __init__(self):
+        self.requests = queue.Queue()
+        self.mailboxes = {}
+        self.next_id = 0
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.run, name="plot-renderer", daemon=True)
+        self.thread.start()
+        logging.info("Thread renderer started")
+
+    def register(self, spec, mailbox):
+        """Регистрирует график; готовые кадры будут класться в mailbox. Возвращает id графика."""
+        with self.lock:
+            plot_id = self.next_id
+            self.next_id += 1
+            self.mailboxes[plot_id] = mailbox
+        self.requests.put(("register", plot_id, spec))
+        return plot_id
+
+    def submit(self, plot_id, values):
+        self.requests.put(("render", plot_id, values))
+
+    def unregister(self, plot_id):
+        with self.lock:
+            self.mailboxes.pop(plot_id, None)
+        self.requests.put(("close", plot_id, None))
+
+    def alive(self):
+        return self.thread.is_alive()
+
+    def run(self):
+        serve(self.requests, self.deliver)
+        logging.info("Thread renderer stopped")
+
+    def deliver(self, plot_id, frame):
+        with self.lock:
+            mailbox = self.mailboxes.get(plot_id)
+        if mailbox is not None:
+            mailbox.put(frame)
+
+    def stop(self):
+        self.requests.put(None)
+        self.thread.join(timeout=2)
+
+
+def serve(requests, deliver):
+    """Цикл рендерера: команды из очереди requests, готовые кадры — в deliver(id, кадр)."""
+    renderers = {}
+    while True:
+        request = requests.get()
+        if request is None:
+            break
+        command, plot_id, payload = request
+        if command == "register":
+            try:
+                renderers[plot_id] = RENDERERS[payload.get("kind", "line")](payload)
+            except Exception as e:
+                logging.error(f"Cannot create plot {plot_id}: {str(e)}")
+        elif command == "close":
+            renderers.pop(plot_id, None)
+        else:
+            deliver(plot_id, render_frame(renderers, plot_id, payload))
+
+
+def serve_process(requests, results):
+    """Точка входа процесса отрисовки: кадры (id, кадр) уходят в results, в конце — None."""
+    serve(requests, lambda plot_id, frame: results.put((plot_id, frame)))
+    results.put(None)
+
+
+class ProcessRenderer(ThreadRenderer):
+    """Отдельный процесс, который рисует фигуры всех графиков; кадры разносит поток-приёмник."""
+
+    def __init__(self):
+        import multiprocessing
+
+        # spawn: дочерний процесс не наследует Tk и потоки интерфейса
+        context = multiprocessing.get_context("spawn")
+        self.requests = context.Queue()
+        self.results = context.Queue()
+        self.mailboxes = {}
+        self.next_id = 0
+        self.lock = threading.Lock()
+        self.process = context.Process(target=serve_process, args=(self.requests, self.results), name="plot-renderer", daemon=True)
+        self.process.start()
+        self.thread = threading.Thread(target=self.run, name="plot-frames", daemon=True)
+        self.thread.start()
+        logging.info(f"Process renderer started (pid {self.process.pid})")
+
+    def run(self):
+        while True:
+            result = self.results.get()
+            if result is None:
+                break
+            self.deliver(*result)
+        logging.info("Process renderer stopped")
+
+    def alive(self):
+        return self.process.is_alive() and self.thread.is_alive()
+
+    def stop(self):
+        self.requests.put(None)
+        self.thread.join(timeout=2)
+        self.process.join(timeout=2)
+        if self.process.is_alive():
+            self.process.terminate()
+
+
+_renderer = None
+_renderer_lock = threading.Lock()
+
+
+def get_renderer():
+    """Возвращает общий для процесса рендерер текущего режима."""
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None:
+            _renderer = ProcessRenderer() if render_mode == "process" else ThreadRenderer()
+        return _renderer
+
+
+def stop_renderer():
+    global _renderer
+    with _renderer_lock:
+        renderer, _renderer = _renderer, None
+    if renderer is not None:
+        renderer.stop()
+
+
+class ImageView:
+    """Кадры рендерера в одном PhotoImage в потоке Tk: общая часть OffThreadPlot и OffThreadHeatmap.
+
+    Подкласс определяет payload(): данные для рендерера, которые готовятся
+    в потоке Tk перед отправкой. Всё время, которое поток Tk тратит на вид
+    (подготовка и отправка данных, объединённые запросы, опрос ящика, вставка
+    картинки), копится и относится к следующему показанному кадру. Если
+    рендерер остановился или не ответил за FRAME_TIMEOUT, кадр считается
+    неудавшимся и опрос прекращается до следующего запроса.
+    """
+
+    def __init__(self, master, renderer, spec):
+        import tkinter as tk
+        from PIL import ImageTk
+
+        self.master = master
+        self.renderer = renderer
+        self.widget = tk.Frame(master, borderwidth=0, highlightthickness=0)
+        self.size = (int(spec["figsize"][0] * spec["dpi"]), int(spec["figsize"][1] * spec["dpi"]))
+        self.photo = ImageTk.PhotoImage("RGBA", self.size)
+        self.image_label = tk.Label(self.widget, image=self.photo, borderwidth=0, highlightthickness=0)
+        self.image_label.pack()
+        self.frames_box = Mailbox()
+        self.plot_id = renderer.register(spec, self.frames_box)
+        self.closed = False
+        self.in_flight = False
+        self.submitted_at = 0.0
+        self.dirty = False
+        self.poll_id = None
+        self.frames = 0
+        self.coalesced = 0
+        self.failed = 0
+        self.frame_time = 0.0
+        self.max_frame_time = 0.0
+        self.render_time = 0.0
+        self.pending_time = 0.0
+
+    def get_tk_widget(self):
+        return self.widget
+
+    def visible(self):
+        return True
+
+    def request_frame(self):
+        if self.closed:
+            return
+        started = time.perf_counter()
+        if self.in_flight:
+            # Кадр уже рисуется: следующий будет нарисован по последним данным, когда этот придёт
+            self.dirty = True
+            self.coalesced += 1
+        elif not self.renderer.alive():
+            self.failed += 1
+        else:
+            self.in_flight = True
+            self.dirty = False
+            self.submitted_at = time.monotonic()
+            self.renderer.submit(self.plot_id, self.payload())
+            self.schedule_poll()
+        self.pending_time += time.perf_counter() - started
+
+    def schedule_poll(self):
+        if self.poll_id is None:
+            self.poll_id = self.master.after(POLL_MS, self.poll)
+
+    def poll(self):
+        self.poll_id = None
+        started = time.perf_counter()
+        frame = self.frames_box.take()
+        if frame is None:
+            if self.in_flight and (time.monotonic() - self.submitted_at > FRAME_TIMEOUT or not self.renderer.alive()):
+                # Рендерер умер или завис: не опрашиваем его бесконечно, следующий append запросит кадр снова
+                logging.warning(f"Plot {self.plot_id}: no frame from the renderer, giving up on this frame")
+                self.in_flight = False
+                self.failed += 1
+            elif self.in_flight:
+                self.schedule_poll()
+            self.pending_time += time.perf_counter() - started
+            return
+        self.in_flight = False
+        width, height, rgba, render_time = frame
+        if rgba is None:
+            self.failed += 1
+            self.pending_time += time.perf_counter() - started
+        elif self.visible():
+            self.show(width, height, rgba, render_time, started)
+        else:
+            self.pending_time += time.perf_counter() - started
+        if self.dirty and self.visible():
+            self.request_frame()
+
+    def show(self, width, height, rgba, render_time, started):
+        from PIL import Image, ImageTk
+
+        image = Image.frombuffer("RGBA", (width, height), rgba, "raw", "RGBA", 0, 1)
+        if (width, height) != self.size:
+            self.size = (width, height)
+            self.photo = ImageTk.PhotoImage("RGBA", self.size)
+            self.image_label.configure(image=self.photo)
+        # Одна вставка всего кадра в существующий PhotoImage
+        self.photo.paste(image)
+        elapsed = time.perf_counter() - started + self.pending_time
+        self.pending_time = 0.0
+        self.frames += 1
+        self.frame_time += elapsed
+        self.max_frame_time = max(self.max_frame_time, elapsed)
+        self.render_time += render_time
+
+    def cancel(self):
+        """Останавливает опрос кадров и снимает вид с рендерера (закрытие окна)."""
+        self.closed = True
+        if self.poll_id is not None:
+            self.master.after_cancel(self.poll_id)
+            self.poll_id = None
+        self.renderer.unregister(self.plot_id)
+
+    def stats(self):
+        """Число показанных, объединённых и неудавшихся кадров; время кадра в потоке Tk и в рендерере."""
+        return {
+            "mode": render_mode,
+            "frames": self.frames,
+            "coalesced": self.coalesced,
+            "failed": self.failed,
+            "mean_frame_ms": self.frame_time / self.frames * 1000 if self.frames else 0.0,
+            "max_frame_ms": self.max_frame_time * 1000,
+            "mean_render_ms": self.render_time / self.frames * 1000 if self.frames else 0.0
+        }
+
+
+class OffThreadPlot(ImageView):
+    """Живой график, который рисуется вне потока Tk и показывается готовой картинкой.
+
+    Интерфейс совпадает с LivePlot: append, detach/attach для графика истории
+    (ax, fig, canvas доступны после detach), cancel и stats.
+    """
+
+    def __init__(self, master, label, ylabel, renderer, ylim=None, maxlen=30, color="green", figsize=(6, 2), dpi=DPI):
+        self.figsize = figsize
+        self.values = collections.deque(maxlen=maxlen)
+        self.attached = True
+        # Холст Tk для графика истории создаётся при первом detach()
+        self.fig = self.ax = self.canvas = None
+        spec = {"kind": "line", "label": label, "ylabel": ylabel, "ylim": ylim, "maxlen": maxlen, "color": color,
+                "figsize": figsize, "dpi": dpi}
+        super().__init__(master, renderer, spec)
+
+    def visible(self):
+        return self.attached
+
+    def append(self, value, draw=True):
+        """Добавляет значение; draw=False только копит данные (например, в режиме истории)."""
+        self.values.append(value)
+        if draw and self.attached:
+            self.request_frame()
+
+    def payload(self):
+        import numpy as np
+
+        return np.fromiter(self.values, dtype=np.float64, count=len(self.values))
+
+    def detach(self):
+        """Показывает вместо картинки холст Tk, на осях которого рисуется график истории."""
+        self.attached = False
+        if self.canvas is None:
+            import matplotlib.pyplot as plt
+            from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+            self.fig, self.ax = plt.subplots(figsize=self.figsize)
+            self.canvas = FigureCanvasTkAgg(self.fig, master=self.widget)
+        self.image_label.pack_forget()
+        self.canvas.get_tk_widget().pack()
+
+    def attach(self):
+        """Возвращает живой график после detach()."""
+        self.attached = True
+        if self.canvas is not None:
+            self.canvas.get_tk_widget().pack_forget()
+        self.image_label.pack()
+        self.request_frame()
+
+
+class OffThreadHeatmap(ImageView):
+    """Карта загрузки ядер (как heatmap.CoreHeatmap), которая рисуется вне потока Tk."""
+
+    def __init__(self, master, cores, renderer, seconds=120, topology=None, figsize=(6, 3), cmap="inferno", dpi=DPI):
+        from heatmap import HeatmapData
+
+        self.cores = cores
+        self.data = HeatmapData(cores, seconds, topology)
+        self.topology = self.data.topology
+        spec = {"kind": "heatmap", "cores": cores, "seconds": seconds, "topology": self.topology, "cmap": cmap,
+                "figsize": figsize, "dpi": dpi}
+        super().__init__(master, renderer, spec)
+
+    def append(self, usage):
+        """Добавляет загрузку ядер (в порядке get_cpu_usage) и запрашивает кадр."""
+        self.data.append(usage)
+        self.request_frame()
+
+    def payload(self):
+        # Кольцевой буфер меняется следующим отсчётом, рендереру уходит копия окна
+        return self.data.view().copy()
+
+    def stats(self):
+        return dict(super().stats(), cores=self.cores)
+
+
+def benchmark(frames=100, maxlen=30, seed=1):
+    """Время кадра в вызывающем потоке для каждого режима (без вставки в PhotoImage, ей нужен Tk).
+
+    tk — отрисовка Agg прямо в вызывающем потоке; thread и process — отправка
+    значений и получение готового кадра из почтового ящика.
+    """
+    import numpy as np
+
+    generator = np.random.default_rng(seed)
+    spec = {"kind": "line", "label": "Usage (%)", "ylabel": "Usage (%)", "ylim": None, "maxlen": maxlen, "color": "green",
+            "figsize": (6, 2), "dpi": DPI}
+    series = [np.abs(generator.normal(50, 20 + i, size=maxlen)) for i in range(frames)]
+    results = {}
+    renderer = FigureRenderer(spec)
+    started = time.perf_counter()
+    for values in series:
+        renderer.render(values)
+    results["tk"] = {"main_thread_ms": (time.perf_counter() - started) / frames * 1000}
+    for mode, factory in (("thread", ThreadRenderer), ("process", ProcessRenderer)):
+        renderer = factory()
+        mailbox = Mailbox()
+        plot_id = renderer.register(spec, mailbox)
+        main_thread = 0.0
+        wall = time.perf_counter()
+        for values in series:
+            started = time.perf_counter()
+            renderer.submit(plot_id, values)
+            main_thread += time.perf_counter() - started
+            # Следующий кадр запрашивается только после готовности предыдущего, как в OffThreadPlot
+            while mailbox.take() is None:
+                time.sleep(0.0005)
+        results[mode] = {"main_thread_ms": main_thread / frames * 1000,
+                         "latency_ms": (time.perf_counter() - wall) / frames * 1000}
+        renderer.stop()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="offthread", description="Measure plot rendering cost on the calling thread")
+    commands = parser.add_subparsers(dest="command", required=True)
+    bench_parser = commands.add_parser("bench", help="render a synthetic live plot in each mode")
+    bench_parser.add_argument("--frames", type=int, default=100)
+    args = parser.parse_args(argv)
+    for mode, result in benchmark(args.frames).items():
+        latency = f", frame ready after {result['latency_ms']:.2f} ms" if "latency_ms" in result else ""
+        print(f"{mode}: {result['main_thread_ms']:.3f} ms per frame on the calling thread{latency}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
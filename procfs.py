@@ -0,0 +1,186 @@
+# procfs.py
+import os
+from array import array
+import logging
+
+logging.basicConfig(filename='procfs.log', level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Поля в плоских массивах счётчиков
+MEM_TOTAL, MEM_AVAILABLE, MEM_USED, MEM_PERCENT = range(4)
+NET_BYTES_RECV, NET_PACKETS_RECV, NET_BYTES_SENT, NET_PACKETS_SENT = range(4)
+DISK_READS, DISK_READ_BYTES, DISK_WRITES, DISK_WRITE_BYTES = range(4)
+FIELDS = 4
+
+SECTOR_SIZE = 512
+# Единица исходного счётчика в каждом поле disk_io: байты там — это секторы × SECTOR_SIZE
+DISK_UNITS = (1, SECTOR_SIZE, 1, SECTOR_SIZE)
+
+
+def online_cpu_count(proc_root="/proc"):
+    """Число строк cpuN в /proc/stat — столько значений отдаёт ProcReader.cpu_percent (включённые CPU)."""
+    with open(os.path.join(proc_root, "stat"), "rb") as f:
+        return sum(1 for line in f if line.startswith(b"cpu") and line[3:4].isdigit())
+
+
+class ProcFile:
+    """Файл procfs, открытый один раз и перечитываемый через preadv в один и тот же буфер."""
+
+    def __init__(self, path, size=16384):
+        self.path = path
+        self.fd = os.open(path, os.O_RDONLY)
+        self.buffer = bytearray(size)
+
+    def readinto(self):
+        """Перечитывает файл в self.buffer без копирования и возвращает число прочитанных байт."""
+        while True:
+            n = os.preadv(self.fd, [self.buffer], 0)
+            if n < len(self.buffer):
+                return n
+            # Файл не поместился (много ядер или устройств): увеличиваем буфер один раз
+            self.buffer = bytearray(len(self.buffer) * 2)
+
+    def read(self):
+        # readinto() может заменить буфер, поэтому сначала читаем, потом берём self.buffer
+        n = self.readinto()
+        return bytes(memoryview(self.buffer)[:n])
+
+    def close(self):
+        os.close(self.fd)
+
+
+class ProcReader:
+    """Чтение основных метрик Linux напрямую из /proc без psutil.
+
+    Результаты возвращаются в виде плоских array('d'), которые переиспользуются
+    между вызовами; вызывающий код копирует их, если передаёт в другой поток.
+    """
+
+    def __init__(self, proc_root="/proc", sys_root="/sys"):
+        self.proc_root = proc_root
+        self.sys_root = sys_root
+        self.stat = ProcFile(os.path.join(proc_root, "stat"))
+        self.meminfo = ProcFile(os.path.join(proc_root, "meminfo"))
+        self.net_dev = ProcFile(os.path.join(proc_root, "net", "dev"))
+        self.diskstats = ProcFile(os.path.join(proc_root, "diskstats"))
+        self.cpu_usage = array("d")
+        self.cpu_total = array("d")
+        self.cpu_idle = array("d")
+        self.mem = array("d", [0.0] * 4)
+        self.nic_names = ()
+        self.nic_counters = array("d")
+        self.net_totals = array("d", [0.0] * FIELDS)
+        self.disk_names = ()
+        self.disk_counters = array("d")
+        self.disk_totals = array("d", [0.0] * FIELDS)
+        self.storage_devices = {}
+
+    def close(self):
+        for f in (self.stat, self.meminfo, self.net_dev, self.diskstats):
+            f.close()
+
+    def cpu_percent(self):
+        """Загрузка каждого ядра в % с прошлого вызова."""
+        lines = self.stat.read().split(b"\n")
+        cores = [line for line in lines[1:] if line.startswith(b"cpu")]
+        if len(cores) != len(self.cpu_usage):
+            self.cpu_usage = array("d", [0.0] * len(cores))
+            self.cpu_total = array("d", [0.0] * len(cores))
+            self.cpu_idle = array("d", [0.0] * len(cores))
+        usage, prev_total, prev_idle = self.cpu_usage, self.cpu_total, self.cpu_idle
+        for i, line in enumerate(cores):
+            # user nice system idle iowait irq softirq steal; guest уже учтён в user
+            fields = line.split(None, 9)
+            total = float(int(fields[1]) + int(fields[2]) + int(fields[3]) + int(fields[4])
+                          + int(fields[5]) + int(fields[6]) + int(fields[7]) + int(fields[8]))
+            idle = float(int(fields[4]) + int(fields[5]))
+            delta = total - prev_total[i]
+            usage[i] = round(100.0 * (1.0 - (idle - prev_idle[i]) / delta), 1) if delta > 0 and prev_total[i] else 0.0
+            prev_total[i] = total
+            prev_idle[i] = idle
+        return usage
+
+    def memory(self):
+        """[total, available, used, percent], байты и %.
+
+        На ядрах без MemAvailable (до 3.14) доступная память считается как
+        MemFree + Buffers + Cached, как у psutil.
+        """
+        total = available = None
+        free = buffers = cached = 0
+        for line in self.meminfo.read().split(b"\n"):
+            if line.startswith(b"MemTotal:"):
+                total = int(line.split()[1]) * 1024
+            elif line.startswith(b"MemAvailable:"):
+                available = int(line.split()[1]) * 1024
+                break
+            elif line.startswith(b"MemFree:"):
+                free = int(line.split()[1]) * 1024
+            elif line.startswith(b"Buffers:"):
+                buffers = int(line.split()[1]) * 1024
+            elif line.startswith(b"Cached:"):
+                cached = int(line.split()[1]) * 1024
+        if available is None:
+            available = min(total, free + buffers + cached)
+        mem = self.mem
+        mem[MEM_TOTAL] = total
+        mem[MEM_AVAILABLE] = available
+        mem[MEM_USED] = total - available
+        mem[MEM_PERCENT] = round(100.0 * (total - available) / total, 1) if total else 0.0
+        return mem
+
+    def net_io(self):
+        """(имена NIC, счётчики по NIC по FIELDS на каждый, суммарные счётчики)."""
+        rows = []
+        for line in self.net_dev.read().split(b"\n")[2:]:
+            colon = line.rfind(b":")
+            if colon > 0:
+                rows.append((line[:colon].strip(), line[colon + 1:].split(None, 10)))
+        names = tuple(name.decode() for name, _ in rows)
+        if names != self.nic_names:
+            self.nic_names = names
+            self.nic_counters = array("d", [0.0] * (FIELDS * len(names)))
+        counters, totals = self.nic_counters, self.net_totals
+        for f in range(FIELDS):
+            totals[f] = 0.0
+        for i, (_, fields) in enumerate(rows):
+            base = i * FIELDS
+            counters[base + NET_BYTES_RECV] = int(fields[0])
+            counters[base + NET_PACKETS_RECV] = int(fields[1])
+            counters[base + NET_BYTES_SENT] = int(fields[8])
+            counters[base + NET_PACKETS_SENT] = int(fields[9])
+            for f in range(FIELDS):
+                totals[f] += counters[base + f]
+        return self.nic_names, counters, totals
+
+    def is_storage_device(self, name):
+        # Как в psutil: в сумму входят только целые диски из /sys/block, без разделов
+        if name not in self.storage_devices:
+            self.storage_devices[name] = os.path.exists(os.path.join(self.sys_root, "block", name.replace("/", "!")))
+        return self.storage_devices[name]
+
+    def disk_io(self):
+        """(имена устройств, счётчики по устройству по FIELDS на каждое, суммарные счётчики по дискам)."""
+        rows = []
+        for line in self.diskstats.read().split(b"\n"):
+            fields = line.split(None, 10)
+            if len(fields) >= 10:
+                rows.append(fields)
+        names = tuple(fields[2].decode() for fields in rows)
+        if names != self.disk_names:
+            self.disk_names = names
+            self.storage_devices = {}
+            self.disk_counters = array("d", [0.0] * (FIELDS * len(names)))
+        counters, totals = self.disk_counters, self.disk_totals
+        for f in range(FIELDS):
+            totals[f] = 0.0
+        for i, fields in enumerate(rows):
+            base = i * FIELDS
+            # major minor name reads merged sectors ms writes merged sectors ...
+            counters[base + DISK_READS] = int(fields[3])
+            counters[base + DISK_READ_BYTES] = int(fields[5]) * SECTOR_SIZE
+            counters[base + DISK_WRITES] = int(fields[7])
+            counters[base + DISK_WRITE_BYTES] = int(fields[9]) * SECTOR_SIZE
+            if self.is_storage_device(names[i]):
+                for f in range(FIELDS):
+                    totals[f] += counters[base + f]
+        return self.disk_names, counters, totals
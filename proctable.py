@@ -0,0 +1,182 @@
+# proctable.py
+import heapq
+import threading
+import time
+import logging
+from operator import attrgetter
+import psutil
+
+logging.basicConfig(filename='proctable.log', level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+
+SORT_KEYS = {
+    "cpu": attrgetter("cpu"),
+    "memory": attrgetter("rss"),
+    "io": attrgetter("io_rate"),
+    "threads": attrgetter("threads")
+}
+
+# Минимальный интервал между замерами CPU% одного процесса, секунды
+MIN_CPU_INTERVAL = 0.5
+
+# Поля строки полной таблицы (ProcessEntry.row) в порядке кортежа
+ROW_FIELDS = ("pid", "name", "user", "cpu", "rss", "io", "threads")
+
+
+class ProcessEntry:
+    __slots__ = ("pid", "create_time", "name", "user", "cpu_time", "cpu_at", "cpu", "rss", "memory", "io_bytes", "io_time", "io_rate", "threads", "seen")
+
+    def __init__(self, pid, create_time, name, user="?"):
+        self.pid = pid
+        self.create_time = create_time
+        self.name = name
+        self.user = user
+        self.cpu_time = None
+        self.cpu_at = None
+        self.cpu = 0.0
+        self.rss = 0
+        self.memory = 0.0
+        self.io_bytes = None
+        self.io_time = None
+        self.io_rate = 0.0
+        self.threads = 0
+        self.seen = 0
+
+    def as_dict(self):
+        return {
+            "pid": self.pid,
+            "name": self.name,
+            "user": self.user,
+            "cpu": self.cpu,
+            "memory": self.memory,
+            "rss": self.rss,
+            "io": self.io_rate,
+            "threads": self.threads
+        }
+
+    def row(self):
+        return (self.pid, self.name, self.user, self.cpu, self.rss, self.io_rate, self.threads)
+
+
+class ProcessSnapshot:
+    """Полная таблица процессов на момент обновления и её отличия от предыдущего снимка.
+
+    rows — {pid: кортеж ROW_FIELDS}; changed и removed — pid, изменившиеся и
+    исчезнувшие после снимка previous. Потребитель, применивший previous,
+    может обновить только changed/removed, иначе берёт rows целиком.
+    """
+
+    __slots__ = ("version", "previous", "rows", "changed", "removed")
+
+    def __init__(self, version, rows, changed, removed):
+        self.version = version
+        self.previous = version - 1
+        self.rows = rows
+        self.changed = changed
+        self.removed = removed
+
+    def as_dict(self):
+        return {"version": self.version, "processes": [dict(zip(ROW_FIELDS, row)) for row in self.rows.values()]}
+
+
+class ProcessTable:
+    """Постоянная таблица процессов с ключом (pid, create_time).
+
+    CPU% считается по приращению cpu_times между обходами, а не заново на каждом
+    новом psutil.Process, поэтому значения не нулевые с первого же обновления
+    после появления процесса. Завершившиеся процессы удаляются.
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self.total_memory = psutil.virtual_memory().total
+        self.last_update = None
+        self.tick = 0
+        self.rows = {}
+        self.version = 0
+        # Таблицу обновляют сборщики top_processes и process_table из разных потоков
+        self.lock = threading.Lock()
+
+    def update(self, key="cpu", full=False):
+        """Обходит процессы; счётчики I/O и потоков читаются, только если по ним сортируют или full."""
+        with self.lock:
+            self.update_locked(key, full)
+
+    def update_locked(self, key, full):
+        now = time.monotonic()
+        self.last_update = now
+        self.tick += 1
+        tick = self.tick
+        want_io = full or key == "io"
+        want_threads = full or key == "threads"
+        entries = self.entries
+        for proc in psutil.process_iter():
+            try:
+                with proc.oneshot():
+                    entry = entries.get(proc.pid)
+                    if entry is None or entry.create_time != proc.create_time():
+                        entry = ProcessEntry(proc.pid, proc.create_time(), proc.name(), username(proc))
+                        entries[proc.pid] = entry
+                    times = proc.cpu_times()
+                    cpu_time = times.user + times.system
+                    # Интервал — от прошлого замера этого процесса. Таблицу обходят и top_processes,
+                    # и process_table: второй обход через десятки мс оставляет прежнее значение,
+                    # иначе приращения cpu_times с шагом 10 мс давали бы скачки 0/20/40%
+                    if entry.cpu_time is None:
+                        entry.cpu_time = cpu_time
+                        entry.cpu_at = now
+                    elif now - entry.cpu_at >= MIN_CPU_INTERVAL:
+                        entry.cpu = max(0.0, (cpu_time - entry.cpu_time) / (now - entry.cpu_at) * 100)
+                        entry.cpu_time = cpu_time
+                        entry.cpu_at = now
+                    entry.rss = proc.memory_info().rss
+                    entry.memory = entry.rss / self.total_memory * 100
+                    if want_threads:
+                        entry.threads = proc.num_threads()
+                    if want_io:
+                        try:
+                            io = proc.io_counters()
+                            io_bytes = io.read_bytes + io.write_bytes
+                            if entry.io_bytes is not None and now > entry.io_time:
+                                entry.io_rate = max(0.0, (io_bytes - entry.io_bytes) / (now - entry.io_time))
+                            entry.io_bytes = io_bytes
+                            entry.io_time = now
+                        except (psutil.AccessDenied, AttributeError):
+                            pass
+                    entry.seen = tick
+            except (psutil.NoSuchProcess, psutil.ZombieProcess, psutil.AccessDenied):
+                continue
+        for pid in [pid for pid, entry in entries.items() if entry.seen != tick]:
+            del entries[pid]
+
+    def top(self, n=5, key="cpu"):
+        """n процессов с наибольшим значением key ("cpu", "memory", "io" или "threads"); n=None — все."""
+        if key not in SORT_KEYS:
+            raise ValueError(f"Unknown sort key: {key}")
+        with self.lock:
+            entries = list(self.entries.values())
+        if n is None:
+            return [entry.as_dict() for entry in sorted(entries, key=SORT_KEYS[key], reverse=True)]
+        return [entry.as_dict() for entry in heapq.nlargest(n, entries, key=SORT_KEYS[key])]
+
+    def snapshot(self):
+        """ProcessSnapshot всей таблицы; кортежи строк пересобираются, только если значения изменились."""
+        with self.lock:
+            rows = self.rows
+            changed = []
+            for pid, entry in self.entries.items():
+                row = entry.row()
+                if rows.get(pid) != row:
+                    rows[pid] = row
+                    changed.append(pid)
+            removed = [pid for pid in rows if pid not in self.entries]
+            for pid in removed:
+                del rows[pid]
+            self.version += 1
+            return ProcessSnapshot(self.version, dict(rows), changed, removed)
+
+
+def username(proc):
+    try:
+        return proc.username()
+    except (psutil.AccessDenied, KeyError, OSError):
+        return "?"
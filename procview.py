@@ -0,0 +1,247 @@
+# procview.py
+"""Виртуализированная таблица процессов для окна Process Explorer.
+
+ProcessModel хранит полную таблицу (proctable.ProcessSnapshot) и применяет к
+ней только изменившиеся строки, если предыдущий снимок уже применён; если
+почтовый ящик окна пропустил снимок, таблица берётся целиком. Фильтр по
+имени/пользователю пересчитывается только для изменившихся строк, сортировка
+идёт по кортежам строк (itemgetter, без Python-вызовов на строку).
+
+VirtualTable создаёт виджеты только для видимых строк (VISIBLE_ROWS штук)
+один раз и при прокрутке/обновлении меняет их текст, причём configure
+вызывается лишь для ячеек, текст которых изменился. Тысячи процессов стоят
+одну сортировку на снимок, а не тысячи виджетов.
+"""
+import time
+import logging
+from operator import itemgetter
+from proctable import ROW_FIELDS
+
+logging.basicConfig(filename='procview.log', level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+
+VISIBLE_ROWS = 25
+
+# Столбец: (поле строки, заголовок, ширина в символах, форматирование)
+COLUMNS = (
+    ("pid", "PID", 8, str),
+    ("name", "Name", 24, str),
+    ("user", "User", 12, str),
+    ("cpu", "CPU %", 8, lambda value: f"{value:.1f}"),
+    ("rss", "RSS (MB)", 10, lambda value: f"{value / 2**20:.1f}"),
+    ("io", "I/O (MB/s)", 10, lambda value: f"{value / 2**20:.2f}"),
+    ("threads", "Threads", 8, str)
+)
+
+FIELD_INDEX = {field: index for index, field in enumerate(ROW_FIELDS)}
+
+# Текстовые столбцы по умолчанию сортируются по возрастанию, числовые — по убыванию
+ASCENDING_FIELDS = ("pid", "name", "user")
+
+
+class ProcessModel:
+    """Отфильтрованная и отсортированная полная таблица процессов."""
+
+    def __init__(self, key="cpu", descending=True):
+        if key not in FIELD_INDEX:
+            raise ValueError(f"Unknown sort field: {key}")
+        self.rows = {}
+        self.passes = {}
+        self.order = []
+        self.version = None
+        self.key = key
+        self.descending = descending
+        self.needle = ""
+        self.snapshots = 0
+        self.resyncs = 0
+        self.changed_rows = 0
+        self.apply_time = 0.0
+
+    def __len__(self):
+        return len(self.order)
+
+    @property
+    def total(self):
+        return len(self.rows)
+
+    def apply(self, snapshot):
+        """Применяет ProcessSnapshot: изменения, если предыдущий снимок уже применён, иначе всю таблицу.
+
+        Возвращает False, если этот снимок уже применён (повторная доставка).
+        """
+        if self.version is not None and snapshot.version == self.version:
+            return False
+        started = time.perf_counter()
+        rows = self.rows
+        if self.version is not None and snapshot.previous == self.version:
+            for pid in snapshot.removed:
+                rows.pop(pid, None)
+                self.passes.pop(pid, None)
+            for pid in snapshot.changed:
+                row = snapshot.rows[pid]
+                rows[pid] = row
+                self.passes[pid] = self.matches(row)
+            self.changed_rows += len(snapshot.changed) + len(snapshot.removed)
+        else:
+            self.rows = rows = dict(snapshot.rows)
+            self.passes = {pid: self.matches(row) for pid, row in rows.items()}
+            self.resyncs += 1
+            self.changed_rows += len(rows)
+        self.version = snapshot.version
+        self.sort()
+        self.snapshots += 1
+        self.apply_time += time.perf_counter() - started
+        return True
+
+    def matches(self, row):
+        return not self.needle or self.needle in row[1].lower() or self.needle in row[2].lower()
+
+    def set_filter(self, text):
+        needle = text.strip().lower()
+        if needle == self.needle:
+            return
+        self.needle = needle
+        self.passes = {pid: self.matches(row) for pid, row in self.rows.items()}
+        self.sort()
+
+    def sort_by(self, key):
+        """Сортирует по key; повторный выбор того же столбца меняет направление."""
+        if key not in FIELD_INDEX:
+            raise ValueError(f"Unknown sort field: {key}")
+        if key == self.key:
+            self.descending = not self.descending
+        else:
+            self.key = key
+            self.descending = key not in ASCENDING_FIELDS
+        self.sort()
+
+    def sort(self):
+        rows = self.rows
+        passes = self.passes
+        self.order = sorted((row for pid, row in rows.items() if passes[pid]),
+                            key=itemgetter(FIELD_INDEX[self.key]), reverse=self.descending)
+
+    def visible(self, offset, count):
+        return self.order[offset:offset + count]
+
+    def stats(self):
+        return {"snapshots": self.snapshots, "resyncs": self.resyncs, "rows": self.total,
+                "changed_rows": self.changed_rows,
+                "mean_apply_ms": self.apply_time / self.snapshots * 1000 if self.snapshots else 0.0}
+
+
+class VirtualTable:
+    """Таблица на фиксированном наборе из rows строк-виджетов с прокруткой по модели."""
+
+    def __init__(self, master, model, rows=VISIBLE_ROWS):
+        import customtkinter as ctk
+
+        self.model = model
+        self.rows = rows
+        self.offset = 0
+        self.frame = ctk.CTkFrame(master)
+
+        toolbar = ctk.CTkFrame(self.frame)
+        toolbar.pack(fill="x", pady=2)
+        self.filter_entry = ctk.CTkEntry(toolbar, placeholder_text="Filter by name or user", width=240)
+        self.filter_entry.pack(side="left", padx=5, pady=2)
+        self.filter_entry.bind("<KeyRelease>", lambda event: self.set_filter(self.filter_entry.get()))
+        self.count_label = ctk.CTkLabel(toolbar, text="0 processes", font=("Roboto", 12))
+        self.count_label.pack(side="left", padx=10)
+
+        body = ctk.CTkFrame(self.frame)
+        body.pack(fill="both", expand=True)
+        self.grid = ctk.CTkFrame(body)
+        self.grid.pack(side="left", fill="both", expand=True)
+        self.scrollbar = ctk.CTkScrollbar(body, command=self.on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+
+        self.headers = {}
+        for column, (field, title, width, _) in enumerate(COLUMNS):
+            header = ctk.CTkButton(self.grid, text=title, width=width * 8, font=("Roboto", 12, "bold"),
+                                   command=lambda field=field: self.sort_by(field))
+            header.grid(row=0, column=column, padx=1, pady=2, sticky="ew")
+            self.headers[field] = header
+
+        # Виджеты строк создаются один раз; при прокрутке меняется только их текст
+        self.cells = []
+        self.texts = []
+        for row in range(rows):
+            cells = []
+            for column, (_, _, width, _) in enumerate(COLUMNS):
+                cell = ctk.CTkLabel(self.grid, text="", width=width * 8, font=("Roboto", 12),
+                                    anchor="e" if column >= 3 else "w")
+                cell.grid(row=row + 1, column=column, padx=1, sticky="ew")
+                cells.append(cell)
+            self.cells.append(cells)
+            self.texts.append([""] * len(COLUMNS))
+
+        for widget in (self.grid, *[cell for cells in self.cells for cell in cells]):
+            widget.bind("<MouseWheel>", self.on_wheel)
+            widget.bind("<Button-4>", lambda event: self.scroll(-3))
+            widget.bind("<Button-5>", lambda event: self.scroll(3))
+
+        self.refreshes = 0
+        self.cell_updates = 0
+        self.refresh_time = 0.0
+        self.show_sort()
+
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+
+    def set_filter(self, text):
+        self.model.set_filter(text)
+        self.offset = 0
+        self.refresh()
+
+    def sort_by(self, field):
+        self.model.sort_by(field)
+        self.show_sort()
+        self.refresh()
+
+    def show_sort(self):
+        for field, title, _, _ in COLUMNS:
+            arrow = (" ▼" if self.model.descending else " ▲") if field == self.model.key else ""
+            self.headers[field].configure(text=title + arrow)
+
+    def on_wheel(self, event):
+        self.scroll(-3 if event.delta > 0 else 3)
+
+    def on_scrollbar(self, *args):
+        # Команда прокрутки Tk: ("moveto", доля) или ("scroll", n, "units"/"pages")
+        if args[0] == "moveto":
+            self.offset = int(float(args[1]) * len(self.model))
+        elif args[0] == "scroll":
+            step = self.rows if args[2] == "pages" else 1
+            self.offset += int(args[1]) * step
+        self.refresh()
+
+    def scroll(self, lines):
+        self.offset += lines
+        self.refresh()
+
+    def refresh(self):
+        """Переписывает видимые строки по модели, трогая только ячейки с изменившимся текстом."""
+        started = time.perf_counter()
+        count = len(self.model)
+        self.offset = max(0, min(self.offset, count - self.rows))
+        rows = self.model.visible(self.offset, self.rows)
+        for index in range(self.rows):
+            texts = self.texts[index]
+            row = rows[index] if index < len(rows) else None
+            for column, (field, _, _, format_value) in enumerate(COLUMNS):
+                text = format_value(row[FIELD_INDEX[field]]) if row is not None else ""
+                if text != texts[column]:
+                    texts[column] = text
+                    self.cells[index][column].configure(text=text)
+                    self.cell_updates += 1
+        if count:
+            self.scrollbar.set(self.offset / count, min(1.0, (self.offset + self.rows) / count))
+        else:
+            self.scrollbar.set(0, 1)
+        self.count_label.configure(text=f"{count} of {self.model.total} processes")
+        self.refreshes += 1
+        self.refresh_time += time.perf_counter() - started
+
+    def stats(self):
+        return {"refreshes": self.refreshes, "cell_updates": self.cell_updates,
+                "mean_refresh_ms": self.refresh_time / self.refreshes * 1000 if self.refreshes else 0.0}
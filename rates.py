@@ -0,0 +1,135 @@
+# rates.py
+import time
+from array import array
+import logging
+
+logging.basicConfig(filename='rates.log', level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+
+COUNTER_32_MAX = 2 ** 32
+# Больше этого приращение после переполнения 32-битного счётчика не считается правдоподобным:
+# значит, сброшен 64-битный счётчик, который был меньше 2**32
+MAX_WRAP_DELTA = 2 ** 31
+
+
+class RateEngine:
+    """Скорости по устройствам из накопительных счётчиков.
+
+    Каждое устройство занимает постоянный слот в плоских массивах по fields
+    значений на слот: предыдущие счётчики, время их чтения по time.monotonic()
+    и посчитанные скорости в единицах/с. Слоты исчезнувших устройств
+    освобождаются и переиспользуются новыми.
+
+    units[f] — во сколько раз значение поля f больше исходного счётчика ядра
+    (у байтов дисков это размер сектора). Переполнение 32 бит проверяется в
+    единицах исходного счётчика; любое другое уменьшение — сброс счётчика:
+    скорость 0, отсчёт начинается с нового значения.
+    """
+
+    def __init__(self, fields, capacity=16, units=None):
+        self.fields = fields
+        self.units = tuple(units) if units is not None else (1,) * fields
+        self.capacity = 0
+        self.slots = {}
+        self.free = []
+        self.names = []
+        self.prev = array("d")
+        self.prev_time = array("d")
+        self.valid = bytearray()
+        # Счётчик уже был больше 2**32 — он 64-битный и переполнением 32 бит уменьшиться не может
+        self.wide = bytearray()
+        self.rates = array("d")
+        self.last_names = ()
+        self.grow(capacity)
+
+    def grow(self, capacity):
+        extra = capacity - self.capacity
+        self.prev.extend([0.0] * (extra * self.fields))
+        self.rates.extend([0.0] * (extra * self.fields))
+        self.prev_time.extend([0.0] * extra)
+        self.valid.extend(bytes(extra))
+        self.wide.extend(bytes(extra * self.fields))
+        self.names.extend([None] * extra)
+        self.free.extend(range(capacity - 1, self.capacity - 1, -1))
+        self.capacity = capacity
+
+    def slot(self, name):
+        slot = self.slots.get(name)
+        if slot is None:
+            if not self.free:
+                self.grow(self.capacity * 2)
+            slot = self.free.pop()
+            self.slots[name] = slot
+            self.names[slot] = name
+            logging.info(f"Device {name} appeared (slot {slot})")
+        return slot
+
+    def release(self, name):
+        slot = self.slots.pop(name)
+        self.names[slot] = None
+        self.valid[slot] = 0
+        base = slot * self.fields
+        for f in range(self.fields):
+            self.rates[base + f] = 0.0
+            self.wide[base + f] = 0
+        self.free.append(slot)
+        logging.info(f"Device {name} disappeared (slot {slot})")
+
+    def update(self, names, counters, now=None):
+        """names[i] соответствуют counters[i * fields:(i + 1) * fields]."""
+        now = time.monotonic() if now is None else now
+        fields = self.fields
+        prev, rates, prev_time, valid, wide, units = self.prev, self.rates, self.prev_time, self.valid, self.wide, self.units
+        for i, name in enumerate(names):
+            slot = self.slot(name)
+            base, src = slot * fields, i * fields
+            elapsed = now - prev_time[slot]
+            reset = False
+            for f in range(fields):
+                value = counters[src + f]
+                unit = units[f]
+                if valid[slot] and elapsed > 0:
+                    delta = value - prev[base + f]
+                    if delta < 0:
+                        if not wide[base + f] and delta / unit + COUNTER_32_MAX < MAX_WRAP_DELTA:
+                            # 32-битный счётчик переполнился
+                            delta += COUNTER_32_MAX * unit
+                        else:
+                            # Счётчик сброшен (устройство пересоздано): начинаем заново
+                            reset = True
+                            delta = 0.0
+                    rates[base + f] = delta / elapsed
+                prev[base + f] = value
+                if value >= COUNTER_32_MAX * unit:
+                    wide[base + f] = 1
+            if reset:
+                for f in range(fields):
+                    rates[base + f] = 0.0
+            prev_time[slot] = now
+            valid[slot] = 1
+        if names != self.last_names:
+            current = set(names)
+            for name in [name for name in self.slots if name not in current]:
+                self.release(name)
+            self.last_names = tuple(names)
+
+    def rate(self, name):
+        """Скорости одного устройства или None, если оно неизвестно."""
+        slot = self.slots.get(name)
+        if slot is None:
+            return None
+        return self.rates[slot * self.fields:(slot + 1) * self.fields]
+
+    def totals(self, include=None):
+        """Суммарные скорости по всем устройствам (или тем, для которых include(name) истинно)."""
+        totals = [0.0] * self.fields
+        for name, slot in self.slots.items():
+            if include is not None and not include(name):
+                continue
+            base = slot * self.fields
+            for f in range(self.fields):
+                totals[f] += self.rates[base + f]
+        return totals
+
+    def snapshot(self):
+        """(имена по слотам, копия массива скоростей); у свободных слотов имя None."""
+        return tuple(self.names), array("d", self.rates)
@@ -0,0 +1,120 @@
+# refresh.py
+import threading
+import time
+import logging
+
+logging.basicConfig(filename='refresh.log', level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Период тика обновления окна, мс: снимки хаба приходят раз в секунду, задержка отображения не больше тика
+REFRESH_INTERVAL_MS = 250
+
+
+class Mailbox:
+    """Ячейка с последним значением: новая запись заменяет непрочитанную.
+
+    Хранит кортеж (номер, значение); читатель по номеру узнаёт, сколько
+    значений пропущено. Писателей может быть несколько (например, потоки
+    загрузки истории), поэтому put и take идут под короткой блокировкой.
+    """
+
+    def __init__(self):
+        self.slot = (0, None)
+        self.taken = 0
+        self.dropped = 0
+        self.lock = threading.Lock()
+
+    def put(self, value):
+        with self.lock:
+            self.slot = (self.slot[0] + 1, value)
+
+    def take(self):
+        """Последнее непрочитанное значение или None."""
+        with self.lock:
+            sequence, value = self.slot
+            if sequence == self.taken:
+                return None
+            self.dropped += sequence - self.taken - 1
+            self.taken = sequence
+            return value
+
+
+class UiRefresher:
+    """Один периодический тик окна в потоке Tk.
+
+    На каждом тике из почтовых ящиков берётся только последнее значение и
+    передаётся обработчику; промежуточные значения отбрасываются, поэтому
+    отстающий цикл Tk не переигрывает накопившиеся обновления. В очереди
+    событий Tk от окна всегда не больше одного тика плюс отложенные вызовы
+    after(), которые удаляются из учёта при срабатывании.
+    """
+
+    def __init__(self, root, interval_ms=REFRESH_INTERVAL_MS):
+        self.root = root
+        self.interval_ms = interval_ms
+        self.handlers = []
+        self.pending = {}
+        self.tick_id = None
+        self.running = False
+        self.ticks = 0
+        self.renders = 0
+        self.render_time = 0.0
+
+    def add(self, mailbox, handler):
+        """handler(value) вызывается на тике, если в mailbox появилось новое значение."""
+        self.handlers.append((mailbox, handler))
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.tick_id = self.root.after(self.interval_ms, self.tick)
+
+    def tick(self):
+        self.tick_id = None
+        if not self.running:
+            return
+        self.ticks += 1
+        for mailbox, handler in self.handlers:
+            value = mailbox.take()
+            if value is None:
+                continue
+            started = time.perf_counter()
+            try:
+                handler(value)
+            except Exception as e:
+                logging.error(f"Refresh handler error: {str(e)}")
+            self.renders += 1
+            self.render_time += time.perf_counter() - started
+        self.tick_id = self.root.after(self.interval_ms, self.tick)
+
+    def after(self, delay_ms, fn):
+        """Отложенный вызов fn, который отменяется в stop(); учёт не растёт после срабатывания."""
+        key = object()
+
+        def run():
+            self.pending.pop(key, None)
+            if self.running:
+                fn()
+        self.pending[key] = self.root.after(delay_ms, run)
+
+    def stop(self):
+        self.running = False
+        for after_id in [self.tick_id] + list(self.pending.values()):
+            if after_id is not None:
+                try:
+                    self.root.after_cancel(after_id)
+                except Exception:
+                    pass
+        self.tick_id = None
+        self.pending.clear()
+        logging.info(f"Refresher stopped: {self.stats()}")
+
+    def stats(self):
+        """Тики, отрисовки, отброшенные устаревшие значения и отложенные вызовы."""
+        return {
+            "ticks": self.ticks,
+            "renders": self.renders,
+            "dropped": sum(mailbox.dropped for mailbox, _ in self.handlers),
+            "pending": len(self.pending),
+            "mean_render_ms": self.render_time / self.renders * 1000 if self.renders else 0.0
+        }
@@ -0,0 +1,360 @@
+# rollup.py
+"""Агрегаты истории метрик с несколькими разрешениями и сроками хранения.
+
+Сырые отсчёты пишутся в ряд "metrics", агрегаты — в ряды "metrics_1m" и
+"metrics_1h" того же хранилища (tsdb): для каждой метрики столбцы
+<метрика>.min/.mean/.max/.p95 и общий столбец samples. Агрегаты считаются
+на лету, без повторного чтения сырых данных: min/max/сумма за O(1), p95 —
+точно, пока в интервале не больше EXACT_SAMPLES отсчётов (минута при шаге
+1 с), а в более длинных интервалах — оценкой P² (Jain, Chlamtac, 1985).
+
+Интервал пишется только завершённым. После запуска первый отсчёт уровня
+дочитывает из сырого ряда всё, что пришло после последнего сохранённого
+интервала, поэтому перезапуск не пишет одну минуту или час дважды. Фоновое
+сжатие удаляет сегменты старше срока хранения уровня и сливает сегменты
+закрытых дней в один файл.
+"""
+import datetime
+import math
+import queue
+import threading
+import time
+import logging
+from tsdb import METRIC_COLUMNS, get_store
+
+logging.basicConfig(filename='rollup.log', level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+
+RAW_SERIES = "metrics"
+# Номинальный шаг сырых отсчётов, секунды
+RAW_RESOLUTION = 1
+RAW_RETENTION_DAYS = 7
+
+# Уровень агрегации: (имя, разрешение в секундах, срок хранения в днях)
+TIERS = (
+    ("1m", 60, 90),
+    ("1h", 3600, 5 * 365)
+)
+STATS = ("min", "mean", "max", "p95")
+# До стольких отсчётов метрики в интервале p95 считается точно: на малых выборках
+# маркеры P² ещё не разошлись от начальных позиций и оценка близка к максимуму
+EXACT_SAMPLES = 64
+
+# Больше точек на графике всё равно не различить
+MAX_POINTS = 2000
+COMPACTION_INTERVAL = 3600
+# Отсчёты, ожидающие записи в потоке записи; при переполнении новые отбрасываются
+MAX_QUEUE = 1000
+
+
+class P2Quantile:
+    """Потоковая оценка квантиля p по алгоритму P²: пять маркеров, O(1) на отсчёт."""
+
+    def __init__(self, p):
+        self.p = p
+        self.heights = []
+        self.positions = [1, 2, 3, 4, 5]
+        self.desired = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+        self.increments = (0, p / 2, p, (1 + p) / 2, 1)
+
+    def add(self, x):
+        q = self.heights
+        if len(q) < 5:
+            q.append(x)
+            q.sort()
+            return
+        n = self.positions
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= q[k + 1]:
+                k += 1
+        for i in range(k + 1, 5):
+            n[i] += 1
+        desired = self.desired
+        for i in range(5):
+            desired[i] += self.increments[i]
+        for i in (1, 2, 3):
+            d = desired[i] - n[i]
+            if d >= 1 and n[i + 1] - n[i] > 1 or d <= -1 and n[i - 1] - n[i] < -1:
+                d = 1 if d > 0 else -1
+                # Параболическая поправка, если она не выводит маркер за соседей, иначе линейная
+                height = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+                if not q[i - 1] < height < q[i + 1]:
+                    height = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = height
+                n[i] += d
+
+    def value(self):
+        q = self.heights
+        if not q:
+            return math.nan
+        if len(q) < 5:
+            # Пока маркеров меньше пяти — точный квантиль по ближайшему рангу
+            return q[min(len(q) - 1, max(0, math.ceil(self.p * len(q)) - 1))]
+        return q[2]
+
+
+class Bucket:
+    """Агрегаты всех метрик за один интервал уровня."""
+
+    def __init__(self, start, width):
+        self.start = start
+        self.samples = 0
+        self.minimum = [math.inf] * width
+        self.maximum = [-math.inf] * width
+        self.total = [0.0] * width
+        self.count = [0] * width
+        # Сами значения, пока их не больше EXACT_SAMPLES; затем — оценка P², а список отбрасывается
+        self.values = [[] for _ in range(width)]
+        self.p95 = [None] * width
+
+    def add(self, values):
+        self.samples += 1
+        minimum, maximum, total, count, p95 = self.minimum, self.maximum, self.total, self.count, self.p95
+        exact = self.values
+        for i, value in enumerate(values):
+            if value != value:
+                continue
+            if value < minimum[i]:
+                minimum[i] = value
+            if value > maximum[i]:
+                maximum[i] = value
+            total[i] += value
+            count[i] += 1
+            kept = exact[i]
+            if kept is None:
+                p95[i].add(value)
+                continue
+            kept.append(value)
+            if len(kept) > EXACT_SAMPLES:
+                estimator = p95[i] = P2Quantile(0.95)
+                for x in kept:
+                    estimator.add(x)
+                exact[i] = None
+
+    def row(self):
+        """Значения в порядке столбцов уровня; метрики без отсчётов — NaN."""
+        import numpy as np
+
+        row = []
+        for i, count in enumerate(self.count):
+            if count:
+                kept = self.values[i]
+                p95 = float(np.percentile(kept, 95)) if kept is not None else self.p95[i].value()
+                row.extend((self.minimum[i], self.total[i] / count, self.maximum[i], p95))
+            else:
+                row.extend((math.nan,) * len(STATS))
+        row.append(self.samples)
+        return row
+
+
+def tier_columns(metrics):
+    return tuple(f"{name}.{stat}" for name in metrics for stat in STATS) + ("samples",)
+
+
+class RollupPipeline:
+    """Запись сырых отсчётов и их агрегатов, сроки хранения и выбор уровня для запросов.
+
+    add() пишет в хранилище в вызывающем потоке; submit() только ставит отсчёт
+    в очередь потока записи и не блокирует (для колбэков хаба, которые
+    выполняются в его цикле asyncio).
+    """
+
+    def __init__(self, store=None, series=RAW_SERIES, metrics=METRIC_COLUMNS, tiers=TIERS,
+                 raw_retention_days=RAW_RETENTION_DAYS, compaction_interval=COMPACTION_INTERVAL, max_queue=MAX_QUEUE):
+        self.store = store or get_store()
+        self.series = series
+        self.metrics = tuple(metrics)
+        self.tiers = tuple(tiers)
+        self.columns = tier_columns(self.metrics)
+        self.raw_retention_days = raw_retention_days
+        self.compaction_interval = compaction_interval
+        self.buckets = {}
+        # Начало последнего сохранённого интервала каждого уровня; до первого отсчёта уровень не восстановлен
+        self.emitted = {}
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.writer = None
+        self.dropped = 0
+        self.errors = 0
+
+    def tier_series(self, tier):
+        return f"{self.series}_{tier}"
+
+    def add(self, timestamp, values):
+        """Сохраняет сырой отсчёт и обновляет открытые интервалы всех уровней."""
+        self.store.append(self.series, timestamp, values, self.metrics)
+        with self.lock:
+            for name, resolution, _ in self.tiers:
+                if name not in self.emitted:
+                    self.resume(name, resolution, timestamp)
+                self.aggregate(name, resolution, timestamp, values)
+
+    def aggregate(self, name, resolution, timestamp, values):
+        start = timestamp // resolution * resolution
+        bucket = self.buckets.get(name)
+        if bucket is not None and bucket.start != start:
+            self.emit(name, resolution, bucket)
+            bucket = None
+        if bucket is None:
+            bucket = self.buckets[name] = Bucket(start, len(self.metrics))
+        bucket.add(values)
+
+    def resume(self, name, resolution, timestamp):
+        """Восстанавливает незавершённые интервалы уровня из сырых отсчётов до timestamp (первый отсчёт после запуска)."""
+        series = self.tier_series(name)
+        segments = self.store.segments(series)
+        last = None
+        if segments:
+            day_start = datetime.datetime.combine(segments[-1][0], datetime.time.min).timestamp()
+            times = self.store.read(series, day_start, None, ("samples",))["time"]
+            last = float(times.max()) if len(times) else None
+        self.emitted[name] = last
+        start = timestamp // resolution * resolution
+        if last is not None:
+            start = min(start, last + resolution)
+        raw = self.store.read(self.series, start, timestamp, self.metrics)
+        columns = [raw[metric] for metric in self.metrics]
+        for row, row_time in enumerate(raw["time"]):
+            self.aggregate(name, resolution, float(row_time), [float(column[row]) for column in columns])
+        if len(raw["time"]):
+            logging.info(f"Resumed {series} from {len(raw['time'])} raw sample(s)")
+
+    def submit(self, timestamp, values):
+        """Ставит отсчёт в очередь потока записи; при полной очереди отсчёт отбрасывается."""
+        try:
+            self.queue.put_nowait((timestamp, values))
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 100 == 0:
+                logging.warning(f"History queue full, {self.dropped} sample(s) dropped so far")
+
+    def write(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            try:
+                self.add(*item)
+            except (OSError, ValueError) as e:
+                self.errors += 1
+                logging.error(f"History append error: {str(e)}")
+
+    def emit(self, name, resolution, bucket):
+        last = self.emitted.get(name)
+        if last is not None and bucket.start <= last:
+            # Интервал уже сохранён (например, прежней версией при остановке)
+            return
+        self.emitted[name] = bucket.start
+        # Сегмент уровня рассчитан ровно на сутки его интервалов
+        self.store.append(self.tier_series(name), bucket.start, bucket.row(), self.columns,
+                          capacity=max(1, 86400 // resolution) + 1)
+
+    def flush(self):
+        """Забывает незавершённые интервалы (при остановке): они восстановятся из сырого ряда при следующем запуске."""
+        with self.lock:
+            self.buckets.clear()
+            self.emitted.clear()
+
+    def compact(self, today=None):
+        """Удаляет данные старше сроков хранения и сливает сегменты закрытых дней."""
+        today = today or datetime.date.today()
+        levels = [(self.series, self.raw_retention_days)]
+        levels += [(self.tier_series(name), retention) for name, _, retention in self.tiers]
+        removed = compacted = 0
+        for series, retention in levels:
+            removed += self.store.drop_before(series, today - datetime.timedelta(days=retention))
+            for day in sorted({day for day, _, _ in self.store.segments(series) if day < today}):
+                try:
+                    compacted += self.store.compact(series, day)
+                except (OSError, ValueError) as e:
+                    logging.error(f"Compaction of {series} {day.isoformat()} failed: {str(e)}")
+        return removed, compacted
+
+    def run(self):
+        while not self.stopped.is_set():
+            started = time.monotonic()
+            try:
+                removed, compacted = self.compact()
+                if removed or compacted:
+                    logging.info(f"Compaction: {removed} segment(s) dropped, {compacted} day(s) compacted "
+                                 f"in {time.monotonic() - started:.2f}s")
+            except Exception as e:
+                logging.error(f"Compaction error: {str(e)}")
+            self.stopped.wait(self.compaction_interval)
+
+    def start(self):
+        """Запускает фоновое сжатие и поток записи для submit()."""
+        if self.thread is not None:
+            return
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        self.writer = threading.Thread(target=self.write, daemon=True)
+        self.writer.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        if self.writer is not None:
+            # Поток записи дописывает очередь до конца и только потом завершается
+            self.queue.put(None)
+            self.writer.join()
+            self.writer = None
+        self.flush()
+
+    def choose_tier(self, start, end, max_points=MAX_POINTS, now=None):
+        """Самый подробный уровень, который даёт не больше max_points точек и ещё хранит start.
+
+        Возвращает (имя уровня или "raw", ряд, разрешение).
+        """
+        now = now if now is not None else time.time()
+        levels = [("raw", self.series, RAW_RESOLUTION, self.raw_retention_days)]
+        levels += [(name, self.tier_series(name), resolution, retention) for name, resolution, retention in self.tiers]
+        for name, series, resolution, retention in levels:
+            if (end - start) / resolution <= max_points and start >= now - retention * 86400:
+                return name, series, resolution
+        name, series, resolution, _ = levels[-1]
+        return name, series, resolution
+
+    def query(self, start, end, metrics=None, max_points=MAX_POINTS):
+        """Ряд за [start, end) из подходящего уровня.
+
+        Возвращает {"tier": имя, "time": ..., <метрика>: ...}; для агрегатов
+        <метрика> — среднее, а <метрика>.min/.max/.p95 лежат рядом.
+        """
+        metrics = tuple(metrics or self.metrics)
+        tier, series, _ = self.choose_tier(start, end, max_points)
+        if tier == "raw":
+            result = self.store.read(series, start, end, metrics)
+        else:
+            result = self.store.read(series, start, end, [f"{name}.{stat}" for name in metrics for stat in STATS])
+            for name in metrics:
+                result[name] = result[f"{name}.mean"]
+        result["tier"] = tier
+        return result
+
+
+_rollups = None
+_rollups_lock = threading.Lock()
+
+
+def get_rollups():
+    """Возвращает общий для процесса RollupPipeline с запущенным фоновым сжатием."""
+    global _rollups
+    with _rollups_lock:
+        if _rollups is None:
+            _rollups = RollupPipeline()
+            _rollups.start()
+        return _rollups
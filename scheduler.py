@@ -0,0 +1,40 @@
+# scheduler.py
+
+
+class Schedule:
+    """Сетка дедлайнов с фиксированным периодом по монотонным часам."""
+
+    def __init__(self, period, start):
+        self.period = period
+        self.deadline = start
+        self.runs = 0
+        self.missed = 0
+        self.last_lateness = 0.0
+        self.max_lateness = 0.0
+        self.total_lateness = 0.0
+
+    def advance(self, now):
+        """Отмечает выполнение тика и переносит дедлайн на следующий узел сетки.
+
+        Узлы, которые уже прошли, не догоняются, а считаются пропущенными.
+        Возвращает число пропущенных тиков.
+        """
+        lateness = max(0.0, now - self.deadline)
+        skipped = int(lateness // self.period)
+        self.runs += 1
+        self.missed += skipped
+        self.last_lateness = lateness
+        self.max_lateness = max(self.max_lateness, lateness)
+        self.total_lateness += lateness
+        self.deadline += (skipped + 1) * self.period
+        return skipped
+
+    def stats(self):
+        return {
+            "period": self.period,
+            "runs": self.runs,
+            "missed": self.missed,
+            "last_lateness": self.last_lateness,
+            "max_lateness": self.max_lateness,
+            "mean_lateness": self.total_lateness / self.runs if self.runs else 0.0
+        }
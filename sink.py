@@ -0,0 +1,192 @@
+# sink.py
+import csv
+import datetime
+import os
+import queue
+import threading
+import time
+import logging
+
+logging.basicConfig(filename='sink.log', level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class CsvFile:
+    """Открытый на дозапись CSV-файл с ротацией по размеру и по смене суток."""
+
+    def __init__(self, path, max_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.file = None
+        self.writer = None
+        self.day = None
+
+    def open(self):
+        self.file = open(self.path, "a", newline="")
+        self.writer = csv.writer(self.file)
+        # День файла — по времени последней записи, чтобы вчерашний файл ротировался после перезапуска
+        self.day = datetime.date.fromtimestamp(os.path.getmtime(self.path)) if self.file.tell() else datetime.date.today()
+
+    def rotated_path(self):
+        base, ext = os.path.splitext(self.path)
+        path = f"{base}.{self.day.isoformat()}{ext}"
+        index = 1
+        while os.path.exists(path):
+            path = f"{base}.{self.day.isoformat()}.{index}{ext}"
+            index += 1
+        return path
+
+    def rotate_if_needed(self):
+        """Возвращает True, если файл был ротирован."""
+        if self.file.tell() < self.max_bytes and datetime.date.today() == self.day:
+            return False
+        self.close()
+        os.replace(self.path, self.rotated_path())
+        self.open()
+        return True
+
+    def write(self, rows):
+        if self.file is None:
+            self.open()
+        rotated = self.rotate_if_needed()
+        self.writer.writerows(rows)
+        self.file.flush()
+        return rotated
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class MetricsSink:
+    """Запись строк метрик в CSV из фонового потока.
+
+    write() только кладёт строку в ограниченную очередь и никогда не блокирует
+    вызывающий поток (обычно поток Tk); при переполнении строка отбрасывается и
+    учитывается в dropped. Поток записи копит строки и сбрасывает их пачкой,
+    когда набралось batch_size строк или прошло flush_interval секунд. Файлы
+    держатся открытыми и ротируются при превышении max_bytes или смене суток.
+    """
+
+    def __init__(self, max_queue=10000, batch_size=200, flush_interval=5, max_bytes=50 * 1024 * 1024):
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.files = {}
+        self.pending = {}
+        self.pending_rows = 0
+        self.dropped = 0
+        self.written = 0
+        self.batches = 0
+        self.rotations = 0
+        self.errors = 0
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def write(self, path, row):
+        """Ставит строку row в очередь на запись в файл path."""
+        self.write_rows(path, (row,))
+
+    def write_rows(self, path, rows):
+        try:
+            self.queue.put_nowait((path, list(rows)))
+        except queue.Full:
+            self.dropped += len(rows)
+            if self.dropped == len(rows) or self.dropped % 1000 < len(rows):
+                logging.warning(f"Metrics queue full, {self.dropped} row(s) dropped so far")
+
+    def flush(self, timeout=None):
+        """Просит поток записи сбросить накопленное; ждёт до timeout секунд (0 — не ждать).
+
+        Возвращает True, если сброс завершился в пределах timeout.
+        """
+        done = threading.Event()
+        # Служебное сообщение кладётся с ожиданием: сброс не должен потеряться из-за полной очереди
+        try:
+            self.queue.put(("flush", done), timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout) if timeout != 0 else False
+
+    def close(self, timeout=5):
+        """Сбрасывает всё и останавливает поток записи."""
+        done = threading.Event()
+        try:
+            self.queue.put(("close", done), timeout=timeout)
+        except queue.Full:
+            logging.error("Metrics sink close timed out, queue is full")
+            return
+        self.thread.join(timeout)
+        logging.info(f"Metrics sink closed: {self.stats()}")
+
+    def run(self):
+        flushed_at = time.monotonic()
+        while True:
+            try:
+                item = self.queue.get(timeout=max(0.0, flushed_at + self.flush_interval - time.monotonic()))
+            except queue.Empty:
+                item = None
+            if item is not None and item[0] in ("flush", "close"):
+                self.write_pending()
+                flushed_at = time.monotonic()
+                if item[0] == "close":
+                    for f in self.files.values():
+                        f.close()
+                    self.files.clear()
+                    item[1].set()
+                    return
+                item[1].set()
+                continue
+            if item is not None:
+                path, rows = item
+                self.pending.setdefault(path, []).extend(rows)
+                self.pending_rows += len(rows)
+            if self.pending_rows >= self.batch_size or time.monotonic() - flushed_at >= self.flush_interval:
+                self.write_pending()
+                flushed_at = time.monotonic()
+
+    def write_pending(self):
+        for path, rows in self.pending.items():
+            f = self.files.get(path)
+            if f is None:
+                f = self.files[path] = CsvFile(path, self.max_bytes)
+            try:
+                if f.write(rows):
+                    self.rotations += 1
+                    logging.info(f"Rotated {path}")
+                self.written += len(rows)
+            except (OSError, ValueError) as e:
+                self.errors += 1
+                self.dropped += len(rows)
+                f.close()
+                logging.error(f"Metrics write error for {path}: {str(e)}")
+        if self.pending:
+            self.batches += 1
+        self.pending = {}
+        self.pending_rows = 0
+
+    def stats(self):
+        """Глубина очереди, строки в ожидании записи, записанные и отброшенные строки."""
+        return {
+            "queue_depth": self.queue.qsize(),
+            "pending": self.pending_rows,
+            "written": self.written,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "rotations": self.rotations,
+            "errors": self.errors
+        }
+
+
+_sink = None
+_sink_lock = threading.Lock()
+
+
+def get_sink():
+    """Возвращает общий для процесса MetricsSink."""
+    global _sink
+    with _sink_lock:
+        if _sink is None:
+            _sink = MetricsSink()
+        return _sink
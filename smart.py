@@ -3,6 +3,8 @@ import subprocess
 import logging
 import platform
 import re
+import asyncio
+from engine import run_subprocess
 
 logging.basicConfig(filename='smart.log', level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -15,6 +17,21 @@ if platform.system() == "Windows":
     except ImportError:
         logging.warning("WMI module not available; Windows S.M.A.R.T. monitoring will be disabled")
 
+def parse_smart_output(output):
+    health = "PASS" if "PASSED" in output else "FAIL"
+    temp_match = re.search(r"Temperature_Celsius\s+\d+\s+(\d+)", output)
+    temperature = temp_match.group(1) if temp_match else "N/A"
+    reallocated_match = re.search(r"Reallocated_Sector_Ct\s+\d+\s+(\d+)", output)
+    reallocated = reallocated_match.group(1) if reallocated_match else "0"
+    wear_match = re.search(r"Wear_Leveling_Count\s+\d+\s+(\d+)", output)
+    wear = wear_match.group(1) if wear_match else "N/A"
+    return {
+        "health_status": health,
+        "temperature": temperature,
+        "reallocated_sectors": reallocated,
+        "wear_level": wear
+    }
+
 class SMARTMonitor:
     def get_smart_data_linux(self):
         try:
@@ -25,21 +42,7 @@ class SMARTMonitor:
             for device in devices:
                 try:
                     info = subprocess.run(["smartctl", "-a", device], capture_output=True, text=True)
-                    output = info.stdout
-                    health = "PASS" if "PASSED" in output else "FAIL"
-                    temp_match = re.search(r"Temperature_Celsius\s+\d+\s+(\d+)", output)
-                    temperature = temp_match.group(1) if temp_match else "N/A"
-                    reallocated_match = re.search(r"Reallocated_Sector_Ct\s+\d+\s+(\d+)", output)
-                    reallocated = reallocated_match.group(1) if reallocated_match else "0"
-                    wear_match = re.search(r"Wear_Leveling_Count\s+\d+\s+(\d+)", output)
-                    wear = wear_match.group(1) if wear_match else "N/A"
-
-                    smart_data[device] = {
-                        "health_status": health,
-                        "temperature": temperature,
-                        "reallocated_sectors": reallocated,
-                        "wear_level": wear
-                    }
+                    smart_data[device] = parse_smart_output(info.stdout)
                 except Exception as e:
                     logging.error(f"SMART error for {device}: {str(e)}")
             return smart_data
@@ -47,6 +50,25 @@ class SMARTMonitor:
             logging.error(f"SMART scan error: {str(e)}")
             return {}
 
+    async def get_smart_data_linux_async(self, timeout=10):
+        """Опрашивает все диски параллельно; диск, на котором smartctl завис, пропускается по таймауту."""
+        try:
+            scan = await run_subprocess(["smartctl", "--scan"], timeout)
+            devices = [line.split()[0] for line in scan.splitlines() if line.strip()]
+        except Exception as e:
+            logging.error(f"SMART scan error: {str(e)}")
+            return {}
+
+        async def read_device(device):
+            try:
+                return parse_smart_output(await run_subprocess(["smartctl", "-a", device], timeout))
+            except Exception as e:
+                logging.error(f"SMART error for {device}: {str(e)}")
+                return None
+
+        results = await asyncio.gather(*(read_device(device) for device in devices))
+        return {device: data for device, data in zip(devices, results) if data is not None}
+
     def get_smart_data_windows(self):
         if not WMI_AVAILABLE:
             logging.error("WMI module not available for Windows S.M.A.R.T. monitoring")
@@ -71,6 +93,11 @@ class SMARTMonitor:
             logging.error(f"Windows SMART error: {str(e)}")
             return {}
 
+    async def get_smart_data_async(self):
+        if platform.system() == "Linux":
+            return await self.get_smart_data_linux_async()
+        return await asyncio.get_running_loop().run_in_executor(None, self.get_smart_data)
+
     def get_smart_data(self):
         if platform.system() == "Linux":
             return self.get_smart_data_linux()
@@ -0,0 +1,99 @@
+# startup.py
+"""Замер холодного старта: этапы запуска интерфейса и стоимость импортов.
+
+main.py отмечает этапы (mark) от импорта этого модуля до первого снимка
+метрик в таблице; отчёт пишется в лог и, с флагом --startup-report, в stdout.
+Время инициализации самого интерпретатора в отчёт не входит.
+
+python startup.py [модули...] по данным python -X importtime в чистых
+процессах печатает, сколько стоят импорты главного окна и сколько добавил бы
+каждый модуль, который теперь загружается только при открытии своего окна.
+
+Замер (python startup.py, Python 3.11): модули главного окна (hub,
+diagnostics, sink, tsdb, rollup, archive, refresh) — ~100 мс; раньше к ним
+добавлялись numpy (~70 мс), stress_test (~80 мс), history (~80 мс) и
+matplotlib.pyplot с FigureCanvasTkAgg (в среде замера не установлен).
+"""
+import argparse
+import subprocess
+import sys
+import time
+import logging
+
+logging.basicConfig(filename='startup.log', level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+
+STARTED = time.perf_counter()
+
+# Модули, которые главное окно больше не импортирует при запуске
+DEFERRED_MODULES = ("numpy", "stress_test", "capture", "history", "liveplot", "pyopencl")
+MAIN_MODULES = ("hub", "diagnostics", "sink", "tsdb", "rollup", "archive", "refresh")
+
+marks = []
+
+
+def mark(name):
+    """Отмечает этап запуска; повторная отметка того же этапа игнорируется."""
+    if marked(name):
+        return
+    marks.append((name, time.perf_counter()))
+
+
+def marked(name):
+    return any(existing == name for existing, _ in marks)
+
+
+def report():
+    """Отчёт по этапам в формате -X importtime: время этапа | с начала | этап (мс)."""
+    lines = ["startup: phase [ms] | since start [ms] | phase"]
+    previous = STARTED
+    for name, moment in marks:
+        lines.append(f"startup: {(moment - previous) * 1000:10.1f} | {(moment - STARTED) * 1000:16.1f} | {name}")
+        previous = moment
+    return "\n".join(lines)
+
+
+def import_times(modules):
+    """Импорт modules в чистом процессе: [(self мкс, cumulative мкс, глубина, имя)] из -X importtime."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {', '.join(modules)}"],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        raise ImportError(result.stderr.strip().splitlines()[-1])
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((int(own), int(cumulative), depth, name.strip()))
+    return entries
+
+
+def import_total(modules):
+    """Суммарное время импорта modules в одном процессе, мс."""
+    return sum(cumulative for _, cumulative, depth, _ in import_times(modules) if depth == 0) / 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="startup", description="Measure what the main window imports and what is deferred")
+    parser.add_argument("modules", nargs="*", default=list(DEFERRED_MODULES),
+                        help="modules to price on top of the main window imports")
+    parser.add_argument("--top", type=int, default=5, help="list the N slowest imports of the main window")
+    args = parser.parse_args(argv)
+    entries = import_times(MAIN_MODULES)
+    base = sum(cumulative for _, cumulative, depth, _ in entries if depth == 0) / 1000
+    print("import: cumulative [ms] | module")
+    print(f"import: {base:17.1f} | main window ({', '.join(MAIN_MODULES)})")
+    for own, cumulative, _, name in sorted(entries, key=lambda entry: -entry[1])[:args.top]:
+        print(f"import: {cumulative / 1000:17.1f} |   {name} (self {own / 1000:.1f})")
+    for module in args.modules:
+        try:
+            extra = import_total(MAIN_MODULES + (module,)) - base
+        except ImportError as e:
+            print(f"import: {'n/a':>17} | +{module} ({str(e)})")
+            continue
+        print(f"import: {extra:17.1f} | +{module} (deferred until its window opens)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
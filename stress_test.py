@@ -3,7 +3,6 @@ import time
 import os
 import psutil
 import numpy as np
-import pyopencl as cl
 import logging
 import csv
 import random
@@ -190,6 +189,8 @@ class StressTest:
     def gpu_stress(self, duration=10):
         """Нагружает GPU с помощью PyOpenCL."""
         try:
+            # pyopencl нужен только GPU-тесту, не загружаем его вместе с модулем
+            import pyopencl as cl
             logging.info(f"Starting GPU stress test for {duration} seconds")
             platform = cl.get_platforms()[0]
             device = platform.get_devices()[0]
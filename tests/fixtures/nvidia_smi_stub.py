@@ -0,0 +1,19 @@
+# nvidia_smi_stub.py
+"""Заглушка nvidia-smi -lms: два GPU в формате csv,noheader,nounits каждые 50 мс.
+
+Дописывает свой pid в файл из первого аргумента, чтобы тест мог его завершить.
+"""
+import os
+import sys
+import time
+
+with open(sys.argv[1], "a") as f:
+    f.write(f"{os.getpid()}\n")
+tick = 0
+while True:
+    print(f"0, {tick % 100}, 20, 61")
+    print("1, 75, [Not Supported], 70")
+    print("garbage line")
+    sys.stdout.flush()
+    tick += 1
+    time.sleep(0.05)
@@ -0,0 +1,60 @@
+# test_capture.py
+import math
+import os
+import shutil
+import pytest
+from capture import HighFrequencyCapture
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+STAT_TAIL = "intr 12345 0 0 0\nctxt 67890\nbtime 1760000000\n"
+
+
+@pytest.fixture
+def capture(tmp_path):
+    proc_root, sys_root = tmp_path / "proc", tmp_path / "sys"
+    shutil.copytree(os.path.join(FIXTURES, "proc"), proc_root)
+    shutil.copytree(os.path.join(FIXTURES, "sys"), sys_root)
+    capture = HighFrequencyCapture(rate=10, seconds=1, proc_root=str(proc_root), sys_root=str(sys_root))
+    yield capture
+    capture.close()
+
+
+def write_stat(capture, *cores):
+    # Переписываем на месте: ProcFile держит открытый дескриптор
+    with open(os.path.join(capture.proc_root, "stat"), "w") as f:
+        f.write("cpu  0 0 0 0 0 0 0 0 0 0\n")
+        for core, busy, idle in cores:
+            f.write(f"cpu{core} {busy} 0 0 {idle} 0 0 0 0 0 0\n")
+        f.write(STAT_TAIL)
+
+
+def test_usage_follows_cpu_hotplug(capture):
+    assert capture.cores == 2
+    capture.prime()
+    write_stat(capture, (0, 300, 800), (1, 200, 800))
+    capture.sample()
+    assert list(capture.latest(1)["usage"][0]) == [50.0, 50.0]
+    # cpu1 отключён: его строки нет, загрузка не определена
+    write_stat(capture, (0, 400, 900))
+    capture.sample()
+    usage = capture.latest(1)["usage"][0]
+    assert usage[0] == 50.0 and math.isnan(usage[1])
+    # cpu1 вернулся: первый отсчёт только запоминает его счётчики
+    write_stat(capture, (0, 500, 1000), (1, 500, 1000))
+    capture.sample()
+    usage = capture.latest(1)["usage"][0]
+    assert usage[0] == 50.0 and math.isnan(usage[1])
+    write_stat(capture, (0, 600, 1100), (1, 575, 1025))
+    capture.sample()
+    assert list(capture.latest(1)["usage"][0]) == [50.0, 75.0]
+
+
+def test_latest_rows_match_timestamps(capture):
+    capture.prime()
+    for _ in range(15):
+        capture.sample()
+    latest = capture.latest()
+    assert len(latest["time"]) == 10
+    assert all(len(rows) == 10 for rows in latest.values())
+    assert list(latest["time"]) == sorted(latest["time"])
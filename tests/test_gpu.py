@@ -0,0 +1,48 @@
+# test_gpu.py
+import os
+import signal
+import sys
+import time
+from gpu import NvidiaSmiReader
+
+STUB = os.path.join(os.path.dirname(__file__), "fixtures", "nvidia_smi_stub.py")
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def read_pids(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [int(line) for line in f if line.strip()]
+
+
+def test_reader_parses_each_gpu_and_restarts_a_killed_stream(tmp_path):
+    pids = str(tmp_path / "pids")
+    reader = NvidiaSmiReader(command=[sys.executable, STUB, pids])
+    try:
+        assert wait_for(lambda: len(reader.gpus()) == 2)
+        gpus = reader.gpus()
+        assert gpus[0]["memory"] == "20" and gpus[0]["temp"] == "61"
+        # "[Not Supported]" становится "N/A", посторонние строки пропускаются
+        assert (gpus[1]["usage"], gpus[1]["memory"], gpus[1]["temp"]) == ("75", "N/A", "70")
+        first = read_pids(pids)
+        assert len(first) == 1
+
+        os.kill(first[0], signal.SIGKILL)
+        # Поток чтения перезапускает поток данных после короткой задержки
+        assert wait_for(lambda: len(read_pids(pids)) == 2)
+        assert reader.restarts == 1
+        restarted = time.monotonic()
+        assert wait_for(lambda: reader.gpus()[0]["updated"] > restarted)
+        assert set(reader.gpus()) == {0, 1}
+    finally:
+        reader.stop()
+        wait_for(lambda: reader.thread is None)
@@ -0,0 +1,47 @@
+# test_inventory.py
+import os
+from inventory import HardwareInventory
+
+
+def make_hwmon(sys_root):
+    chip = os.path.join(sys_root, "class", "hwmon", "hwmon0")
+    os.makedirs(chip)
+    files = {"name": "nvme", "temp1_input": "41850", "temp1_label": "Composite",
+             "temp2_label": "Sensor 1", "fan1_input": "1200"}
+    for name, value in files.items():
+        with open(os.path.join(chip, name), "w") as f:
+            f.write(value + "\n")
+    # Атрибут, который не читается (как EIO/ENODATA у некоторых чипов): pread каталога даёт EISDIR
+    os.makedirs(os.path.join(chip, "temp2_input"))
+    return chip
+
+
+def test_unreadable_sensor_is_skipped_without_rediscovery(tmp_path):
+    make_hwmon(str(tmp_path))
+    inventory = HardwareInventory(str(tmp_path), dmidecode=())
+    discoveries = []
+    discover = inventory.discover
+    inventory.discover = lambda: discoveries.append(1) or discover()
+    try:
+        for _ in range(3):
+            assert inventory.read_temperatures() == {("nvme", "Composite"): 41.85}
+            assert inventory.read_fan_speeds() == {"nvme": 1200}
+        assert discoveries == []
+    finally:
+        inventory.close()
+
+
+def test_new_hwmon_device_is_discovered_after_a_failed_read(tmp_path):
+    chip = make_hwmon(str(tmp_path))
+    inventory = HardwareInventory(str(tmp_path), dmidecode=())
+    try:
+        assert inventory.read_temperatures() == {("nvme", "Composite"): 41.85}
+        second = os.path.join(os.path.dirname(chip), "hwmon1")
+        os.makedirs(second)
+        for name, value in {"name": "coretemp", "temp1_input": "55000", "temp1_label": "Core 0"}.items():
+            with open(os.path.join(second, name), "w") as f:
+                f.write(value + "\n")
+        # Список устройств сверяется сразу после ошибки чтения, не дожидаясь hotplug_interval
+        assert inventory.read_temperatures() == {("nvme", "Composite"): 41.85, ("coretemp", "Core 0"): 55.0}
+    finally:
+        inventory.close()
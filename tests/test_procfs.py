@@ -0,0 +1,114 @@
+# test_procfs.py
+import os
+import shutil
+import pytest
+from procfs import (ProcFile, ProcReader, online_cpu_count, FIELDS, SECTOR_SIZE, MEM_TOTAL, MEM_AVAILABLE, MEM_USED,
+                    MEM_PERCENT, NET_BYTES_RECV, NET_PACKETS_RECV, NET_BYTES_SENT, NET_PACKETS_SENT, DISK_READS,
+                    DISK_READ_BYTES, DISK_WRITES, DISK_WRITE_BYTES)
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+@pytest.fixture
+def roots(tmp_path):
+    """Копия дерева /proc и /sys из fixtures, которую тесты могут переписывать."""
+    proc_root, sys_root = tmp_path / "proc", tmp_path / "sys"
+    shutil.copytree(os.path.join(FIXTURES, "proc"), proc_root)
+    shutil.copytree(os.path.join(FIXTURES, "sys"), sys_root)
+    return str(proc_root), str(sys_root)
+
+
+@pytest.fixture
+def reader(roots):
+    reader = ProcReader(*roots)
+    yield reader
+    reader.close()
+
+
+def rewrite(path, text):
+    # Переписываем на месте, а не заменяем файл: ProcFile держит открытый дескриптор
+    with open(path, "w") as f:
+        f.write(text)
+
+
+def test_proc_file_grows_buffer_and_rereads_on_size_change(roots):
+    path = os.path.join(roots[0], "stat")
+    with open(path, "rb") as f:
+        content = f.read()
+    proc_file = ProcFile(path, size=16)
+    try:
+        assert proc_file.read() == content
+        assert len(proc_file.buffer) > len(content)
+        rewrite(path, "cpu  1 2 3 4 5 6 7 8 0 0\n")
+        assert proc_file.read() == b"cpu  1 2 3 4 5 6 7 8 0 0\n"
+        rewrite(path, content.decode() + "extra 1\n")
+        assert proc_file.read() == content + b"extra 1\n"
+    finally:
+        proc_file.close()
+
+
+def test_cpu_percent_between_calls(reader, roots):
+    assert online_cpu_count(roots[0]) == 2
+    # Первый вызов только запоминает счётчики
+    assert list(reader.cpu_percent()) == [0.0, 0.0]
+    path = os.path.join(roots[0], "stat")
+    with open(path) as f:
+        lines = f.read().splitlines()
+    lines[1] = "cpu0 300 0 50 700 50 0 0 0 0 0"
+    lines[2] = "cpu1 100 0 50 800 50 0 0 0 0 0"
+    # Строка intr длиннее прежней: файл меняет размер, дескриптор тот же
+    lines[3] = "intr 123456789 " + " ".join(["0"] * 200)
+    rewrite(path, "\n".join(lines) + "\n")
+    assert list(reader.cpu_percent()) == [100.0, 0.0]
+    # Счётчики не изменились: загрузка не определена и считается нулевой
+    assert list(reader.cpu_percent()) == [0.0, 0.0]
+
+
+def test_memory(reader):
+    mem = reader.memory()
+    assert mem[MEM_TOTAL] == 8000000 * 1024
+    assert mem[MEM_AVAILABLE] == 6000000 * 1024
+    assert mem[MEM_USED] == 2000000 * 1024
+    assert mem[MEM_PERCENT] == 25.0
+
+
+def test_memory_without_memavailable(reader, roots):
+    # Ядра до 3.14: доступная память = MemFree + Buffers + Cached
+    shutil.copyfile(os.path.join(FIXTURES, "meminfo-no-memavailable"), os.path.join(roots[0], "meminfo"))
+    mem = reader.memory()
+    assert mem[MEM_TOTAL] == 4000000 * 1024
+    assert mem[MEM_AVAILABLE] == 2000000 * 1024
+    assert mem[MEM_USED] == 2000000 * 1024
+    assert mem[MEM_PERCENT] == 50.0
+
+
+def test_net_io_per_nic_and_totals(reader, roots):
+    names, counters, totals = reader.net_io()
+    assert names == ("lo", "eth0")
+    eth0 = counters[FIELDS:2 * FIELDS]
+    assert eth0[NET_BYTES_RECV] == 5000000
+    assert eth0[NET_PACKETS_RECV] == 4000
+    assert eth0[NET_BYTES_SENT] == 2000000
+    assert eth0[NET_PACKETS_SENT] == 3000
+    assert totals[NET_BYTES_RECV] == 5001000
+    assert totals[NET_BYTES_SENT] == 2001000
+    path = os.path.join(roots[0], "net", "dev")
+    with open(path) as f:
+        text = f.read()
+    rewrite(path, text + "  wlan0:     700       7    0    0    0     0          0         0      300       3"
+                         "    0    0    0     0       0          0\n")
+    names, counters, totals = reader.net_io()
+    assert names == ("lo", "eth0", "wlan0")
+    assert len(counters) == 3 * FIELDS
+    assert totals[NET_BYTES_RECV] == 5001700
+
+
+def test_disk_io_counts_sectors_and_sums_whole_disks(reader):
+    names, counters, totals = reader.disk_io()
+    assert names == ("sda", "sda1")
+    assert counters[DISK_READS] == 100
+    assert counters[DISK_READ_BYTES] == 2000 * SECTOR_SIZE
+    assert counters[DISK_WRITES] == 40
+    assert counters[DISK_WRITE_BYTES] == 800 * SECTOR_SIZE
+    # Раздел sda1 нет в /sys/block: в сумму входит только sda
+    assert list(totals) == [100, 2000 * SECTOR_SIZE, 40, 800 * SECTOR_SIZE]
@@ -0,0 +1,25 @@
+# test_rules.py
+import pytest
+from rules import Rule, RuleEngine, load_rules
+
+
+def test_clear_after_comma():
+    rule = Rule.parse("cpu.temp > 85 for 30s, clear below 80")
+    assert rule.metric == "cpu_temp"
+    assert rule.duration == 30.0
+    assert (rule.clear_side, rule.clear) == ("below", 80.0)
+    engine = RuleEngine([rule])
+    for timestamp, value in ((0, 90), (30, 90), (40, 82)):
+        engine.add(timestamp, "cpu_temp", None, value)
+    assert engine.alerts() == ["cpu.temp > 85 for 30s, clear below 80: 90"]
+    engine.add(50, "cpu_temp", None, 79)
+    assert engine.alerts() == []
+
+
+def test_malformed_rule_is_rejected():
+    with pytest.raises(ValueError):
+        Rule.parse("cpu.temp > 85 for 30s,, clear below 80")
+
+
+def test_default_rules_parse():
+    assert len(load_rules(None)) == 5
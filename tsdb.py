@@ -0,0 +1,531 @@
+# tsdb.py
+"""Колоночное хранилище истории метрик.
+
+Каждый ряд (series) хранится в посуточных сегментах history/<series>.<YYYY-MM-DD>.<N>.seg.
+Сегмент — файл фиксированного размера, выделенный сразу на capacity строк:
+
+    заголовок   magic "SMTS", версия, число столбцов, capacity, rows, имена столбцов
+    time        capacity × float64 (секунды Unix)
+    столбец 1   capacity × float32
+    ...
+
+Запись идёт через mmap (только стандартная библиотека): значения строки пишутся
+на свои места в столбцах, затем в заголовке увеличивается rows, поэтому
+оборванная запись не портит уже сохранённые строки. Новый сегмент того же дня
+начинается, когда текущий заполнен, меняется набор столбцов или время пошло
+назад — так внутри сегмента метки времени всегда упорядочены. Чтение отдаёт
+массивы NumPy без разбора текста: диапазон находится через searchsorted.
+Сегменты закрытого дня можно слить в один файл точного размера (compact).
+"""
+import argparse
+import datetime
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+import logging
+from archive import compression, open_archived
+
+logging.basicConfig(filename='tsdb.log', level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+
+MAGIC = b"SMTS"
+VERSION = 1
+HEADER = struct.Struct("<4sHHII")
+ROWS_OFFSET = 12
+NAME_SIZE = 32
+DEFAULT_DIR = "history"
+DEFAULT_CAPACITY = 86400
+# Строк CSV в одном блоке при импорте и чтении истории
+CSV_CHUNK_ROWS = 100000
+NAN = float("nan")
+
+
+def number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return NAN
+
+
+# Плоские столбцы снимка хаба: те же метрики и в том же порядке, что и в таблице главного окна
+SNAPSHOT_COLUMNS = (
+    ("cpu_usage", lambda s: sum(s["cpu_usage"]) / len(s["cpu_usage"]) if s.get("cpu_usage") else NAN),
+    ("cpu_freq", lambda s: number(s.get("cpu_freq"))),
+    ("cpu_temp", lambda s: number(s.get("cpu_temp"))),
+    ("ram_percent", lambda s: number(s["ram_info"]["percent"]) if "ram_info" in s else NAN),
+    ("ram_used_gb", lambda s: number(s["ram_info"]["used"]) if "ram_info" in s else NAN),
+    ("ram_freq", lambda s: number(s.get("ram_freq"))),
+    ("disk_percent", lambda s: number(s["disk_usage"]["percent"]) if "disk_usage" in s else NAN),
+    ("disk_read_mb_s", lambda s: number(s["disk_io"]["read_bytes"]) if "disk_io" in s else NAN),
+    ("disk_write_mb_s", lambda s: number(s["disk_io"]["write_bytes"]) if "disk_io" in s else NAN),
+    ("gpu_usage", lambda s: number(s["gpu_info"]["usage"]) if "gpu_info" in s else NAN),
+    ("gpu_memory", lambda s: number(s["gpu_info"]["memory"]) if "gpu_info" in s else NAN),
+    ("gpu_temp", lambda s: number(s["gpu_info"]["temp"]) if "gpu_info" in s else NAN),
+    ("net_sent_mb_s", lambda s: number(s["net_info"]["bytes_sent"]) if "net_info" in s else NAN),
+    ("net_recv_mb_s", lambda s: number(s["net_info"]["bytes_recv"]) if "net_info" in s else NAN),
+    ("power_w", lambda s: number(s.get("power_info")))
+)
+METRIC_COLUMNS = tuple(name for name, _ in SNAPSHOT_COLUMNS)
+# Группы хаба, из которых берутся столбцы (у disk_io, gpu_info и net_info — только суммы)
+SNAPSHOT_GROUPS = ("cpu_usage", "cpu_freq", "cpu_temp", "ram_info", "ram_freq", "disk_usage",
+                   "disk_io", "gpu_info", "net_info", "power_info")
+
+# Схемы CSV, которые писали окна интерфейса: файл -> (ряд, столбцы после метки времени)
+CSV_SCHEMAS = {
+    "metrics.csv": ("metrics", METRIC_COLUMNS),
+    "cpu_metrics.csv": ("cpu", ("usage", "freq", "temp")),
+    "ram_metrics.csv": ("ram", ("percent", "used_gb", "freq")),
+    "disk_metrics.csv": ("disk", ("percent", "read_mb_s", "write_mb_s")),
+    "gpu_metrics.csv": ("gpu", ("usage", "memory", "temp"))
+}
+
+
+def snapshot_row(snapshot):
+    """Плоские значения снимка хаба в порядке METRIC_COLUMNS (NaN, если значения нет)."""
+    return [column(snapshot) for _, column in SNAPSHOT_COLUMNS]
+
+
+class Segment:
+    """Один файл сегмента, открытый на запись через mmap."""
+
+    def __init__(self, path, columns, capacity):
+        self.path = path
+        self.columns = tuple(columns)
+        exists = os.path.exists(path)
+        # У существующего файла (например, после сжатия) capacity берётся из заголовка
+        self.capacity = read_file_header(path)[1] if exists else capacity
+        self.header_size = header_size(len(self.columns))
+        self.size = self.header_size + self.capacity * (8 + 4 * len(self.columns))
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        if not exists:
+            # Файл разреженный: место на диске занимают только записанные страницы
+            os.ftruncate(self.fd, self.size)
+        self.map = mmap.mmap(self.fd, self.size)
+        if exists:
+            self.rows = read_header(self.map)[2]
+        else:
+            self.rows = 0
+            write_header(self.map, self.columns, capacity)
+        self.last_time = struct.unpack_from("<d", self.map, self.time_offset(self.rows - 1))[0] if self.rows else None
+
+    def time_offset(self, row):
+        return self.header_size + 8 * row
+
+    def column_offset(self, column, row):
+        return self.header_size + 8 * self.capacity + 4 * (column * self.capacity + row)
+
+    @property
+    def full(self):
+        return self.rows >= self.capacity
+
+    def append(self, timestamp, values):
+        row = self.rows
+        struct.pack_into("<d", self.map, self.time_offset(row), timestamp)
+        for column, value in enumerate(values):
+            try:
+                struct.pack_into("<f", self.map, self.column_offset(column, row), value)
+            except OverflowError:
+                # Вне диапазона float32 — сохраняем как бесконечность того же знака
+                struct.pack_into("<f", self.map, self.column_offset(column, row), value * float("inf"))
+        self.rows = row + 1
+        struct.pack_into("<I", self.map, ROWS_OFFSET, self.rows)
+        self.last_time = timestamp
+
+    def append_block(self, times, values):
+        """Дописывает строки times (float64[n]) и values (n × столбцы) одним присваиванием на столбец."""
+        import numpy as np
+
+        row, n = self.rows, len(times)
+        np.frombuffer(self.map, dtype="<f8", count=n, offset=self.time_offset(row))[:] = times
+        # Вне диапазона float32 — бесконечность того же знака, как в append()
+        with np.errstate(over="ignore"):
+            for column in range(len(self.columns)):
+                np.frombuffer(self.map, dtype="<f4", count=n, offset=self.column_offset(column, row))[:] = values[:, column]
+        self.rows = row + n
+        struct.pack_into("<I", self.map, ROWS_OFFSET, self.rows)
+        self.last_time = float(times[-1])
+
+    def close(self):
+        self.map.flush()
+        self.map.close()
+        os.close(self.fd)
+
+
+def header_size(ncols):
+    # Выравнивание на 64 байта, чтобы столбцы float64 были выровнены
+    return (HEADER.size + NAME_SIZE * ncols + 63) // 64 * 64
+
+
+def write_header(buffer, columns, capacity):
+    HEADER.pack_into(buffer, 0, MAGIC, VERSION, len(columns), capacity, 0)
+    for i, name in enumerate(columns):
+        encoded = name.encode()
+        if len(encoded) > NAME_SIZE:
+            raise ValueError(f"Column name too long: {name}")
+        struct.pack_into(f"{NAME_SIZE}s", buffer, HEADER.size + i * NAME_SIZE, encoded)
+
+
+def read_file_header(path):
+    with open_archived(path) as f:
+        head = f.read(HEADER.size)
+        if len(head) == HEADER.size:
+            head += f.read(header_size(HEADER.unpack(head)[2]) - HEADER.size)
+    return read_header(head)
+
+
+def read_header(buffer):
+    """(столбцы, capacity, rows, размер заголовка) из начала сегмента."""
+    magic, version, ncols, capacity, rows = HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a metrics segment file")
+    columns = tuple(struct.unpack_from(f"{NAME_SIZE}s", buffer, HEADER.size + i * NAME_SIZE)[0].rstrip(b"\0").decode()
+                    for i in range(ncols))
+    return columns, capacity, rows, header_size(ncols)
+
+
+class TimeSeriesStore:
+    """Ряды метрик в посуточных сегментах каталога directory."""
+
+    def __init__(self, directory=DEFAULT_DIR, capacity=DEFAULT_CAPACITY):
+        self.directory = directory
+        self.capacity = capacity
+        self.writers = {}
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def segments(self, series):
+        """Файлы сегментов ряда: [(день, номер, путь)] по возрастанию."""
+        pattern = re.compile(rf"{re.escape(series)}\.(\d{{4}}-\d{{2}}-\d{{2}})\.(\d+)\.seg(?:\.gz|\.xz)?")
+        found = []
+        for filename in os.listdir(self.directory):
+            match = pattern.fullmatch(filename)
+            if match:
+                found.append((datetime.date.fromisoformat(match.group(1)), int(match.group(2)),
+                              os.path.join(self.directory, filename)))
+        return sorted(found)
+
+    def segment_path(self, series, day, index):
+        return os.path.join(self.directory, f"{series}.{day.isoformat()}.{index}.seg")
+
+    def append(self, series, timestamp, values, columns=METRIC_COLUMNS, capacity=None):
+        """Дописывает строку values (в порядке columns) с меткой timestamp в ряд series.
+
+        capacity — размер нового сегмента в строках (по умолчанию capacity хранилища).
+        """
+        if len(values) != len(columns):
+            raise ValueError(f"Expected {len(columns)} values, got {len(values)}")
+        with self.lock:
+            self.writer(series, tuple(columns), timestamp, capacity).append(timestamp, values)
+
+    def append_block(self, series, times, values, columns=METRIC_COLUMNS, capacity=None):
+        """Дописывает блок строк: times по возрастанию (float64[n]), values — массив (n, len(columns)).
+
+        Строки пишутся в сегменты кусками по дням, по одному присваиванию на
+        столбец, без разбора значений по одному.
+        """
+        import numpy as np
+
+        columns = tuple(columns)
+        if values.shape != (len(times), len(columns)):
+            raise ValueError(f"Expected {len(times)} x {len(columns)} values, got {values.shape}")
+        position = 0
+        with self.lock:
+            while position < len(times):
+                timestamp = float(times[position])
+                segment = self.writer(series, columns, timestamp, capacity)
+                next_day = datetime.datetime.combine(datetime.date.fromtimestamp(timestamp) + datetime.timedelta(days=1),
+                                                     datetime.time.min).timestamp()
+                end = min(int(np.searchsorted(times, next_day, "left")), position + segment.capacity - segment.rows)
+                segment.append_block(times[position:end], values[position:end])
+                position = end
+
+    def writer(self, series, columns, timestamp, capacity):
+        """Сегмент для дозаписи строки timestamp в ряд series; новый — если день, схема или порядок не подходят."""
+        day = datetime.date.fromtimestamp(timestamp)
+        writer = self.writers.get(series)
+        if (writer is None or writer[0] != day or writer[1].full or writer[1].columns != columns
+                or writer[1].last_time is not None and timestamp < writer[1].last_time):
+            writer = self.open_writer(series, day, columns, timestamp, capacity or self.capacity)
+        return writer[1]
+
+    def open_writer(self, series, day, columns, timestamp, capacity):
+        old = self.writers.pop(series, None)
+        if old is not None:
+            old[1].close()
+        existing = [(index, path) for d, index, path in self.segments(series) if d == day]
+        segment = None
+        if existing:
+            index, path = existing[-1]
+            segment = Segment(path, columns, capacity) if self.matches(path, columns) else None
+            if segment is not None and (segment.full or segment.last_time is not None and timestamp < segment.last_time):
+                segment.close()
+                segment = None
+            if segment is None:
+                index += 1
+        else:
+            index = 0
+        if segment is None:
+            segment = Segment(self.segment_path(series, day, index), columns, capacity)
+            logging.info(f"New segment {segment.path} with {len(columns)} column(s)")
+        self.writers[series] = (day, segment)
+        return self.writers[series]
+
+    def matches(self, path, columns):
+        """Подходит ли существующий сегмент для дозаписи: не сжат и с той же схемой столбцов."""
+        if compression(path) is not None:
+            return False
+        try:
+            return read_file_header(path)[0] == columns
+        except (OSError, ValueError, struct.error):
+            return False
+
+    def read(self, series, start=None, end=None, columns=None):
+        """Строки ряда с start <= time < end: {"time": float64[], столбец: float32[]}.
+
+        Столбцы, которых нет в части сегментов, заполняются NaN.
+        """
+        start_day = datetime.date.fromtimestamp(start) if start is not None else datetime.date.min
+        end_day = datetime.date.fromtimestamp(end) if end is not None else datetime.date.max
+        parts = []
+        names = list(columns) if columns is not None else []
+        for day, _, path in self.segments(series):
+            if day < start_day or day > end_day:
+                continue
+            part = read_segment(path, start, end, columns)
+            if part is None:
+                continue
+            if columns is None:
+                names.extend(name for name in part if name != "time" and name not in names)
+            parts.append(part)
+        return merge_parts(parts, names)
+
+    def drop_before(self, series, day):
+        """Удаляет сегменты ряда за дни раньше day, возвращает число удалённых файлов."""
+        removed = 0
+        with self.lock:
+            writer = self.writers.get(series)
+            for segment_day, _, path in self.segments(series):
+                if segment_day >= day or writer is not None and writer[1].path == path:
+                    continue
+                try:
+                    os.remove(path)
+                    removed += 1
+                except OSError as e:
+                    logging.error(f"Failed to remove segment {path}: {str(e)}")
+        if removed:
+            logging.info(f"Dropped {removed} segment(s) of {series} before {day.isoformat()}")
+        return removed
+
+    def compact(self, series, day):
+        """Сливает сегменты ряда за закрытый день в один файл точного размера.
+
+        Возвращает True, если файлы были переписаны.
+        """
+        with self.lock:
+            writer = self.writers.get(series)
+            if writer is not None and writer[0] == day:
+                return False
+            paths = [path for d, _, path in self.segments(series) if d == day]
+            # Сжатые дни уже в архиве и не сливаются повторно
+            if not paths or any(compression(path) is not None for path in paths):
+                return False
+            try:
+                headers = [read_file_header(path) for path in paths]
+            except (OSError, ValueError, struct.error) as e:
+                logging.warning(f"Not compacting {series} {day.isoformat()}: {str(e)}")
+                return False
+            if len(paths) == 1 and headers[0][1] == headers[0][2]:
+                return False
+            names = []
+            for seg_columns, _, _, _ in headers:
+                names.extend(name for name in seg_columns if name not in names)
+            data = merge_parts([part for part in (read_segment(path) for path in paths) if part is not None], names)
+            rows = len(data["time"])
+            target = self.segment_path(series, day, 0)
+            temporary = target + ".tmp"
+            header = bytearray(header_size(len(names)))
+            write_header(header, names, rows)
+            struct.pack_into("<I", header, ROWS_OFFSET, rows)
+            with open(temporary, "wb") as f:
+                f.write(header)
+                data["time"].astype("<f8").tofile(f)
+                for name in names:
+                    data[name].astype("<f4").tofile(f)
+            # Сначала подменяем целевой файл: сбой после этого оставит лишние исходные сегменты, но не потеряет строки
+            os.replace(temporary, target)
+            for path in paths:
+                if path != target:
+                    os.remove(path)
+        logging.info(f"Compacted {len(paths)} segment(s) of {series} {day.isoformat()} into {rows} row(s)")
+        return True
+
+    def close(self):
+        with self.lock:
+            for _, segment in self.writers.values():
+                segment.close()
+            self.writers.clear()
+
+
+def read_segment(path, start=None, end=None, columns=None):
+    """Строки одного сегмента с start <= time < end или None, если их нет.
+
+    columns ограничивает набор читаемых столбцов (None — все).
+    """
+    import numpy as np
+
+    try:
+        seg_columns, capacity, rows, offset = read_file_header(path)
+    except (OSError, ValueError, EOFError, struct.error) as e:
+        logging.warning(f"Skipping unreadable segment {path}: {str(e)}")
+        return None
+    if rows == 0:
+        return None
+    if compression(path) is not None:
+        return read_compressed_segment(path, start, end, columns, seg_columns, capacity, rows, offset)
+    data = np.memmap(path, dtype=np.uint8, mode="r")
+    times = data[offset:offset + 8 * rows].view("<f8")
+    lo = np.searchsorted(times, start, "left") if start is not None else 0
+    hi = np.searchsorted(times, end, "left") if end is not None else rows
+    if hi <= lo:
+        return None
+    part = {"time": np.array(times[lo:hi])}
+    base = offset + 8 * capacity
+    for i, name in enumerate(seg_columns):
+        if columns is not None and name not in columns:
+            continue
+        column_start = base + 4 * capacity * i
+        part[name] = np.array(data[column_start + 4 * lo:column_start + 4 * hi].view("<f4"))
+    return part
+
+
+def read_compressed_segment(path, start, end, columns, seg_columns, capacity, rows, offset):
+    """Потоковое чтение сжатого сегмента: в памяти только столбец времени и нужные срезы."""
+    import numpy as np
+
+    with open_archived(path) as f:
+        f.seek(offset)
+        times = np.frombuffer(f.read(8 * rows), dtype="<f8")
+        lo = np.searchsorted(times, start, "left") if start is not None else 0
+        hi = np.searchsorted(times, end, "left") if end is not None else rows
+        if hi <= lo:
+            return None
+        part = {"time": times[lo:hi].copy()}
+        base = offset + 8 * capacity
+        for i, name in enumerate(seg_columns):
+            if columns is not None and name not in columns:
+                continue
+            # seek вперёд в сжатом потоке распаковывает и отбрасывает данные блоками
+            f.seek(base + 4 * capacity * i + 4 * lo)
+            part[name] = np.frombuffer(f.read(4 * (hi - lo)), dtype="<f4").copy()
+    return part
+
+
+def merge_parts(parts, names):
+    import numpy as np
+
+    result = {"time": np.concatenate([p["time"] for p in parts]) if parts else np.empty(0)}
+    for name in names:
+        result[name] = (np.concatenate([p[name] if name in p else np.full(len(p["time"]), np.nan, dtype=np.float32)
+                                        for p in parts]) if parts else np.empty(0, dtype=np.float32))
+    # Сегменты одного дня могут перекрываться по времени (часы переводили назад)
+    if len(result["time"]) > 1 and (np.diff(result["time"]) < 0).any():
+        order = np.argsort(result["time"], kind="stable")
+        result = {name: values[order] for name, values in result.items()}
+    return result
+
+
+def csv_schema(path):
+    """Схема CSV по имени файла, в том числе ротированного и сжатого (metrics.2026-10-15.csv.gz)."""
+    name = os.path.basename(path)
+    match = re.fullmatch(r"(\w+)(?:\.\d{4}-\d{2}-\d{2}(?:\.\d+)?)?\.csv(?:\.gz|\.xz)?", name)
+    return CSV_SCHEMAS.get(f"{match.group(1)}.csv") if match else None
+
+
+def read_csv_blocks(path, width, rows=CSV_CHUNK_ROWS):
+    """Числовые строки CSV блоками примерно по rows строк: (массив (n, width), пропущено строк).
+
+    Блок разбирается одним np.loadtxt; строки другой ширины, заголовок и
+    строки без метки времени пропускаются, "N/A" становится NaN. Если в блоке
+    есть нечисловое значение, только этот блок разбирается построчно.
+    """
+    import numpy as np
+
+    with open_archived(path) as f:
+        while True:
+            lines = f.readlines(rows * 100)
+            if not lines:
+                break
+            kept = [line.replace(b"N/A", b"nan") for line in lines
+                    if line.count(b",") == width - 1 and line[:1].isdigit()]
+            skipped = len(lines) - len(kept)
+            if not kept:
+                yield np.empty((0, width)), skipped
+                continue
+            try:
+                block = np.loadtxt(kept, delimiter=",", dtype=np.float64, ndmin=2)
+            except ValueError:
+                block = np.array([[number(value) for value in line.decode(errors="replace").split(",")]
+                                  for line in kept], dtype=np.float64).reshape(-1, width)
+            valid = block[:, 0] == block[:, 0]
+            yield block[valid], skipped + int(len(block) - valid.sum())
+
+
+def import_csv(path, store):
+    """Переносит CSV окна интерфейса в хранилище, возвращает (импортировано, пропущено) строк.
+
+    Файл читается блоками (read_csv_blocks) и не держится в памяти целиком.
+    """
+    import numpy as np
+
+    schema = csv_schema(path)
+    if schema is None:
+        raise ValueError(f"Unknown CSV file: {path}")
+    series, columns = schema
+    imported = skipped = 0
+    for block, block_skipped in read_csv_blocks(path, len(columns) + 1):
+        skipped += block_skipped
+        if not len(block):
+            continue
+        # Старые файлы могли дописываться из разных окон вразнобой — сортируем блок, чтобы не плодить сегменты
+        block = block[np.argsort(block[:, 0], kind="stable")]
+        store.append_block(series, block[:, 0], block[:, 1:], columns)
+        imported += len(block)
+    logging.info(f"Imported {imported} row(s) from {path} into {series}, skipped {skipped}")
+    return imported, skipped
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Возвращает общее для процесса хранилище в каталоге history."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = TimeSeriesStore()
+        return _store
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="tsdb", description="Import metric CSV files into the history store")
+    parser.add_argument("files", nargs="+", help="CSV files written by the UI (metrics.csv, cpu_metrics.csv, ...)")
+    parser.add_argument("--dir", default=DEFAULT_DIR, help=f"store directory (default {DEFAULT_DIR})")
+    args = parser.parse_args(argv)
+    store = TimeSeriesStore(args.dir)
+    status = 0
+    for path in args.files:
+        try:
+            imported, skipped = import_csv(path, store)
+            print(f"{path}: {imported} row(s) imported, {skipped} skipped")
+        except (OSError, ValueError) as e:
+            print(f"{path}: {str(e)}", file=sys.stderr)
+            status = 1
+    store.close()
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,25 +1,29 @@
 # ui.py
 import customtkinter as ctk
-from monitor import SystemMonitor
-from stress_test import StressTest
-from diagnostics import Diagnostics
-from smart import SMARTMonitor
+from hub import get_hub, COLLECTORS, DEFAULTS
+from diagnostics import get_diagnostics
+from sink import get_sink
+from tsdb import get_store, snapshot_row
+from rollup import get_rollups
+from archive import get_archiver
+from refresh import Mailbox, UiRefresher
+from metrictable import MetricTable, TextLabel, MIN_MAX_HEADERS, min_max_rows
+from startup import mark
 import threading
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import collections
-import csv
 import time
 import logging
-import os
 
 logging.basicConfig(filename='ui.log', level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 
 class MainApp:
     def __init__(self, root):
         self.root = root
-        self.monitor = SystemMonitor()
-        self.diagnostics = Diagnostics()
+        self.subscription = None
+        self.diagnostics = get_diagnostics()
+        self.diagnostics_token = None
+        self.alerts = ()
+        self.alert_box = Mailbox()
+        self.error_text = None
         self.metrics = {
             "CPU Usage (%)": {"min": float("inf"), "current": 0, "max": 0},
             "CPU Freq (MHz)": {"min": float("inf"), "current": 0, "max": 0},
@@ -28,19 +32,21 @@ class MainApp:
             "RAM Used (GB)": {"min": float("inf"), "current": 0, "max": 0},
             "RAM Freq (MHz)": {"min": float("inf"), "current": 0, "max": 0},
             "Disk Usage (%)": {"min": float("inf"), "current": 0, "max": 0},
-            "Disk Read (MB)": {"min": float("inf"), "current": 0, "max": 0},
-            "Disk Write (MB)": {"min": float("inf"), "current": 0, "max": 0},
+            "Disk Read (MB/s)": {"min": float("inf"), "current": 0, "max": 0},
+            "Disk Write (MB/s)": {"min": float("inf"), "current": 0, "max": 0},
             "GPU Usage (%)": {"min": float("inf"), "current": 0, "max": 0},
             "GPU Memory (%)": {"min": float("inf"), "current": 0, "max": 0},
             "GPU Temp (°C)": {"min": float("inf"), "current": 0, "max": 0},
-            "Net Sent (MB)": {"min": float("inf"), "current": 0, "max": 0},
-            "Net Recv (MB)": {"min": float("inf"), "current": 0, "max": 0},
+            "Net Sent (MB/s)": {"min": float("inf"), "current": 0, "max": 0},
+            "Net Recv (MB/s)": {"min": float("inf"), "current": 0, "max": 0},
             "Power (W)": {"min": float("inf"), "current": 0, "max": 0}
         }
         self.fan_speeds = {}
         self.top_processes = []
+        self.windows = []
         self.is_running = True
-        self.after_ids = []
+        self.mailbox = Mailbox()
+        self.refresher = UiRefresher(self.root)
         self.root.bind("<Configure>", self.on_configure)
         self.setup_ui()
         self.start_monitoring()
@@ -51,10 +57,23 @@ class MainApp:
 
     def on_closing(self):
         self.is_running = False
-        self.monitor.stop()
-        for after_id in self.after_ids:
-            self.root.after_cancel(after_id)
-        self.after_ids.clear()
+        self.disconnect()
+        self.refresher.stop()
+        logging.info(f"Main metric table: {self.metric_table.stats()}")
+        # Сначала закрываются дочерние окна, чтобы их последние строки попали в очередь до закрытия записи
+        for window in self.windows:
+            if window.is_running:
+                try:
+                    window.on_closing()
+                except Exception as e:
+                    logging.error(f"Error closing {type(window).__name__}: {str(e)}")
+        self.windows = []
+        # Дописываем накопленные строки всех окон перед выходом
+        get_sink().close()
+        get_rollups().stop()
+        get_store().close()
+        from offthread import stop_renderer
+        stop_renderer()
         if hasattr(self.root, 'master'):
             self.root.master.after(100, self.root.master.destroy)
         else:
@@ -63,40 +82,25 @@ class MainApp:
     def setup_ui(self):
         menubar = ctk.CTkFrame(self.root)
         menubar.pack(fill="x")
-        stress_menu = ctk.CTkOptionMenu(menubar, values=["CPU Test", "RAM Test", "Disk Test", "GPU Test", "S.M.A.R.T. Monitor"],
+        stress_menu = ctk.CTkOptionMenu(menubar, values=["CPU Test", "RAM Test", "Disk Test", "GPU Test", "S.M.A.R.T. Monitor", "Process Explorer"],
                                         command=self.open_test_window)
         stress_menu.pack(side="left", padx=5, pady=5)
 
         self.main_frame = ctk.CTkFrame(self.root)
         self.main_frame.pack(pady=10, padx=10, fill="both", expand=True)
 
-        self.metrics_frame = ctk.CTkFrame(self.main_frame)
-        self.metrics_frame.pack(pady=5, fill="x")
-        ctk.CTkLabel(self.metrics_frame, text="Metric", font=("Roboto", 12, "bold")).grid(row=0, column=0, padx=5, pady=2)
-        ctk.CTkLabel(self.metrics_frame, text="Min", font=("Roboto", 12, "bold")).grid(row=0, column=1, padx=5, pady=2)
-        ctk.CTkLabel(self.metrics_frame, text="Current", font=("Roboto", 12, "bold")).grid(row=0, column=2, padx=5, pady=2)
-        ctk.CTkLabel(self.metrics_frame, text="Max", font=("Roboto", 12, "bold")).grid(row=0, column=3, padx=5, pady=2)
-
-        self.metric_labels = {}
-        for i, metric in enumerate(self.metrics):
-            ctk.CTkLabel(self.metrics_frame, text=metric, font=("Roboto", 12)).grid(row=i+1, column=0, padx=5, pady=2)
-            self.metric_labels[metric] = {
-                "min": ctk.CTkLabel(self.metrics_frame, text="N/A", font=("Roboto", 12)),
-                "current": ctk.CTkLabel(self.metrics_frame, text="N/A", font=("Roboto", 12)),
-                "max": ctk.CTkLabel(self.metrics_frame, text="N/A", font=("Roboto", 12))
-            }
-            self.metric_labels[metric]["min"].grid(row=i+1, column=1, padx=5, pady=2)
-            self.metric_labels[metric]["current"].grid(row=i+1, column=2, padx=5, pady=2)
-            self.metric_labels[metric]["max"].grid(row=i+1, column=3, padx=5, pady=2)
+        self.metric_table = MetricTable(self.main_frame, MIN_MAX_HEADERS)
+        self.metric_table.pack(pady=5, fill="x")
+        self.metric_table.update([(metric, (metric, "N/A", "N/A", "N/A")) for metric in self.metrics])
 
         self.fan_frame = ctk.CTkFrame(self.main_frame)
         self.fan_frame.pack(pady=5, fill="x")
-        self.fan_label = ctk.CTkLabel(self.fan_frame, text="Fan Speeds: N/A", font=("Roboto", 12))
+        self.fan_label = TextLabel(ctk.CTkLabel(self.fan_frame, text="Fan Speeds: N/A", font=("Roboto", 12)))
         self.fan_label.pack()
 
         self.process_frame = ctk.CTkFrame(self.main_frame)
         self.process_frame.pack(pady=5, fill="x")
-        self.process_label = ctk.CTkLabel(self.process_frame, text="Top Processes: N/A", font=("Roboto", 12))
+        self.process_label = TextLabel(ctk.CTkLabel(self.process_frame, text="Top Processes: N/A", font=("Roboto", 12)))
         self.process_label.pack()
 
         self.error_frame = ctk.CTkFrame(self.main_frame)
@@ -107,267 +111,269 @@ class MainApp:
     def open_test_window(self, test_name):
         window = ctk.CTkToplevel(self.root)
         window.title(test_name)
+        child = None
         try:
             if test_name == "CPU Test":
-                CPUWindow(window)
+                child = CPUWindow(window)
             elif test_name == "RAM Test":
-                RAMWindow(window)
+                child = RAMWindow(window)
             elif test_name == "Disk Test":
-                DiskWindow(window)
+                child = DiskWindow(window)
             elif test_name == "GPU Test":
-                GPUWindow(window)
+                child = GPUWindow(window)
             elif test_name == "S.M.A.R.T. Monitor":
-                SMARTWindow(window)
+                child = SMARTWindow(window)
+            elif test_name == "Process Explorer":
+                child = ProcessWindow(window)
         except Exception as e:
             logging.error(f"Error opening test window {test_name}: {str(e)}")
             window.destroy()
+        if child is not None:
+            # Уже закрытые окна в списке не держим
+            self.windows = [w for w in self.windows if w.is_running] + [child]
 
     def update_metrics(self, cpu_usage, cpu_freq, cpu_temp, fan_speeds, ram_info, ram_freq, disk_usage, disk_io, gpu_info, net_info, power_info, top_processes):
         if not self.is_running:
             return
-        def update():
-            if not self.is_running:
-                return
-            try:
-                self.metrics["CPU Usage (%)"]["current"] = sum(cpu_usage) / len(cpu_usage) if cpu_usage else 0
-                self.metrics["CPU Freq (MHz)"]["current"] = float(cpu_freq) if cpu_freq != "N/A" else 0
-                self.metrics["CPU Temp (°C)"]["current"] = float(cpu_temp) if cpu_temp != "N/A" else 0
-                self.metrics["RAM Usage (%)"]["current"] = ram_info["percent"]
-                self.metrics["RAM Used (GB)"]["current"] = ram_info["used"]
-                self.metrics["RAM Freq (MHz)"]["current"] = float(ram_freq) if ram_freq != "N/A" else 0
-                self.metrics["Disk Usage (%)"]["current"] = disk_usage["percent"]
-                self.metrics["Disk Read (MB)"]["current"] = disk_io["read_bytes"]
-                self.metrics["Disk Write (MB)"]["current"] = disk_io["write_bytes"]
-                self.metrics["GPU Usage (%)"]["current"] = float(gpu_info["usage"]) if gpu_info["usage"] != "N/A" else 0
-                self.metrics["GPU Memory (%)"]["current"] = float(gpu_info["memory"]) if gpu_info["memory"] != "N/A" else 0
-                self.metrics["GPU Temp (°C)"]["current"] = float(gpu_info["temp"]) if gpu_info["temp"] != "N/A" else 0
-                self.metrics["Net Sent (MB)"]["current"] = net_info["bytes_sent"]
-                self.metrics["Net Recv (MB)"]["current"] = net_info["bytes_recv"]
-                self.metrics["Power (W)"]["current"] = float(power_info) if power_info != "N/A" else 0
-
-                for metric in self.metrics:
-                    if self.metrics[metric]["current"] < self.metrics[metric]["min"]:
-                        self.metrics[metric]["min"] = self.metrics[metric]["current"]
-                    if self.metrics[metric]["current"] > self.metrics[metric]["max"]:
-                        self.metrics[metric]["max"] = self.metrics[metric]["current"]
-                    self.metric_labels[metric]["min"].configure(text=f"{self.metrics[metric]['min']:.1f}")
-                    self.metric_labels[metric]["current"].configure(text=f"{self.metrics[metric]['current']:.1f}")
-                    self.metric_labels[metric]["max"].configure(text=f"{self.metrics[metric]['max']:.1f}")
-
-                self.fan_speeds = fan_speeds
-                fan_text = ", ".join([f"{k}: {v} RPM" for k, v in fan_speeds.items()])
-                self.fan_label.configure(text=f"Fan Speeds: {fan_text if fan_text else 'N/A'}")
-
-                self.top_processes = top_processes
-                process_text = "\n".join([f"{p['name']}: CPU={p['cpu']:.1f}%, RAM={p['memory']:.1f}%" for p in top_processes])
-                self.process_label.configure(text=f"Top Processes: {process_text or 'N/A'}")
-
-                errors = self.diagnostics.check_hardware()
-                self.error_label.configure(text=f"Errors: {', '.join(errors) if errors else 'None'}")
-
-                with open(os.path.join("metrics.csv"), "a", newline="") as f:
-                    writer = csv.writer(f)
-                    writer.writerow([time.time()] + [self.metrics[m]["current"] for m in self.metrics])
-            except Exception as e:
-                logging.error(f"Main update_metrics error: {str(e)}")
-        after_id = self.root.after(0, update)
-        self.after_ids.append(after_id)
+        mark("first metrics")
+        try:
+            self.metrics["CPU Usage (%)"]["current"] = sum(cpu_usage) / len(cpu_usage) if cpu_usage else 0
+            self.metrics["CPU Freq (MHz)"]["current"] = float(cpu_freq) if cpu_freq != "N/A" else 0
+            self.metrics["CPU Temp (°C)"]["current"] = float(cpu_temp) if cpu_temp != "N/A" else 0
+            self.metrics["RAM Usage (%)"]["current"] = ram_info["percent"]
+            self.metrics["RAM Used (GB)"]["current"] = ram_info["used"]
+            self.metrics["RAM Freq (MHz)"]["current"] = float(ram_freq) if ram_freq != "N/A" else 0
+            self.metrics["Disk Usage (%)"]["current"] = disk_usage["percent"]
+            self.metrics["Disk Read (MB/s)"]["current"] = disk_io["read_bytes"]
+            self.metrics["Disk Write (MB/s)"]["current"] = disk_io["write_bytes"]
+            self.metrics["GPU Usage (%)"]["current"] = float(gpu_info["usage"]) if gpu_info["usage"] != "N/A" else 0
+            self.metrics["GPU Memory (%)"]["current"] = float(gpu_info["memory"]) if gpu_info["memory"] != "N/A" else 0
+            self.metrics["GPU Temp (°C)"]["current"] = float(gpu_info["temp"]) if gpu_info["temp"] != "N/A" else 0
+            self.metrics["Net Sent (MB/s)"]["current"] = net_info["bytes_sent"]
+            self.metrics["Net Recv (MB/s)"]["current"] = net_info["bytes_recv"]
+            self.metrics["Power (W)"]["current"] = float(power_info) if power_info != "N/A" else 0
+
+            for metric in self.metrics:
+                if self.metrics[metric]["current"] < self.metrics[metric]["min"]:
+                    self.metrics[metric]["min"] = self.metrics[metric]["current"]
+                if self.metrics[metric]["current"] > self.metrics[metric]["max"]:
+                    self.metrics[metric]["max"] = self.metrics[metric]["current"]
+            self.metric_table.update(min_max_rows(self.metrics))
+
+            self.fan_speeds = fan_speeds
+            fan_text = ", ".join([f"{k}: {v} RPM" for k, v in fan_speeds.items()])
+            self.fan_label.set(f"Fan Speeds: {fan_text if fan_text else 'N/A'}")
+
+            self.top_processes = top_processes
+            process_text = "\n".join([f"{p['name']}: CPU={p['cpu']:.1f}%, RAM={p['memory']:.1f}%" for p in top_processes])
+            self.process_label.set(f"Top Processes: {process_text or 'N/A'}")
+
+            get_sink().write("metrics.csv", [time.time()] + [self.metrics[m]["current"] for m in self.metrics])
+        except Exception as e:
+            logging.error(f"Main update_metrics error: {str(e)}")
+
+    def show_errors(self, alerts=None):
+        """Строка ошибок: предупреждения диагностики; метка меняется только при изменении текста."""
+        if alerts is not None:
+            self.alerts = alerts
+        errors = list(self.alerts)
+        text = f"Errors: {', '.join(errors) if errors else 'None'}"
+        if text != self.error_text:
+            self.error_text = text
+            self.error_label.configure(text=text)
 
     def start_monitoring(self):
-        def callback(cpu_usage, cpu_freq, cpu_temp, fan_speeds, ram_info, ram_freq, disk_usage, disk_io, gpu_info, net_info, power_info, top_processes):
-            if self.is_running:
-                self.update_metrics(cpu_usage, cpu_freq, cpu_temp, fan_speeds, ram_info, ram_freq, disk_usage, disk_io, gpu_info, net_info, power_info, top_processes)
-        threading.Thread(target=self.monitor.monitor_loop, args=(callback, 1), daemon=True).start()
-
-class CPUWindow:
-    def __init__(self, root):
-        self.root = root
-        self.monitor = SystemMonitor()
-        self.stress = StressTest()
-        self.diagnostics = Diagnostics()
-        self.cpu_history = collections.deque(maxlen=30)
-        self.time_history = collections.deque(maxlen=30)
-        self.metrics = {
-            "Usage (%)": {"min": float("inf"), "current": 0, "max": 0},
-            "Frequency (MHz)": {"min": float("inf"), "current": 0, "max": 0},
-            "Temperature (°C)": {"min": float("inf"), "current": 0, "max": 0}
-        }
-        self.fan_speeds = {}
-        self.is_running = True
-        self.after_ids = []
-        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
-        self.setup_ui()
-        self.start_monitoring()
-
-    def on_closing(self):
-        self.is_running = False
-        self.monitor.stop()
-        for after_id in self.after_ids:
-            self.root.after_cancel(after_id)
-        self.after_ids.clear()
-        self.root.after(100, self.root.destroy)
-
-    def setup_ui(self):
-        self.main_frame = ctk.CTkFrame(self.root)
-        self.main_frame.pack(pady=10, padx=10, fill="both", expand=True)
-
-        self.fig, self.ax = plt.subplots(figsize=(6, 2))
-        self.canvas = FigureCanvasTkAgg(self.fig, master=self.main_frame)
-        self.canvas.get_tk_widget().pack(pady=10)
-
-        self.metrics_frame = ctk.CTkFrame(self.main_frame)
-        self.metrics_frame.pack(pady=5, fill="x")
-        ctk.CTkLabel(self.metrics_frame, text="Metric", font=("Roboto", 12, "bold")).grid(row=0, column=0, padx=5, pady=2)
-        ctk.CTkLabel(self.metrics_frame, text="Min", font=("Roboto", 12, "bold")).grid(row=0, column=1, padx=5, pady=2)
-        ctk.CTkLabel(self.metrics_frame, text="Current", font=("Roboto", 12, "bold")).grid(row=0, column=2, padx=5, pady=2)
-        ctk.CTkLabel(self.metrics_frame, text="Max", font=("Roboto", 12, "bold")).grid(row=0, column=3, padx=5, pady=2)
-
-        self.metric_labels = {}
-        for i, metric in enumerate(self.metrics):
-            ctk.CTkLabel(self.metrics_frame, text=metric, font=("Roboto", 12)).grid(row=i+1, column=0, padx=5, pady=2)
-            self.metric_labels[metric] = {
-                "min": ctk.CTkLabel(self.metrics_frame, text="N/A", font=("Roboto", 12)),
-                "current": ctk.CTkLabel(self.metrics_frame, text="N/A", font=("Roboto", 12)),
-                "max": ctk.CTkLabel(self.metrics_frame, text="N/A", font=("Roboto", 12))
-            }
-            self.metric_labels[metric]["min"].grid(row=i+1, column=1, padx=5, pady=2)
-            self.metric_labels[metric]["current"].grid(row=i+1, column=2, padx=5, pady=2)
-            self.metric_labels[metric]["max"].grid(row=i+1, column=3, padx=5, pady=2)
-
-        self.fan_frame = ctk.CTkFrame(self.main_frame)
-        self.fan_frame.pack(pady=5, fill="x")
-        self.fan_label = ctk.CTkLabel(self.fan_frame, text="Fan Speeds: N/A", font=("Roboto", 12))
-        self.fan_label.pack()
-
-        self.start_button = ctk.CTkButton(self.main_frame, text="Start Stress Test (10s)", command=self.run_stress_test, font=("Roboto", 12))
-        self.start_button.pack(pady=5)
-        self.progress_label = ctk.CTkLabel(self.main_frame, text="Test Progress: Idle", font=("Roboto", 12))
-        self.progress_label.pack()
-        self.error_label = ctk.CTkLabel(self.main_frame, text="Errors: None", font=("Roboto", 12))
-        self.error_label.pack()
-
-    def update_metrics(self, cpu_usage, cpu_freq, cpu_temp, fan_speeds):
+        # Хаб кладёт в ящик последний снимок, окно рисует только его на своём тике
+        self.refresher.add(self.mailbox, lambda values: self.update_metrics(*values))
+        self.refresher.add(self.alert_box, self.show_errors)
+        self.refresher.start()
+        # Таблица уже нарисована с N/A: опрос, диагностика и архив запускаются в фоне
+        # и заполняют её с первым снимком, не задерживая первое появление окна
+        threading.Thread(target=self.connect, daemon=True).start()
+
+    def connect(self):
+        def callback(snapshot):
+            # Первый снимок пустой, пока сборщики ещё ничего не вернули
+            if self.is_running and snapshot.ages:
+                mark("first snapshot")
+                # История пишется в потоке записи архива: цикл хаба и поток Tk не ждут диска
+                get_rollups().submit(time.time(), snapshot_row(snapshot))
+                self.mailbox.put(tuple(snapshot.get(name, DEFAULTS[name]) for name in COLLECTORS))
+        try:
+            self.subscription = get_hub().subscribe(COLLECTORS, callback)
+            self.diagnostics_token = self.diagnostics.add_listener(self.alert_box.put)
+            # Старые сегменты истории и ротированные CSV сжимаются в фоне
+            get_archiver().start()
+            mark("monitoring started")
+        except Exception as e:
+            logging.error(f"Main start_monitoring error: {str(e)}")
         if not self.is_running:
+            # Окно закрыли, пока шло подключение: on_closing могла не увидеть подписки
+            self.disconnect()
+
+    def disconnect(self):
+        if self.subscription is not None:
+            get_hub().unsubscribe(self.subscription)
+            self.subscription = None
+        if self.diagnostics_token is not None:
+            self.diagnostics.remove_listener(self.diagnostics_token)
+            self.diagnostics_token = None
+        get_archiver().stop()
+
+class HistoryPanel:
+    """Переключатель графика окна между живыми данными и историей за выбранный интервал."""
+
+    def __init__(self, window, columns, ylabel, ylim=None):
+        from history import RANGES
+
+        self.window = window
+        self.columns = columns
+        self.ylabel = ylabel
+        self.ylim = ylim
+        self.active = False
+        self.request = 0
+        self.view = None
+        # Результат загрузки забирает тик окна, устаревшие запросы отбрасываются в show()
+        self.results = Mailbox()
+        window.refresher.add(self.results, lambda result: self.show(*result))
+        self.frame = ctk.CTkFrame(window.main_frame)
+        self.frame.pack(pady=5, fill="x")
+        ctk.CTkLabel(self.frame, text="History:", font=("Roboto", 12)).pack(side="left", padx=5)
+        self.menu = ctk.CTkOptionMenu(self.frame, values=["Live"] + list(RANGES), command=self.select)
+        self.menu.pack(side="left", padx=5)
+        self.status_label = ctk.CTkLabel(self.frame, text="", font=("Roboto", 12))
+        self.status_label.pack(side="left", padx=5)
+
+    def select(self, choice):
+        self.request += 1
+        if choice == "Live":
+            self.active = False
+            self.status_label.configure(text="")
+            self.close_view()
+            self.window.plot.attach()
             return
-        def update():
-            if not self.is_running:
-                return
+        self.active = True
+        self.status_label.configure(text="Loading...")
+        request = self.request
+        names = [name for name, _ in self.columns]
+
+        def load():
+            started = time.perf_counter()
             try:
-                avg_cpu = sum(cpu_usage) / len(cpu_usage) if cpu_usage else 0
-                self.cpu_history.append(avg_cpu)
-                self.time_history.append(len(self.cpu_history))
-
-                self.ax.clear()
-                self.ax.plot(self.time_history, self.cpu_history, label="CPU Usage (%)", color="green")
-                self.ax.set_ylim(0, 100)
-                self.ax.set_xlabel("Time (s)")
-                self.ax.set_ylabel("Usage (%)")
-                self.ax.legend()
-                self.canvas.draw()
-
-                self.metrics["Usage (%)"]["current"] = avg_cpu
-                self.metrics["Frequency (MHz)"]["current"] = float(cpu_freq) if cpu_freq != "N/A" else 0
-                self.metrics["Temperature (°C)"]["current"] = float(cpu_temp) if cpu_temp != "N/A" else 0
-
-                for metric in self.metrics:
-                    if self.metrics[metric]["current"] < self.metrics[metric]["min"]:
-                        self.metrics[metric]["min"] = self.metrics[metric]["current"]
-                    if self.metrics[metric]["current"] > self.metrics[metric]["max"]:
-                        self.metrics[metric]["max"] = self.metrics[metric]["current"]
-                    self.metric_labels[metric]["min"].configure(text=f"{self.metrics[metric]['min']:.1f}")
-                    self.metric_labels[metric]["current"].configure(text=f"{self.metrics[metric]['current']:.1f}")
-                    self.metric_labels[metric]["max"].configure(text=f"{self.metrics[metric]['max']:.1f}")
-
-                self.fan_speeds = fan_speeds
-                fan_text = ", ".join([f"{k}: {v} RPM" for k, v in fan_speeds.items()])
-                self.fan_label.configure(text=f"Fan Speeds: {fan_text}")
-
-                errors = self.diagnostics.check_hardware() + self.stress.get_errors()
-                self.error_label.configure(text=f"Errors: {', '.join(errors) if errors else 'None'}")
-
-                with open(os.path.join("cpu_metrics.csv"), "a", newline="") as f:
-                    writer = csv.writer(f)
-                    writer.writerow([time.time(), avg_cpu, cpu_freq, cpu_temp])
+                from history import RANGES, load_range
+                from historyplot import BACKING_POINTS
+                data, error = load_range(RANGES[choice], names, max_points=BACKING_POINTS), None
             except Exception as e:
-                logging.error(f"CPU update_metrics error: {str(e)}")
-        after_id = self.root.after(0, update)
-        self.after_ids.append(after_id)
-
-    def run_stress_test(self):
-        logging.info("Starting CPU stress test")
-        self.start_button.configure(state="disabled")
-        self.progress_label.configure(text="Test Progress: Running...")
-        threading.Thread(target=self.stress.cpu_stress, args=(10, 2000), daemon=True).start()
-        self.root.after(10000, self.finish_stress_test)
-
-    def finish_stress_test(self):
-        logging.info("CPU stress test completed")
-        self.start_button.configure(state="normal")
-        self.progress_label.configure(text="Test Progress: Completed")
-
-    def start_monitoring(self):
-        def callback(*args):
-            cpu_usage = args[0] if len(args) > 0 else []
-            cpu_freq = args[1] if len(args) > 1 else "N/A"
-            cpu_temp = args[2] if len(args) > 2 else "N/A"
-            fan_speeds = args[3] if len(args) > 3 else {}
-            if self.is_running:
-                self.update_metrics(cpu_usage, cpu_freq, cpu_temp, fan_speeds)
-        threading.Thread(target=self.monitor.monitor_loop, args=(callback, 1), daemon=True).start()
+                data, error = None, str(e)
+                logging.error(f"History load error: {str(e)}")
+            self.results.put((request, data, time.perf_counter() - started, error))
+        # Чтение идёт в отдельном потоке, поток Tk только рисует результат
+        threading.Thread(target=load, daemon=True).start()
+
+    def show(self, request, data, elapsed, error):
+        if request != self.request or not self.window.is_running:
+            return
+        if error is not None:
+            self.status_label.configure(text=f"Error: {error}")
+            return
+        from historyplot import HistoryPlot
+
+        plot = self.window.plot
+        plot.detach()
+        self.close_view()
+        ax = plot.ax
+        ax.clear()
+        # Весь интервал хранится целиком, рисуется только видимая часть, прореженная до ширины осей
+        self.view = HistoryPlot(ax, plot.canvas, ylim=self.ylim)
+        for name, label in self.columns:
+            band = (data[f"{name}.min"], data[f"{name}.max"]) if f"{name}.min" in data else None
+            self.view.add(name, data["time"], data[name], label, band)
+        ax.set_xlabel("Time")
+        ax.set_ylabel(self.ylabel)
+        ax.legend(loc="upper left")
+        plot.fig.autofmt_xdate()
+        self.view.show_all()
+        plot.canvas.draw()
+        self.status_label.configure(text=f"{len(data['time'])} points ({data['tier']}), loaded in {elapsed * 1000:.0f} ms; "
+                                         f"scroll to zoom, drag to pan")
+
+    def close_view(self):
+        if self.view is not None:
+            self.view.close()
+            self.view = None
+
+class StressWindow:
+    """Общая часть окон стресс-тестов CPU, RAM, Disk и GPU.
+
+    Окно подписывается на groups хаба, рисует живой график с панелью истории,
+    таблицу Min/Current/Max по metric_names и строку ошибок, пишет строку
+    в csv_file и запускает стресс-тест на 10 секунд. Подкласс задаёт эти
+    атрибуты и два метода:
+        measure(*values) — по значениям групп снимка (в порядке groups) возвращает
+            (точку графика, текущие значения в порядке metric_names, столбцы CSV);
+        start_stress() — запускает стресс-тест в фоновом потоке.
+    При необходимости он добавляет виджеты в setup_charts() и setup_details()
+    и действия в finish_stress_test().
+    """
+
+    name = ""
+    groups = ()
+    metric_names = ()
+    csv_file = None
+    plot_label = ""
+    plot_ylabel = ""
+    plot_ylim = None
+    history_columns = ()
+    result_text = None
 
-class RAMWindow:
     def __init__(self, root):
         self.root = root
-        self.monitor = SystemMonitor()
+        self.subscription = None
+        # numpy и стресс-тесты загружаются только при открытии окна теста
+        from stress_test import StressTest
         self.stress = StressTest()
-        self.diagnostics = Diagnostics()
-        self.ram_history = collections.deque(maxlen=30)
-        self.time_history = collections.deque(maxlen=30)
-        self.metrics = {
-            "Usage (%)": {"min": float("inf"), "current": 0, "max": 0},
-            "Used (GB)": {"min": float("inf"), "current": 0, "max": 0},
-            "Frequency (MHz)": {"min": float("inf"), "current": 0, "max": 0}
-        }
+        self.diagnostics = get_diagnostics()
+        self.diagnostics_token = None
+        self.alerts = ()
+        self.alert_box = Mailbox()
+        self.error_text = None
+        self.metrics = {name: {"min": float("inf"), "current": 0, "max": 0} for name in self.metric_names}
         self.is_running = True
-        self.after_ids = []
+        self.mailbox = Mailbox()
+        self.refresher = UiRefresher(self.root)
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
         self.setup_ui()
         self.start_monitoring()
 
     def on_closing(self):
         self.is_running = False
-        self.monitor.stop()
-        for after_id in self.after_ids:
-            self.root.after_cancel(after_id)
-        self.after_ids.clear()
+        if self.subscription is not None:
+            get_hub().unsubscribe(self.subscription)
+            self.subscription = None
+        if self.diagnostics_token is not None:
+            self.diagnostics.remove_listener(self.diagnostics_token)
+            self.diagnostics_token = None
+        self.refresher.stop()
+        self.plot.cancel()
+        logging.info(f"{self.name} plot: {self.plot.stats()}")
+        logging.info(f"{self.name} metric table: {self.metric_table.stats()}")
+        get_sink().flush(timeout=0)
         self.root.after(100, self.root.destroy)
 
     def setup_ui(self):
         self.main_frame = ctk.CTkFrame(self.root)
         self.main_frame.pack(pady=10, padx=10, fill="both", expand=True)
 
-        self.fig, self.ax = plt.subplots(figsize=(6, 2))
-        self.canvas = FigureCanvasTkAgg(self.fig, master=self.main_frame)
-        self.canvas.get_tk_widget().pack(pady=10)
-
-        self.metrics_frame = ctk.CTkFrame(self.main_frame)
-        self.metrics_frame.pack(pady=5, fill="x")
-        ctk.CTkLabel(self.metrics_frame, text="Metric", font=("Roboto", 12, "bold")).grid(row=0, column=0, padx=5, pady=2)
-        ctk.CTkLabel(self.metrics_frame, text="Min", font=("Roboto", 12, "bold")).grid(row=0, column=1, padx=5, pady=2)
-        ctk.CTkLabel(self.metrics_frame, text="Current", font=("Roboto", 12, "bold")).grid(row=0, column=2, padx=5, pady=2)
-        ctk.CTkLabel(self.metrics_frame, text="Max", font=("Roboto", 12, "bold")).grid(row=0, column=3, padx=5, pady=2)
-
-        self.metric_labels = {}
-        for i, metric in enumerate(self.metrics):
-            ctk.CTkLabel(self.metrics_frame, text=metric, font=("Roboto", 12)).grid(row=i+1, column=0, padx=5, pady=2)
-            self.metric_labels[metric] = {
-                "min": ctk.CTkLabel(self.metrics_frame, text="N/A", font=("Roboto", 12)),
-                "current": ctk.CTkLabel(self.metrics_frame, text="N/A", font=("Roboto", 12)),
-                "max": ctk.CTkLabel(self.metrics_frame, text="N/A", font=("Roboto", 12))
-            }
-            self.metric_labels[metric]["min"].grid(row=i+1, column=1, padx=5, pady=2)
-            self.metric_labels[metric]["current"].grid(row=i+1, column=2, padx=5, pady=2)
-            self.metric_labels[metric]["max"].grid(row=i+1, column=3, padx=5, pady=2)
+        from offthread import live_plot
+        self.plot = live_plot(self.main_frame, self.plot_label, self.plot_ylabel, ylim=self.plot_ylim)
+        self.plot.get_tk_widget().pack(pady=10)
+        self.history = HistoryPanel(self, self.history_columns, self.plot_ylabel, ylim=self.plot_ylim)
+        self.setup_charts()
+
+        self.metric_table = MetricTable(self.main_frame, MIN_MAX_HEADERS)
+        self.metric_table.pack(pady=5, fill="x")
+        self.metric_table.update([(metric, (metric, "N/A", "N/A", "N/A")) for metric in self.metrics])
+        self.setup_details()
 
         self.start_button = ctk.CTkButton(self.main_frame, text="Start Stress Test (10s)", command=self.run_stress_test, font=("Roboto", 12))
         self.start_button.pack(pady=5)
@@ -375,458 +381,372 @@ class RAMWindow:
         self.progress_label.pack()
         self.error_label = ctk.CTkLabel(self.main_frame, text="Errors: None", font=("Roboto", 12))
         self.error_label.pack()
-        self.result_label = ctk.CTkLabel(self.main_frame, text="RAM Test Results: N/A", font=("Roboto", 12))
-        self.result_label.pack()
+        if self.result_text is not None:
+            self.result_label = ctk.CTkLabel(self.main_frame, text=self.result_text, font=("Roboto", 12))
+            self.result_label.pack()
 
-    def update_metrics(self, ram_info, ram_freq):
+    def setup_charts(self):
+        """Виджеты под графиком и панелью истории."""
+
+    def setup_details(self):
+        """Виджеты под таблицей метрик."""
+
+    def update_metrics(self, *values):
         if not self.is_running:
             return
-        def update():
-            if not self.is_running:
-                return
-            try:
-                self.ram_history.append(ram_info["percent"])
-                self.time_history.append(len(self.ram_history))
-
-                self.ax.clear()
-                self.ax.plot(self.time_history, self.ram_history, label="RAM Usage (%)", color="green")
-                self.ax.set_ylim(0, 100)
-                self.ax.set_xlabel("Time (s)")
-                self.ax.set_ylabel("Usage (%)")
-                self.ax.legend()
-                self.canvas.draw()
-
-                self.metrics["Usage (%)"]["current"] = ram_info["percent"]
-                self.metrics["Used (GB)"]["current"] = ram_info["used"]
-                self.metrics["Frequency (MHz)"]["current"] = float(ram_freq) if ram_freq != "N/A" else 0
-
-                for metric in self.metrics:
-                    if self.metrics[metric]["current"] < self.metrics[metric]["min"]:
-                        self.metrics[metric]["min"] = self.metrics[metric]["current"]
-                    if self.metrics[metric]["current"] > self.metrics[metric]["max"]:
-                        self.metrics[metric]["max"] = self.metrics[metric]["current"]
-                    self.metric_labels[metric]["min"].configure(text=f"{self.metrics[metric]['min']:.1f}")
-                    self.metric_labels[metric]["current"].configure(text=f"{self.metrics[metric]['current']:.1f}")
-                    self.metric_labels[metric]["max"].configure(text=f"{self.metrics[metric]['max']:.1f}")
-
-                errors = self.diagnostics.check_hardware() + self.stress.get_errors()
-                self.error_label.configure(text=f"Errors: {', '.join(errors) if errors else 'None'}")
-
-                with open(os.path.join("ram_metrics.csv"), "a", newline="") as f:
-                    writer = csv.writer(f)
-                    writer.writerow([time.time(), ram_info["percent"], ram_info["used"], ram_freq])
-            except Exception as e:
-                logging.error(f"RAM update_metrics error: {str(e)}")
-        after_id = self.root.after(0, update)
-        self.after_ids.append(after_id)
+        try:
+            plot_value, currents, row = self.measure(*values)
+            # В режиме истории значения только копятся, график показывает выбранный интервал
+            self.plot.append(plot_value, draw=not self.history.active)
+
+            for metric, current in zip(self.metric_names, currents):
+                values = self.metrics[metric]
+                values["current"] = current
+                if current < values["min"]:
+                    values["min"] = current
+                if current > values["max"]:
+                    values["max"] = current
+            self.metric_table.update(min_max_rows(self.metrics))
+
+            # Ошибки стресс-теста появляются в его потоке, предупреждения — по изменению набора
+            self.show_errors()
+
+            get_sink().write(self.csv_file, [time.time()] + row)
+        except Exception as e:
+            logging.error(f"{self.name} update_metrics error: {str(e)}")
 
     def run_stress_test(self):
-        logging.info("Starting RAM stress test")
+        logging.info(f"Starting {self.name} stress test")
         self.start_button.configure(state="disabled")
         self.progress_label.configure(text="Test Progress: Running...")
-        threading.Thread(target=self.run_ram_stress_with_result, args=(10, 128), daemon=True).start()
-        self.root.after(10000, self.finish_stress_test)
+        self.start_stress()
+        self.refresher.after(10000, self.finish_stress_test)
 
     def finish_stress_test(self):
-        logging.info("RAM stress test completed")
+        logging.info(f"{self.name} stress test completed")
         self.start_button.configure(state="normal")
         self.progress_label.configure(text="Test Progress: Completed")
 
-    def run_ram_stress_with_result(self, duration, size_mb):
-        seq_speed, seq_latency, rand_speed, rand_latency = self.stress.ram_stress(duration, size_mb)
-        if not self.is_running:
-            return
+    def show_result(self, text):
+        """Показывает результат теста из его потока на следующем тике окна."""
         def update_result():
             if not self.is_running:
                 return
             try:
-                if seq_speed:
-                    self.result_label.configure(
-                        text=f"RAM Test Results: Seq Speed: {seq_speed:.2f} MB/s, Seq Latency: {seq_latency:.2f} ms, "
-                             f"Rand Speed: {rand_speed:.2f} MB/s, Rand Latency: {rand_latency:.2f} ms")
-                logging.debug(f"RAM test results: Seq Speed={seq_speed}, Seq Latency={seq_latency}, "
-                              f"Rand Speed={rand_speed}, Rand Latency={rand_latency}")
+                self.result_label.configure(text=text)
             except Exception as e:
-                logging.error(f"RAM result update error: {str(e)}")
-        after_id = self.root.after(0, update_result)
-        self.after_ids.append(after_id)
+                logging.error(f"{self.name} result update error: {str(e)}")
+        if self.is_running:
+            self.refresher.after(0, update_result)
+
+    def show_errors(self, alerts=None):
+        """Строка ошибок: предупреждения диагностики и ошибки стресс-теста; метка меняется только при изменении текста."""
+        if alerts is not None:
+            self.alerts = alerts
+        errors = list(self.alerts) + self.stress.get_errors()
+        text = f"Errors: {', '.join(errors) if errors else 'None'}"
+        if text != self.error_text:
+            self.error_text = text
+            self.error_label.configure(text=text)
 
     def start_monitoring(self):
-        def callback(*args):
-            ram_info = args[4] if len(args) > 4 else {}
-            ram_freq = args[5] if len(args) > 5 else "N/A"
+        # Хаб кладёт в ящик последний снимок, окно рисует только его на своём тике
+        self.refresher.add(self.mailbox, lambda values: self.update_metrics(*values))
+        self.refresher.start()
+        self.refresher.add(self.alert_box, self.show_errors)
+        self.diagnostics_token = self.diagnostics.add_listener(self.alert_box.put)
+        def callback(snapshot):
             if self.is_running:
-                self.update_metrics(ram_info, ram_freq)
-        threading.Thread(target=self.monitor.monitor_loop, args=(callback, 1), daemon=True).start()
+                self.mailbox.put(tuple(snapshot.get(group, DEFAULTS[group]) for group in self.groups))
+        self.subscription = get_hub().subscribe(self.groups, callback)
+
+class CPUWindow(StressWindow):
+    name = "CPU"
+    groups = ("cpu_usage", "cpu_freq", "cpu_temp", "fan_speeds")
+    metric_names = ("Usage (%)", "Frequency (MHz)", "Temperature (°C)")
+    csv_file = "cpu_metrics.csv"
+    plot_label = "CPU Usage (%)"
+    plot_ylabel = "Usage (%)"
+    plot_ylim = (0, 100)
+    history_columns = (("cpu_usage", "CPU Usage (%)"),)
+    result_text = "High-Frequency Capture: N/A"
 
-class DiskWindow:
     def __init__(self, root):
-        self.root = root
-        self.monitor = SystemMonitor()
-        self.stress = StressTest()
-        self.diagnostics = Diagnostics()
-        self.disk_history = collections.deque(maxlen=30)
-        self.time_history = collections.deque(maxlen=30)
-        self.metrics = {
-            "Usage (%)": {"min": float("inf"), "current": 0, "max": 0},
-            "Read (MB)": {"min": float("inf"), "current": 0, "max": 0},
-            "Write (MB)": {"min": float("inf"), "current": 0, "max": 0}
-        }
-        self.is_running = True
-        self.after_ids = []
-        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
-        self.setup_ui()
-        self.start_monitoring()
+        self.fan_speeds = {}
+        self.capture = None
+        super().__init__(root)
 
     def on_closing(self):
-        self.is_running = False
-        self.monitor.stop()
-        for after_id in self.after_ids:
-            self.root.after_cancel(after_id)
-        self.after_ids.clear()
-        self.root.after(100, self.root.destroy)
-
-    def setup_ui(self):
-        self.main_frame = ctk.CTkFrame(self.root)
-        self.main_frame.pack(pady=10, padx=10, fill="both", expand=True)
+        if self.capture is not None:
+            self.capture.close()
+        self.heatmap.cancel()
+        super().on_closing()
+        logging.info(f"CPU heatmap: {self.heatmap.stats()}")
+
+    def setup_charts(self):
+        # Загрузка каждого ядра: строки сгруппированы по узлам NUMA и сокетам
+        from heatmap import CoreTopology
+        from offthread import core_heatmap
+        # Число столбцов — столько значений отдаёт get_cpu_usage; при расхождении с sysfs топология без группировки
+        cores = get_hub().monitor.cpu_count()
+        topology = CoreTopology(cores=cores)
+        self.heatmap = core_heatmap(self.main_frame, cores, topology=topology)
+        self.heatmap.get_tk_widget().pack(pady=10)
+
+    def setup_details(self):
+        self.fan_frame = ctk.CTkFrame(self.main_frame)
+        self.fan_frame.pack(pady=5, fill="x")
+        self.fan_label = TextLabel(ctk.CTkLabel(self.fan_frame, text="Fan Speeds: N/A", font=("Roboto", 12)))
+        self.fan_label.pack()
 
-        self.fig, self.ax = plt.subplots(figsize=(6, 2))
-        self.canvas = FigureCanvasTkAgg(self.fig, master=self.main_frame)
-        self.canvas.get_tk_widget().pack(pady=10)
-
-        self.metrics_frame = ctk.CTkFrame(self.main_frame)
-        self.metrics_frame.pack(pady=5, fill="x")
-        ctk.CTkLabel(self.metrics_frame, text="Metric", font=("Roboto", 12, "bold")).grid(row=0, column=0, padx=5, pady=2)
-        ctk.CTkLabel(self.metrics_frame, text="Min", font=("Roboto", 12, "bold")).grid(row=0, column=1, padx=5, pady=2)
-        ctk.CTkLabel(self.metrics_frame, text="Current", font=("Roboto", 12, "bold")).grid(row=0, column=2, padx=5, pady=2)
-        ctk.CTkLabel(self.metrics_frame, text="Max", font=("Roboto", 12, "bold")).grid(row=0, column=3, padx=5, pady=2)
-
-        self.metric_labels = {}
-        for i, metric in enumerate(self.metrics):
-            ctk.CTkLabel(self.metrics_frame, text=metric, font=("Roboto", 12)).grid(row=i+1, column=0, padx=5, pady=2)
-            self.metric_labels[metric] = {
-                "min": ctk.CTkLabel(self.metrics_frame, text="N/A", font=("Roboto", 12)),
-                "current": ctk.CTkLabel(self.metrics_frame, text="N/A", font=("Roboto", 12)),
-                "max": ctk.CTkLabel(self.metrics_frame, text="N/A", font=("Roboto", 12))
-            }
-            self.metric_labels[metric]["min"].grid(row=i+1, column=1, padx=5, pady=2)
-            self.metric_labels[metric]["current"].grid(row=i+1, column=2, padx=5, pady=2)
-            self.metric_labels[metric]["max"].grid(row=i+1, column=3, padx=5, pady=2)
+    def measure(self, cpu_usage, cpu_freq, cpu_temp, fan_speeds):
+        avg_cpu = sum(cpu_usage) / len(cpu_usage) if cpu_usage else 0
+        if cpu_usage:
+            self.heatmap.append(cpu_usage)
+        self.fan_speeds = fan_speeds
+        fan_text = ", ".join([f"{k}: {v} RPM" for k, v in fan_speeds.items()])
+        self.fan_label.set(f"Fan Speeds: {fan_text}")
+        currents = (avg_cpu, float(cpu_freq) if cpu_freq != "N/A" else 0, float(cpu_temp) if cpu_temp != "N/A" else 0)
+        return avg_cpu, currents, [avg_cpu, cpu_freq, cpu_temp]
+
+    def start_stress(self):
+        # Во время теста пишем загрузку, частоту и температуру каждого ядра с частотой 50 Гц
+        try:
+            from capture import HighFrequencyCapture
+            # Датчики берутся из инвентаря хаба: без нового обхода hwmon и запуска dmidecode в потоке Tk
+            self.capture = HighFrequencyCapture(rate=50, seconds=15, inventory=get_hub().monitor.inventory)
+            self.capture.start()
+        except (OSError, ValueError) as e:
+            self.capture = None
+            logging.error(f"High-frequency capture unavailable: {str(e)}")
+        threading.Thread(target=self.stress.cpu_stress, args=(10, 2000), daemon=True).start()
 
-        self.start_button = ctk.CTkButton(self.main_frame, text="Start Stress Test (10s)", command=self.run_stress_test, font=("Roboto", 12))
-        self.start_button.pack(pady=5)
-        self.progress_label = ctk.CTkLabel(self.main_frame, text="Test Progress: Idle", font=("Roboto", 12))
-        self.progress_label.pack()
-        self.error_label = ctk.CTkLabel(self.main_frame, text="Errors: None", font=("Roboto", 12))
-        self.error_label.pack()
-        self.result_label = ctk.CTkLabel(self.main_frame, text="Disk Test Results: N/A", font=("Roboto", 12))
-        self.result_label.pack()
+    def finish_stress_test(self):
+        super().finish_stress_test()
+        if self.capture is not None:
+            self.capture.stop()
+            self.show_capture_summary()
+
+    def show_capture_summary(self):
+        import numpy as np
+
+        data = self.capture.latest()
+        overhead = self.capture.overhead()
+        path = f"cpu_capture_{int(time.time())}.npz"
+        self.capture.export(path)
+        # Датчиков частоты или температуры может не быть: тогда в столбцах только NaN
+        min_freq = f"{np.nanmin(data['freq']):.0f} MHz" if not np.isnan(data["freq"]).all() else "N/A"
+        max_temp = f"{np.nanmax(data['temp']):.1f} °C" if not np.isnan(data["temp"]).all() else "N/A"
+        self.result_label.configure(
+            text=f"High-Frequency Capture: {overhead['samples']} samples, min core freq {min_freq}, "
+                 f"max core temp {max_temp}, capture overhead {overhead['cpu_percent']:.1f}% CPU "
+                 f"({overhead['mean_sample_ms']:.2f} ms/sample), saved to {path}")
+        logging.info(f"CPU capture overhead: {overhead}")
+
+class RAMWindow(StressWindow):
+    name = "RAM"
+    groups = ("ram_info", "ram_freq")
+    metric_names = ("Usage (%)", "Used (GB)", "Frequency (MHz)")
+    csv_file = "ram_metrics.csv"
+    plot_label = "RAM Usage (%)"
+    plot_ylabel = "Usage (%)"
+    plot_ylim = (0, 100)
+    history_columns = (("ram_percent", "RAM Usage (%)"),)
+    result_text = "RAM Test Results: N/A"
+
+    def measure(self, ram_info, ram_freq):
+        currents = (ram_info["percent"], ram_info["used"], float(ram_freq) if ram_freq != "N/A" else 0)
+        return ram_info["percent"], currents, [ram_info["percent"], ram_info["used"], ram_freq]
+
+    def start_stress(self):
+        threading.Thread(target=self.run_ram_stress_with_result, args=(10, 128), daemon=True).start()
 
-    def update_metrics(self, disk_usage, disk_io):
-        if not self.is_running:
-            return
-        def update():
-            if not self.is_running:
-                return
-            try:
-                self.disk_history.append(disk_io["read_bytes"] + disk_io["write_bytes"])
-                self.time_history.append(len(self.disk_history))
-
-                self.ax.clear()
-                self.ax.plot(self.time_history, self.disk_history, label="Disk IO (MB)", color="green")
-                self.ax.set_xlabel("Time (s)")
-                self.ax.set_ylabel("IO (MB)")
-                self.ax.legend()
-                self.canvas.draw()
-
-                self.metrics["Usage (%)"]["current"] = disk_usage["percent"]
-                self.metrics["Read (MB)"]["current"] = disk_io["read_bytes"]
-                self.metrics["Write (MB)"]["current"] = disk_io["write_bytes"]
-
-                for metric in self.metrics:
-                    if self.metrics[metric]["current"] < self.metrics[metric]["min"]:
-                        self.metrics[metric]["min"] = self.metrics[metric]["current"]
-                    if self.metrics[metric]["current"] > self.metrics[metric]["max"]:
-                        self.metrics[metric]["max"] = self.metrics[metric]["current"]
-                    self.metric_labels[metric]["min"].configure(text=f"{self.metrics[metric]['min']:.1f}")
-                    self.metric_labels[metric]["current"].configure(text=f"{self.metrics[metric]['current']:.1f}")
-                    self.metric_labels[metric]["max"].configure(text=f"{self.metrics[metric]['max']:.1f}")
-
-                errors = self.diagnostics.check_hardware() + self.stress.get_errors()
-                self.error_label.configure(text=f"Errors: {', '.join(errors) if errors else 'None'}")
-
-                with open(os.path.join("disk_metrics.csv"), "a", newline="") as f:
-                    writer = csv.writer(f)
-                    writer.writerow([time.time(), disk_usage["percent"], disk_io["read_bytes"], disk_io["write_bytes"]])
-            except Exception as e:
-                logging.error(f"Disk update_metrics error: {str(e)}")
-        after_id = self.root.after(0, update)
-        self.after_ids.append(after_id)
+    def run_ram_stress_with_result(self, duration, size_mb):
+        seq_speed, seq_latency, rand_speed, rand_latency = self.stress.ram_stress(duration, size_mb)
+        logging.debug(f"RAM test results: Seq Speed={seq_speed}, Seq Latency={seq_latency}, "
+                      f"Rand Speed={rand_speed}, Rand Latency={rand_latency}")
+        if seq_speed:
+            self.show_result(f"RAM Test Results: Seq Speed: {seq_speed:.2f} MB/s, Seq Latency: {seq_latency:.2f} ms, "
+                             f"Rand Speed: {rand_speed:.2f} MB/s, Rand Latency: {rand_latency:.2f} ms")
 
-    def run_stress_test(self):
-        logging.info("Starting Disk stress test")
-        self.start_button.configure(state="disabled")
-        self.progress_label.configure(text="Test Progress: Running...")
+class DiskWindow(StressWindow):
+    name = "Disk"
+    groups = ("disk_usage", "disk_io")
+    metric_names = ("Usage (%)", "Read (MB/s)", "Write (MB/s)")
+    csv_file = "disk_metrics.csv"
+    plot_label = "Disk IO (MB/s)"
+    plot_ylabel = "IO (MB/s)"
+    history_columns = (("disk_read_mb_s", "Disk Read (MB/s)"), ("disk_write_mb_s", "Disk Write (MB/s)"))
+    result_text = "Disk Test Results: N/A"
+
+    def measure(self, disk_usage, disk_io):
+        currents = (disk_usage["percent"], disk_io["read_bytes"], disk_io["write_bytes"])
+        return disk_io["read_bytes"] + disk_io["write_bytes"], currents, list(currents)
+
+    def start_stress(self):
         threading.Thread(target=self.run_disk_stress_with_result, args=(10, 100), daemon=True).start()
-        self.root.after(10000, self.finish_stress_test)
-
-    def finish_stress_test(self):
-        logging.info("Disk stress test completed")
-        self.start_button.configure(state="normal")
-        self.progress_label.configure(text="Test Progress: Completed")
 
     def run_disk_stress_with_result(self, duration, file_size_mb):
         results = self.stress.disk_stress(duration, file_size_mb)
-        if not self.is_running:
-            return
-        def update_result():
-            if not self.is_running:
-                return
-            try:
-                if results["seq_q32t1_read"]:
-                    self.result_label.configure(
-                        text=f"Disk Test Results:\n"
-                             f"Seq Q32T1 Read: {results['seq_q32t1_read']:.2f} MB/s, Write: {results['seq_q32t1_write']:.2f} MB/s\n"
-                             f"4K Q32T1 Read: {results['4k_q32t1_read']:.2f} MB/s, Write: {results['4k_q32t1_write']:.2f} MB/s\n"
-                             f"Seq Read: {results['seq_read']:.2f} MB/s, Write: {results['seq_write']:.2f} MB/s\n"
-                             f"4K Q1T1 Read: {results['4k_q1t1_read']:.2f} MB/s, Write: {results['4k_q1t1_write']:.2f} MB/s")
-                logging.debug(f"Disk test results: {results}")
-            except Exception as e:
-                logging.error(f"Disk result update error: {str(e)}")
-        after_id = self.root.after(0, update_result)
-        self.after_ids.append(after_id)
-
-    def start_monitoring(self):
-        def callback(*args):
-            disk_usage = args[6] if len(args) > 6 else {}
-            disk_io = args[7] if len(args) > 7 else {}
-            if self.is_running:
-                self.update_metrics(disk_usage, disk_io)
-        threading.Thread(target=self.monitor.monitor_loop, args=(callback, 1), daemon=True).start()
+        logging.debug(f"Disk test results: {results}")
+        if results["seq_q32t1_read"]:
+            self.show_result(
+                f"Disk Test Results:\n"
+                f"Seq Q32T1 Read: {results['seq_q32t1_read']:.2f} MB/s, Write: {results['seq_q32t1_write']:.2f} MB/s\n"
+                f"4K Q32T1 Read: {results['4k_q32t1_read']:.2f} MB/s, Write: {results['4k_q32t1_write']:.2f} MB/s\n"
+                f"Seq Read: {results['seq_read']:.2f} MB/s, Write: {results['seq_write']:.2f} MB/s\n"
+                f"4K Q1T1 Read: {results['4k_q1t1_read']:.2f} MB/s, Write: {results['4k_q1t1_write']:.2f} MB/s")
+
+class GPUWindow(StressWindow):
+    name = "GPU"
+    groups = ("gpu_info",)
+    metric_names = ("Usage (%)", "Memory (%)", "Temperature (°C)")
+    csv_file = "gpu_metrics.csv"
+    plot_label = "GPU Usage (%)"
+    plot_ylabel = "Usage (%)"
+    plot_ylim = (0, 100)
+    history_columns = (("gpu_usage", "GPU Usage (%)"),)
+
+    def measure(self, gpu_info):
+        currents = tuple(float(gpu_info[field]) if gpu_info[field] != "N/A" else 0 for field in ("usage", "memory", "temp"))
+        return currents[0], currents, [gpu_info["usage"], gpu_info["memory"], gpu_info["temp"]]
+
+    def start_stress(self):
+        threading.Thread(target=self.stress.gpu_stress, args=(10,), daemon=True).start()
 
-class GPUWindow:
+class SMARTWindow:
     def __init__(self, root):
         self.root = root
-        self.monitor = SystemMonitor()
-        self.stress = StressTest()
-        self.diagnostics = Diagnostics()
-        self.gpu_history = collections.deque(maxlen=30)
-        self.time_history = collections.deque(maxlen=30)
-        self.metrics = {
-            "Usage (%)": {"min": float("inf"), "current": 0, "max": 0},
-            "Memory (%)": {"min": float("inf"), "current": 0, "max": 0},
-            "Temperature (°C)": {"min": float("inf"), "current": 0, "max": 0}
-        }
+        self.subscription = None
         self.is_running = True
-        self.after_ids = []
+        self.mailbox = Mailbox()
+        self.refresher = UiRefresher(self.root)
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
         self.setup_ui()
         self.start_monitoring()
 
     def on_closing(self):
         self.is_running = False
-        self.monitor.stop()
-        for after_id in self.after_ids:
-            self.root.after_cancel(after_id)
-        self.after_ids.clear()
+        if self.subscription is not None:
+            get_hub().unsubscribe(self.subscription)
+            self.subscription = None
+        self.refresher.stop()
+        logging.info(f"SMART disk table: {self.disk_table.stats()}")
+        get_sink().flush(timeout=0)
         self.root.after(100, self.root.destroy)
 
     def setup_ui(self):
         self.main_frame = ctk.CTkFrame(self.root)
         self.main_frame.pack(pady=10, padx=10, fill="both", expand=True)
 
-        self.fig, self.ax = plt.subplots(figsize=(6, 2))
-        self.canvas = FigureCanvasTkAgg(self.fig, master=self.main_frame)
-        self.canvas.get_tk_widget().pack(pady=10)
-
-        self.metrics_frame = ctk.CTkFrame(self.main_frame)
-        self.metrics_frame.pack(pady=5, fill="x")
-        ctk.CTkLabel(self.metrics_frame, text="Metric", font=("Roboto", 12, "bold")).grid(row=0, column=0, padx=5, pady=2)
-        ctk.CTkLabel(self.metrics_frame, text="Min", font=("Roboto", 12, "bold")).grid(row=0, column=1, padx=5, pady=2)
-        ctk.CTkLabel(self.metrics_frame, text="Current", font=("Roboto", 12, "bold")).grid(row=0, column=2, padx=5, pady=2)
-        ctk.CTkLabel(self.metrics_frame, text="Max", font=("Roboto", 12, "bold")).grid(row=0, column=3, padx=5, pady=2)
-
-        self.metric_labels = {}
-        for i, metric in enumerate(self.metrics):
-            ctk.CTkLabel(self.metrics_frame, text=metric, font=("Roboto", 12)).grid(row=i+1, column=0, padx=5, pady=2)
-            self.metric_labels[metric] = {
-                "min": ctk.CTkLabel(self.metrics_frame, text="N/A", font=("Roboto", 12)),
-                "current": ctk.CTkLabel(self.metrics_frame, text="N/A", font=("Roboto", 12)),
-                "max": ctk.CTkLabel(self.metrics_frame, text="N/A", font=("Roboto", 12))
-            }
-            self.metric_labels[metric]["min"].grid(row=i+1, column=1, padx=5, pady=2)
-            self.metric_labels[metric]["current"].grid(row=i+1, column=2, padx=5, pady=2)
-            self.metric_labels[metric]["max"].grid(row=i+1, column=3, padx=5, pady=2)
+        self.smart_frame = ctk.CTkFrame(self.main_frame)
+        self.smart_frame.pack(pady=5, fill="x")
+        self.smart_label = TextLabel(ctk.CTkLabel(self.smart_frame, text="S.M.A.R.T.: Collecting data...", font=("Roboto", 12)))
+        self.smart_label.pack()
 
-        self.start_button = ctk.CTkButton(self.main_frame, text="Start Stress Test (10s)", command=self.run_stress_test, font=("Roboto", 12))
-        self.start_button.pack(pady=5)
-        self.progress_label = ctk.CTkLabel(self.main_frame, text="Test Progress: Idle", font=("Roboto", 12))
-        self.progress_label.pack()
-        self.error_label = ctk.CTkLabel(self.main_frame, text="Errors: None", font=("Roboto", 12))
+        self.error_label = TextLabel(ctk.CTkLabel(self.main_frame, text="Errors: None", font=("Roboto", 12)))
         self.error_label.pack()
 
-    def update_metrics(self, gpu_info):
+        # Строки дисков переиспользуются между опросами, пока набор дисков не меняется
+        self.disk_table = MetricTable(self.main_frame, ("Disk", "Temperature (°C)", "Health", "Reallocated Sectors", "Wear Level"))
+        self.disk_table.pack(pady=5, fill="x")
+
+    def update_metrics(self, smart_data):
         if not self.is_running:
             return
-        def update():
-            if not self.is_running:
-                return
-            try:
-                gpu_usage = float(gpu_info["usage"]) if gpu_info["usage"] != "N/A" else 0
-                self.gpu_history.append(gpu_usage)
-                self.time_history.append(len(self.gpu_history))
-
-                self.ax.clear()
-                self.ax.plot(self.time_history, self.gpu_history, label="GPU Usage (%)", color="green")
-                self.ax.set_ylim(0, 100)
-                self.ax.set_xlabel("Time (s)")
-                self.ax.set_ylabel("Usage (%)")
-                self.ax.legend()
-                self.canvas.draw()
-
-                self.metrics["Usage (%)"]["current"] = gpu_usage
-                self.metrics["Memory (%)"]["current"] = float(gpu_info["memory"]) if gpu_info["memory"] != "N/A" else 0
-                self.metrics["Temperature (°C)"]["current"] = float(gpu_info["temp"]) if gpu_info["temp"] != "N/A" else 0
-
-                for metric in self.metrics:
-                    if self.metrics[metric]["current"] < self.metrics[metric]["min"]:
-                        self.metrics[metric]["min"] = self.metrics[metric]["current"]
-                    if self.metrics[metric]["current"] > self.metrics[metric]["max"]:
-                        self.metrics[metric]["max"] = self.metrics[metric]["current"]
-                    self.metric_labels[metric]["min"].configure(text=f"{self.metrics[metric]['min']:.1f}")
-                    self.metric_labels[metric]["current"].configure(text=f"{self.metrics[metric]['current']:.1f}")
-                    self.metric_labels[metric]["max"].configure(text=f"{self.metrics[metric]['max']:.1f}")
-
-                errors = self.diagnostics.check_hardware() + self.stress.get_errors()
-                self.error_label.configure(text=f"Errors: {', '.join(errors) if errors else 'None'}")
-
-                with open(os.path.join("gpu_metrics.csv"), "a", newline="") as f:
-                    writer = csv.writer(f)
-                    writer.writerow([time.time(), gpu_info["usage"], gpu_info["memory"], gpu_info["temp"]])
-            except Exception as e:
-                logging.error(f"GPU update_metrics error: {str(e)}")
-        after_id = self.root.after(0, update)
-        self.after_ids.append(after_id)
-
-    def run_stress_test(self):
-        logging.info("Starting GPU stress test")
-        self.start_button.configure(state="disabled")
-        self.progress_label.configure(text="Test Progress: Running...")
-        threading.Thread(target=self.stress.gpu_stress, args=(10,), daemon=True).start()
-        self.root.after(10000, self.finish_stress_test)
-
-    def finish_stress_test(self):
-        logging.info("GPU stress test completed")
-        self.start_button.configure(state="normal")
-        self.progress_label.configure(text="Test Progress: Completed")
+        try:
+            self.disk_table.update([
+                (disk, (disk, data["temperature"], data["health_status"], data["reallocated_sectors"], data["wear_level"]))
+                for disk, data in smart_data.items()
+            ])
+
+            smart_text = "\n".join([
+                f"{disk}: Temp={data['temperature']}°C, Health={data['health_status']}, "
+                f"Reallocated={data['reallocated_sectors']}, Wear={data['wear_level']}"
+                for disk, data in smart_data.items()
+            ])
+            self.smart_label.set(f"S.M.A.R.T.:\n{smart_text or 'No data available'}")
+            logging.debug(f"SMARTWindow updated: {smart_text}")
+
+            errors = []
+            if not smart_data:
+                errors.append("No S.M.A.R.T. data available")
+            self.error_label.set(f"Errors: {', '.join(errors) if errors else 'None'}")
+
+            now = time.time()
+            get_sink().write_rows("smart_metrics.csv", [
+                [now, disk, data["temperature"], data["health_status"], data["reallocated_sectors"], data["wear_level"]]
+                for disk, data in smart_data.items()
+            ])
+        except Exception as e:
+            logging.error(f"SMART update_metrics error: {str(e)}")
+            self.error_label.set(f"Errors: S.M.A.R.T. monitoring failed: {str(e)}")
 
     def start_monitoring(self):
-        def callback(*args):
-            gpu_info = args[8] if len(args) > 8 else {}
-            if self.is_running:
-                self.update_metrics(gpu_info)
-        threading.Thread(target=self.monitor.monitor_loop, args=(callback, 1), daemon=True).start()
-
-class SMARTWindow:
+        # Хаб кладёт в ящик последний снимок, окно рисует только его на своём тике
+        self.refresher.add(self.mailbox, lambda values: self.update_metrics(*values))
+        self.refresher.start()
+        def callback(snapshot):
+            # Пока первый опрос smartctl не завершился, обновлять нечего
+            if self.is_running and "smart_data" in snapshot:
+                self.mailbox.put((snapshot["smart_data"],))
+        self.subscription = get_hub().subscribe(("smart_data",), callback, interval=5)
+
+class ProcessWindow:
     def __init__(self, root):
         self.root = root
-        self.smart = SMARTMonitor()
+        self.subscription = None
         self.is_running = True
-        self.after_ids = []
+        self.mailbox = Mailbox()
+        self.refresher = UiRefresher(self.root)
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
         self.setup_ui()
         self.start_monitoring()
 
     def on_closing(self):
         self.is_running = False
-        for after_id in self.after_ids:
-            self.root.after_cancel(after_id)
-        self.after_ids.clear()
+        if self.subscription is not None:
+            get_hub().unsubscribe(self.subscription)
+            self.subscription = None
+        self.refresher.stop()
+        logging.info(f"ProcessWindow model: {self.model.stats()}, table: {self.table.stats()}")
         self.root.after(100, self.root.destroy)
 
     def setup_ui(self):
+        from procview import ProcessModel, VirtualTable
+
         self.main_frame = ctk.CTkFrame(self.root)
         self.main_frame.pack(pady=10, padx=10, fill="both", expand=True)
 
-        self.smart_frame = ctk.CTkFrame(self.main_frame)
-        self.smart_frame.pack(pady=5, fill="x")
-        self.smart_label = ctk.CTkLabel(self.smart_frame, text="S.M.A.R.T.: Collecting data...", font=("Roboto", 12))
-        self.smart_label.pack()
-
-        self.error_label = ctk.CTkLabel(self.main_frame, text="Errors: None", font=("Roboto", 12))
-        self.error_label.pack()
-
-        self.metrics_frame = ctk.CTkFrame(self.main_frame)
-        self.metrics_frame.pack(pady=5, fill="x")
-        headers = ["Disk", "Temperature (°C)", "Health", "Reallocated Sectors", "Wear Level"]
-        for i, header in enumerate(headers):
-            ctk.CTkLabel(self.metrics_frame, text=header, font=("Roboto", 12, "bold")).grid(row=0, column=i, padx=5, pady=2)
+        self.model = ProcessModel()
+        self.table = VirtualTable(self.main_frame, self.model)
+        self.table.pack(pady=5, fill="both", expand=True)
 
-        self.disk_labels = {}
+        self.status_label = ctk.CTkLabel(self.main_frame, text="Processes: Collecting data...", font=("Roboto", 12))
+        self.status_label.pack()
 
-    def update_metrics(self):
+    def update_metrics(self, process_table):
         if not self.is_running:
             return
-        def update():
-            if not self.is_running:
+        try:
+            if not self.model.apply(process_table):
                 return
-            try:
-                smart_data = self.smart.get_smart_data()
-
-                for disk in self.disk_labels:
-                    for label in self.disk_labels[disk].values():
-                        label.destroy()
-                self.disk_labels.clear()
-
-                row = 1
-                for disk, data in smart_data.items():
-                    self.disk_labels[disk] = {
-                        "name": ctk.CTkLabel(self.metrics_frame, text=disk, font=("Roboto", 12)),
-                        "temp": ctk.CTkLabel(self.metrics_frame, text=data["temperature"], font=("Roboto", 12)),
-                        "health": ctk.CTkLabel(self.metrics_frame, text=data["health_status"], font=("Roboto", 12)),
-                        "reallocated": ctk.CTkLabel(self.metrics_frame, text=data["reallocated_sectors"], font=("Roboto", 12)),
-                        "wear": ctk.CTkLabel(self.metrics_frame, text=data["wear_level"], font=("Roboto", 12))
-                    }
-                    self.disk_labels[disk]["name"].grid(row=row, column=0, padx=5, pady=2)
-                    self.disk_labels[disk]["temp"].grid(row=row, column=1, padx=5, pady=2)
-                    self.disk_labels[disk]["health"].grid(row=row, column=2, padx=5, pady=2)
-                    self.disk_labels[disk]["reallocated"].grid(row=row, column=3, padx=5, pady=2)
-                    self.disk_labels[disk]["wear"].grid(row=row, column=4, padx=5, pady=2)
-                    row += 1
-
-                smart_text = "\n".join([
-                    f"{disk}: Temp={data['temperature']}°C, Health={data['health_status']}, "
-                    f"Reallocated={data['reallocated_sectors']}, Wear={data['wear_level']}"
-                    for disk, data in smart_data.items()
-                ])
-                self.smart_label.configure(text=f"S.M.A.R.T.:\n{smart_text or 'No data available'}")
-                logging.debug(f"SMARTWindow updated: {smart_text}")
-
-                errors = []
-                if not smart_data:
-                    errors.append("No S.M.A.R.T. data available")
-                self.error_label.configure(text=f"Errors: {', '.join(errors) if errors else 'None'}")
-
-                with open(os.path.join("smart_metrics.csv"), "a", newline="") as f:
-                    writer = csv.writer(f)
-                    for disk, data in smart_data.items():
-                        writer.writerow([
-                            time.time(),
-                            disk,
-                            data["temperature"],
-                            data["health_status"],
-                            data["reallocated_sectors"],
-                            data["wear_level"]
-                        ])
-            except Exception as e:
-                logging.error(f"SMART update_metrics error: {str(e)}")
-                self.error_label.configure(text=f"Errors: S.M.A.R.T. monitoring failed: {str(e)}")
-        after_id = self.root.after(0, update)
-        self.after_ids.append(after_id)
+            self.table.refresh()
+            model = self.model.stats()
+            table = self.table.stats()
+            self.status_label.configure(text=f"Changed rows: {len(process_table.changed)}, "
+                                             f"resyncs: {model['resyncs']}, "
+                                             f"apply: {model['mean_apply_ms']:.1f} ms, "
+                                             f"render: {table['mean_refresh_ms']:.1f} ms")
+        except Exception as e:
+            logging.error(f"ProcessWindow update_metrics error: {str(e)}")
+            self.status_label.configure(text=f"Processes: update failed: {str(e)}")
 
     def start_monitoring(self):
-        def monitor_loop():
-            while self.is_running:
-                self.update_metrics()
-                time.sleep(5)
-        threading.Thread(target=monitor_loop, daemon=True).start()
\ No newline at end of file
+        self.refresher.add(self.mailbox, lambda values: self.update_metrics(*values))
+        self.refresher.start()
+        def callback(snapshot):
+            # Пропущенный ящиком снимок модель заметит по версии и возьмёт таблицу целиком
+            if self.is_running and snapshot.get("process_table") is not None:
+                self.mailbox.put((snapshot["process_table"],))
+        self.subscription = get_hub().subscribe(("process_table",), callback, interval=2)